@@ -1,11 +1,12 @@
-﻿from flask import Flask, request, jsonify
+﻿from flask import Flask, request, jsonify, json
 from flask_cors import CORS
 import os
 import logging
 import numpy as np
 import torch
-from transformers import RobertaTokenizer
-from model_handler import model, df, embeddings
+from model_handler import (model, tokenizer, get_snapshot, get_catalog, add_catalog_listener, check_dataset_version,
+                           get_queue_stats, get_cache_stats)
+from query_understanding import parse_query, get_ner_queue_stats, get_query_info_cache_stats
 import uuid
 from datetime import datetime, timedelta
 import random
@@ -90,16 +91,15 @@ if routing_service_available:
 if ticket_service_available:
     app.register_blueprint(ticket_service.bp)
 
-# Initialize tokenizer
-try:
-    tokenizer = RobertaTokenizer.from_pretrained('roberta-base')
-except Exception as e:
-    logger.error(f"Error loading tokenizer: {e}")
-    tokenizer = None
-
 # Session management
 active_sessions = {}
 
+# Each worker reloads final_dataset.csv on its own when the file's content changes,
+# so all workers converge on the same catalog and dataset info ETag
+@app.before_request
+def reload_changed_dataset():
+    check_dataset_version()
+
 # Root route for ngrok tunnel
 @app.route('/', methods=['GET'])
 def root():
@@ -112,16 +112,17 @@ def root():
             '/api/health',
             '/api/create_session',
             '/api/recommend',
-            '/api/dataset/info'
+            '/api/dataset/info',
+            '/api/metrics'
         ]
     })
 
-def check_city_category_availability(city, category, dataframe):
+def check_city_category_availability(city, category, catalog):
     """
     Check if a specific city-category combination exists in the dataset
     Returns: dict with 'exists', 'message', 'available_categories', 'available_cities'
     """
-    if dataframe is None or dataframe.empty:
+    if catalog is None or catalog.size == 0:
         return {
             'exists': False,
             'message': "Dataset is not available at the moment.",
@@ -129,94 +130,87 @@ def check_city_category_availability(city, category, dataframe):
             'available_cities': []
         }
     
-    # Get all available cities and categories
-    available_cities = dataframe['city'].unique().tolist()
-    available_categories = dataframe['category'].unique().tolist()
+    # Everything below is precomputed per catalog version, so each answer is a lookup
+    availability = catalog.availability
+    available_cities = list(catalog.cities)
+    available_categories = list(catalog.categories)
     
     # If both city and category are specified
     if city and category:
         # Check if city exists in dataset
-        city_exists = any(c.lower() == city.lower() for c in available_cities)
+        city_exists = catalog.has_city(city)
         
         if not city_exists:
             return {
                 'exists': False,
-                'message': f"Sorry, I don't have data for {city}. Available cities include: {', '.join(available_cities[:5])}{'...' if len(available_cities) > 5 else ''}",
+                'message': f"Sorry, I don't have data for {city}. Available cities include: {availability.city_suggestions}",
                 'available_categories': available_categories,
                 'available_cities': available_cities
             }
         
         # Check if category exists in dataset
-        category_exists = any(c.lower() == category.lower() for c in available_categories)
+        category_exists = catalog.has_category(category)
         
         if not category_exists:
             return {
                 'exists': False,
-                'message': f"Sorry, I don't have data for {category} category. Available categories include: {', '.join(available_categories[:5])}{'...' if len(available_categories) > 5 else ''}",
+                'message': f"Sorry, I don't have data for {category} category. Available categories include: {availability.category_suggestions}",
                 'available_categories': available_categories,
                 'available_cities': available_cities
             }
         
         # Check if the specific city-category combination exists
-        city_category_mask = (
-            (dataframe['city'].str.lower() == city.lower()) & 
-            (dataframe['category'].str.lower() == category.lower())
-        )
-        
-        if not city_category_mask.any():
+        if not availability.exists(city, category):
             # Get available categories for this city
-            city_mask = dataframe['city'].str.lower() == city.lower()
-            available_categories_in_city = dataframe[city_mask]['category'].unique().tolist()
+            available_categories_in_city = list(availability.categories_in(city))
             
             return {
                 'exists': False,
-                'message': f"{city} has no {category} categories in our dataset. Available categories in {city}: {', '.join(available_categories_in_city)}",
+                'message': f"{city} has no {category} categories in our dataset. Available categories in {city}: {availability.categories_text(city)}",
                 'available_categories': available_categories_in_city,
                 'available_cities': available_cities
             }
     
     # If only city is specified
     elif city:
-        city_exists = any(c.lower() == city.lower() for c in available_cities)
+        city_exists = catalog.has_city(city)
         
         if not city_exists:
             return {
                 'exists': False,
-                'message': f"Sorry, I don't have data for {city}. Available cities include: {', '.join(available_cities[:5])}{'...' if len(available_cities) > 5 else ''}",
+                'message': f"Sorry, I don't have data for {city}. Available cities include: {availability.city_suggestions}",
                 'available_categories': available_categories,
                 'available_cities': available_cities
             }
         
         # Get available categories for this city
-        city_mask = dataframe['city'].str.lower() == city.lower()
-        available_categories_in_city = dataframe[city_mask]['category'].unique().tolist()
+        available_categories_in_city = list(availability.categories_in(city))
         
         return {
             'exists': True,
-            'message': f"Found data for {city}. Available categories: {', '.join(available_categories_in_city)}",
+            'message': f"Found data for {city}. Available categories: {availability.categories_text(city)}",
             'available_categories': available_categories_in_city,
             'available_cities': available_cities
         }
     
     # If only category is specified
     elif category:
-        category_exists = any(c.lower() == category.lower() for c in available_categories)
+        category_exists = catalog.has_category(category)
         
         if not category_exists:
             return {
                 'exists': False,
-                'message': f"Sorry, I don't have data for {category} category. Available categories include: {', '.join(available_categories[:5])}{'...' if len(available_categories) > 5 else ''}",
+                'message': f"Sorry, I don't have data for {category} category. Available categories include: {availability.category_suggestions}",
                 'available_categories': available_categories,
                 'available_cities': available_cities
             }
         
         # Get available cities for this category
-        category_mask = dataframe['category'].str.lower() == category.lower()
-        available_cities_in_category = dataframe[category_mask]['city'].unique().tolist()
+        available_cities_in_category = list(availability.cities_with(category))
         
         return {
             'exists': True,
-            'message': f"Found {category} places in: {', '.join(available_cities_in_category)}",
+            'message': f"Found {category} places in: {availability.cities_text(category)}",
             'available_categories': available_categories,
             'available_cities': available_cities_in_category
         }
@@ -273,8 +267,10 @@ def validate_session(session_id):
 @app.route('/api/recommend', methods=['POST'])
 def get_recommendations():
     try:
-        # Check if model is available
-        if model is None or df is None or embeddings is None:
+        # Check if model is available (catalog and embeddings from one snapshot, even during a reload)
+        snapshot = get_snapshot()
+        catalog, embeddings = snapshot.catalog, snapshot.embeddings
+        if model is None or catalog is None or embeddings is None:
             return jsonify({
                 'is_conversation': True,
                 'message': "I'm sorry, but the recommendation system is currently unavailable. The model needs to be trained first. Please run 'python revised.py' to train the model, then restart the server."
@@ -290,6 +286,7 @@ def get_recommendations():
         query = data.get('query', '')
         session_id = data.get('session_id')
         limit = data.get('limit', 5)
+        province = data.get('province')
         
         # Validate session if provided
         if session_id and session_id not in active_sessions:
@@ -298,18 +295,9 @@ def get_recommendations():
         if not query:
             return jsonify({'error': 'No query provided'}), 400
             
-        # Get available cities and categories from the dataframe
-        available_cities = df['city'].unique().tolist()
-        available_categories = df['category'].unique().tolist()
-        
-        # Extract query information
+        # Extract query information (memoized per catalog version)
         try:
-            from revised import extract_query_info
-            city, category, budget, clean_query, sentiment_info, budget_amount = extract_query_info(
-                query,
-                available_cities,
-                available_categories
-            )
+            city, category, budget, clean_query, sentiment_info, budget_amount = parse_query(query, catalog).extracted
         except Exception as e:
             logger.error(f"Error extracting query info: {e}")
             return jsonify({
@@ -318,7 +306,7 @@ def get_recommendations():
             }), 400
         
         # Check if the city-category combination exists in the dataset
-        availability_check = check_city_category_availability(city, category, df)
+        availability_check = check_city_category_availability(city, category, catalog)
         
         if not availability_check['exists']:
             # Return a specific message about data availability
@@ -338,18 +326,19 @@ def get_recommendations():
         
         # Get recommendations
         try:
-            from revised import get_recommendations
+            from destination_model import get_recommendations
             recommendations, scores = get_recommendations(
                 clean_query if clean_query else query,
                 tokenizer,
                 model,
                 embeddings,
-                df,
+                catalog,
                 city=city,
                 category=category,
                 budget=budget,
                 budget_amount=budget_amount,
-                top_n=limit
+                top_n=limit,
+                province=province
             )
         except Exception as e:
             logger.error(f"Error getting recommendations: {e}")
@@ -415,10 +404,12 @@ def get_recommendations():
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Health check endpoint to verify system status"""
+    snapshot = get_snapshot()
+    catalog, embeddings = snapshot.catalog, snapshot.embeddings
     status = {
         'status': 'healthy',
         'model_loaded': model is not None,
-        'data_loaded': df is not None and not df.empty,
+        'data_loaded': catalog is not None and catalog.size > 0,
         'embeddings_loaded': embeddings is not None,
         'tokenizer_loaded': tokenizer is not None,
     }
@@ -426,7 +417,7 @@ def health_check():
     # Check components properly for DataFrames
     components_loaded = [
         model is not None,
-        df is not None and not df.empty,
+        catalog is not None and catalog.size > 0,
         embeddings is not None,
         tokenizer is not None
     ]
@@ -437,38 +428,82 @@ def health_check():
     
     return jsonify(status)
 
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    """Serving metrics for the recommendation pipeline"""
+    return jsonify({
+        'inference_queue': get_queue_stats(),
+        'ner_queue': get_ner_queue_stats(),
+        'query_embedding_cache': get_cache_stats(),
+        'query_info_cache': get_query_info_cache_stats()
+    })
+
+# Serialized /api/dataset/info response for the current catalog version
+dataset_info_snapshot = None
+
+def build_dataset_info_snapshot(catalog):
+    """Summarize and serialize the dataset once per catalog version"""
+    # Get unique cities and categories
+    cities = list(catalog.cities)
+    categories = list(catalog.categories)
+    
+    # Get city-category combinations (exact city values, grouped in one pass over the rows)
+    city_groups = {city: [] for city in cities}
+    for city, category in zip(catalog.columns['city'], catalog.columns['category']):
+        city_groups[city].append(category)
+    city_category_combinations = []
+    for city in cities:
+        city_category_combinations.append({
+            'city': city,
+            'categories': list(dict.fromkeys(city_groups[city])),
+            'count': len(city_groups[city])
+        })
+    
+    body = json.dumps({
+        'total_destinations': catalog.size,
+        'total_cities': len(cities),
+        'total_categories': len(categories),
+        'cities': cities,
+        'categories': categories,
+        'city_category_combinations': city_category_combinations
+    })
+    return {
+        'version': catalog.version,
+        'body': f"{body}\n".encode('utf-8')
+    }
+
+def refresh_dataset_info(catalog):
+    """Catalog listener: replace the snapshot as soon as a new dataset is published"""
+    global dataset_info_snapshot
+    with app.app_context():
+        dataset_info_snapshot = build_dataset_info_snapshot(catalog) if catalog.size else None
+
+add_catalog_listener(refresh_dataset_info)
+if get_catalog() is not None:
+    refresh_dataset_info(get_catalog())
+
 @app.route('/api/dataset/info', methods=['GET'])
 def get_dataset_info():
     """Get information about available cities and categories in the dataset"""
+    global dataset_info_snapshot
     try:
-        if df is None or df.empty:
+        catalog = get_catalog()
+        if catalog is None or catalog.size == 0:
             return jsonify({
                 'error': 'Dataset not available'
             }), 503
         
-        # Get unique cities and categories
-        cities = df['city'].unique().tolist()
-        categories = df['category'].unique().tolist()
-        
-        # Get city-category combinations
-        city_category_combinations = []
-        for city in cities:
-            city_data = df[df['city'] == city]
-            city_categories = city_data['category'].unique().tolist()
-            city_category_combinations.append({
-                'city': city,
-                'categories': city_categories,
-                'count': len(city_data)
-            })
+        snapshot = dataset_info_snapshot
+        if snapshot is None or snapshot['version'] != catalog.version:
+            snapshot = dataset_info_snapshot = build_dataset_info_snapshot(catalog)
         
-        return jsonify({
-            'total_destinations': len(df),
-            'total_cities': len(cities),
-            'total_categories': len(categories),
-            'cities': cities,
-            'categories': categories,
-            'city_category_combinations': city_category_combinations
-        })
+        # The ETag is the catalog's content hash, so it matches across workers and restarts;
+        # conditional requests from pollers get 304 Not Modified without a body. No
+        # Last-Modified: a load time would differ per worker and defeat If-Modified-Since
+        response = app.response_class(snapshot['body'], mimetype='application/json')
+        response.set_etag(snapshot['version'])
+        response.cache_control.no_cache = True
+        return response.make_conditional(request)
         
     except Exception as e:
         logger.error(f"Error getting dataset info: {e}")
@@ -478,8 +513,8 @@ if __name__ == '__main__':
     # Log startup information
     logger.info("Starting application...")
     logger.info(f"Model loaded: {model is not None}")
-    logger.info(f"Data loaded: {df is not None}")
-    logger.info(f"Embeddings loaded: {embeddings is not None}")
+    logger.info(f"Data loaded: {get_catalog() is not None}")
+    logger.info(f"Embeddings loaded: {get_snapshot().embeddings is not None}")
     logger.info(f"Tokenizer loaded: {tokenizer is not None}")
     
     if model is None:
@@ -0,0 +1,67 @@
+"""
+City x category availability, precomputed per catalog
+
+Holds the number of destinations for every (city, category) pair, the
+categories found in each city and the cities offering each category, plus
+the joined lists used in "no such place" messages. Questions like "is there
+a Cafe in Kawit?" become dictionary and array lookups.
+"""
+import numpy as np
+
+SUGGESTION_LIMIT = 5
+
+
+def suggestion_text(values, limit=SUGGESTION_LIMIT):
+    """The first few values joined for a message, with '...' when there are more"""
+    return f"{', '.join(values[:limit])}{'...' if len(values) > limit else ''}"
+
+
+class CityCategoryAvailability:
+    """Counts per (city, category) and the category/city lists derived from them"""
+
+    def __init__(self, catalog):
+        self.city_ids = catalog.city_ids
+        self.category_ids = catalog.category_ids
+
+        # Keyed by the catalog's lowercase city/category codes
+        self.counts = np.zeros((len(self.city_ids), len(self.category_ids)), dtype=np.int32)
+        np.add.at(self.counts, (catalog.city_codes, catalog.category_codes), 1)
+        self.counts.setflags(write=False)
+
+        # Original values in row order, as unique() over the matching rows returns them
+        categories_by_city = {}
+        cities_by_category = {}
+        for city, category in zip(catalog.columns.get('city', []), catalog.columns.get('category', [])):
+            categories_by_city.setdefault(str(city).lower(), {})[category] = None
+            cities_by_category.setdefault(str(category).lower(), {})[city] = None
+        self.categories_by_city = {key: tuple(values) for key, values in categories_by_city.items()}
+        self.cities_by_category = {key: tuple(values) for key, values in cities_by_category.items()}
+
+        # Pre-rendered lists for the availability messages
+        self.categories_by_city_text = {key: ', '.join(values) for key, values in self.categories_by_city.items()}
+        self.cities_by_category_text = {key: ', '.join(values) for key, values in self.cities_by_category.items()}
+        self.city_suggestions = suggestion_text(catalog.cities)
+        self.category_suggestions = suggestion_text(catalog.categories)
+
+    def count(self, city, category):
+        """Destinations in the city with the category (case-insensitive)"""
+        city_id = self.city_ids.get(city.lower())
+        category_id = self.category_ids.get(category.lower())
+        if city_id is None or category_id is None:
+            return 0
+        return int(self.counts[city_id, category_id])
+
+    def exists(self, city, category):
+        return self.count(city, category) > 0
+
+    def categories_in(self, city):
+        return self.categories_by_city.get(city.lower(), ())
+
+    def cities_with(self, category):
+        return self.cities_by_category.get(category.lower(), ())
+
+    def categories_text(self, city):
+        return self.categories_by_city_text.get(city.lower(), '')
+
+    def cities_text(self, category):
+        return self.cities_by_category_text.get(category.lower(), '')
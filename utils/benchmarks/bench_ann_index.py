@@ -0,0 +1,110 @@
+"""
+Benchmark the HNSW index against brute-force scoring: recall@k and latency
+
+Uses the destination embeddings when they exist (queries are perturbed
+copies of indexed vectors), otherwise clustered synthetic vectors (queries
+are new draws from the same clusters).
+
+Two sweeps over the search beam width ef: recall@k for a small k, then recall
+of the candidate pool the server re-scores (k = ann_candidate_pool), which is
+what ann_ef_search tunes in serving. Since ef caps the number of results, an ef
+below the pool also returns a smaller pool.
+
+Usage (from the utils directory):
+    python benchmarks/bench_ann_index.py [--synthetic 20000] [--k 10] [--ef 16 32 64 128 256]
+        [--pool 1000] [--pool-ef 500 1000 1500 2000]
+"""
+import os
+import sys
+import time
+import argparse
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from model_artifacts import DESTINATION_EMBEDDINGS_PATH
+from embedding_matrix import l2_normalize, NormalizedEmbeddings
+from retrieval import top_k_similar
+from hnsw_index import HNSWIndex
+from serving_config import SERVING_CONFIG
+
+HIDDEN_SIZE = 768
+
+def synthetic_embeddings(count, dims, clusters=200, seed=0):
+    """Gaussian clusters, closer to real embeddings than uniform noise"""
+    centers = np.random.default_rng(0).standard_normal((clusters, dims))
+    rng = np.random.default_rng(seed)
+    assignments = rng.integers(0, clusters, count)
+    return (centers[assignments] + 0.6 * rng.standard_normal((count, dims))).astype(np.float32)
+
+def report(name, latencies, recall=None):
+    line = (f"  {name:<18} mean {latencies.mean():8.3f} ms   p50 {np.percentile(latencies, 50):8.3f} ms   "
+            f"p95 {np.percentile(latencies, 95):8.3f} ms")
+    if recall is not None:
+        line += f"   recall {recall:.4f}"
+    print(line)
+
+def sweep(index, vectors, queries, k, ef_values):
+    """Brute force, then HNSW at each ef; recall is the share of the exact top-k found"""
+    exact = []
+    latencies = []
+    for query in queries:
+        started = time.perf_counter()
+        positions, _ = top_k_similar(query, vectors, k)
+        latencies.append((time.perf_counter() - started) * 1000)
+        exact.append(set(positions.tolist()))
+    report('brute force', np.array(latencies), 1.0)
+
+    for ef in ef_values:
+        latencies = []
+        hits = 0
+        for query, expected in zip(queries, exact):
+            started = time.perf_counter()
+            positions, _ = index.search(query, k, ef=ef)
+            latencies.append((time.perf_counter() - started) * 1000)
+            hits += len(expected & set(positions.tolist()))
+        report(f'hnsw ef={ef}', np.array(latencies), hits / (k * len(queries)))
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the HNSW index against brute force')
+    parser.add_argument('--synthetic', type=int, default=0,
+                        help='Use N synthetic embeddings instead of destination_embeddings.npy')
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--m', type=int, default=16)
+    parser.add_argument('--ef-construction', type=int, default=100)
+    parser.add_argument('--ef', type=int, nargs='+', default=[16, 32, 64, 128, 256])
+    parser.add_argument('--pool', type=int, default=SERVING_CONFIG['ann_candidate_pool'])
+    parser.add_argument('--pool-ef', type=int, nargs='+', default=None,
+                        help='ef values for the candidate pool sweep (default: around ann_ef_search)')
+    parser.add_argument('--pool-queries', type=int, default=50)
+    args = parser.parse_args()
+
+    if args.synthetic or not os.path.exists(DESTINATION_EMBEDDINGS_PATH):
+        count = args.synthetic or 20000
+        print(f"Using {count} synthetic embeddings")
+        embeddings = synthetic_embeddings(count, HIDDEN_SIZE)
+        queries = synthetic_embeddings(args.queries, HIDDEN_SIZE, seed=1)
+    else:
+        embeddings = np.load(DESTINATION_EMBEDDINGS_PATH)
+        rng = np.random.default_rng(1)
+        sources = l2_normalize(embeddings[rng.integers(0, len(embeddings), args.queries)])
+        queries = sources + 0.5 * rng.standard_normal(sources.shape).astype(np.float32) / np.sqrt(sources.shape[1])
+    vectors = l2_normalize(embeddings).view(NormalizedEmbeddings)
+
+    started = time.perf_counter()
+    index = HNSWIndex(vectors, m=args.m, ef_construction=args.ef_construction).build(log_every=0)
+    build_seconds = time.perf_counter() - started
+    print(f"Destinations: {len(vectors)}, dimensions: {vectors.shape[1]}, "
+          f"build: {build_seconds:.1f} s (m={args.m}, ef_construction={args.ef_construction})")
+
+    print(f"\nTop-{args.k} search over {args.queries} queries:")
+    sweep(index, vectors, queries, args.k, args.ef)
+
+    pool = min(args.pool, len(vectors))
+    pool_ef = args.pool_ef or sorted({pool // 2, pool, SERVING_CONFIG['ann_ef_search'], 2 * pool})
+    print(f"\nCandidate pool (top-{pool}) over {min(args.pool_queries, len(queries))} queries:")
+    sweep(index, vectors, queries[:args.pool_queries], pool, pool_ef)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Worker startup: dataset + checkpoint + from_pretrained vs. the serving bundle
+
+"legacy" replays the old boot: read final_dataset.csv, preprocess it (fitting
+the LabelEncoder), build DestinationRecommender with from_pretrained, load
+wertigo.pt over it and load the tokenizer twice (app.py and model_handler).
+"bundle" opens the serving bundle, builds the model from its config over the
+mapped weights and takes the catalog, tokenizer and embeddings from it. Each
+scenario runs in a fresh interpreter (the bundle one with HF_HUB_OFFLINE=1);
+wall time and peak RSS are reported. Also checks that both models produce the
+same query embeddings.
+
+Usage (from the utils directory, after python serving_bundle.py):
+    python benchmarks/bench_bundle_startup.py [--repeat 3]
+"""
+import os
+import sys
+import json
+import argparse
+import subprocess
+import numpy as np
+
+UTILS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, UTILS_DIR)
+
+from queries import SAMPLE_QUERIES
+from model_artifacts import MODEL_PATH, DATA_FILE, SERVING_BUNDLE_PATH
+
+LEGACY_SCRIPT = """
+import sys, time, json, resource
+sys.path.insert(0, {utils_dir!r})
+started = time.perf_counter()
+import torch
+from transformers import RobertaTokenizer
+from destination_model import DestinationRecommender, load_data, preprocess_data
+df, label_encoder = preprocess_data(load_data({data_file!r}))
+model = DestinationRecommender(len(label_encoder.classes_))
+model.load_state_dict(torch.load({model_path!r}, map_location='cpu'))
+model.eval()
+tokenizers = [RobertaTokenizer.from_pretrained('roberta-base') for _ in range(2)]
+elapsed = time.perf_counter() - started
+print(json.dumps({{'seconds': elapsed, 'max_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}}))
+"""
+
+BUNDLE_SCRIPT = """
+import sys, time, json, resource
+sys.path.insert(0, {utils_dir!r})
+started = time.perf_counter()
+from serving_bundle import ServingBundle
+bundle = ServingBundle({bundle_path!r})
+model = bundle.build_model()
+df = bundle.catalog_frame()
+tokenizer = bundle.tokenizer()
+embeddings = bundle.embeddings()
+elapsed = time.perf_counter() - started
+print(json.dumps({{'seconds': elapsed, 'max_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}}))
+"""
+
+def run(script, env=None):
+    result = subprocess.run([sys.executable, '-c', script], cwd=UTILS_DIR, capture_output=True, text=True,
+                            env=dict(os.environ, **(env or {})))
+    if result.returncode != 0:
+        raise SystemExit(result.stderr[-2000:])
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def check_parity(bundle_path):
+    """Both boot paths must encode queries identically"""
+    import torch
+    from transformers import RobertaTokenizer
+    from destination_model import DestinationRecommender
+    from serving_bundle import ServingBundle
+    from text_encoder import encode_texts
+
+    bundle = ServingBundle(bundle_path)
+    legacy = DestinationRecommender(len(bundle.label_classes()))
+    legacy.load_state_dict(torch.load(MODEL_PATH, map_location='cpu'))
+    legacy.eval()
+    queries = list(SAMPLE_QUERIES[:32])
+    expected = encode_texts(queries, RobertaTokenizer.from_pretrained('roberta-base'), legacy)
+    actual = encode_texts(queries, bundle.tokenizer(), bundle.build_model())
+    difference = float(np.abs(expected - actual).max())
+    if difference > 1e-5:
+        raise SystemExit(f"Bundle model differs from the checkpoint: max abs difference {difference:.2e}")
+    print(f"Same query embeddings for {len(queries)} queries (max abs difference {difference:.1e})")
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure worker startup with and without the serving bundle')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--bundle', default=SERVING_BUNDLE_PATH)
+    args = parser.parse_args()
+
+    if not os.path.exists(args.bundle):
+        raise SystemExit(f"No serving bundle at {args.bundle}. Export it with: python serving_bundle.py")
+    check_parity(args.bundle)
+
+    scenarios = {
+        'legacy (csv + from_pretrained)': (LEGACY_SCRIPT.format(utils_dir=UTILS_DIR, data_file=DATA_FILE,
+                                                                model_path=MODEL_PATH), None),
+        'bundle (offline)': (BUNDLE_SCRIPT.format(utils_dir=UTILS_DIR, bundle_path=args.bundle),
+                             {'HF_HUB_OFFLINE': '1', 'TRANSFORMERS_OFFLINE': '1'}),
+    }
+    for name, (script, env) in scenarios.items():
+        runs = [run(script, env) for _ in range(args.repeat)]
+        seconds = np.array([entry['seconds'] for entry in runs])
+        rss_mb = max(entry['max_rss_kb'] for entry in runs) / 1024
+        print(f"{name:32s} median {np.median(seconds):7.2f} s   min {seconds.min():7.2f} s   peak RSS {rss_mb:7.0f} MB")
+
+if __name__ == "__main__":
+    main()
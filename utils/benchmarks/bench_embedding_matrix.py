@@ -0,0 +1,129 @@
+"""
+Benchmark destination embedding formats: per-worker memory and scoring latency
+
+Compares the full float32 array loaded into every process (re-normalized on
+every request) against the pre-normalized, memory-mapped float32 and float16
+matrices. Memory is measured in forked worker processes that all hold the
+matrix at the same time; PSS splits shared pages between the processes that
+map them, so it shows what each worker really costs. Linux only.
+
+Usage (from the utils directory):
+    python benchmarks/bench_embedding_matrix.py [--workers 4] [--synthetic 20000]
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import multiprocessing
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from model_artifacts import DESTINATION_EMBEDDINGS_PATH
+from embedding_matrix import write_normalized, open_normalized, cosine_scores
+
+HIDDEN_SIZE = 768
+
+def memory_kb():
+    """Current process RSS and PSS in kB"""
+    values = {}
+    with open('/proc/self/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if parts[0] in ('Rss:', 'Pss:'):
+                values[parts[0][:-1]] = int(parts[1])
+    return values['Rss'], values['Pss']
+
+def time_calls(fn, repeats):
+    """Run fn repeatedly and return latencies in milliseconds"""
+    fn()  # warm-up
+    latencies = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn()
+        latencies.append((time.perf_counter() - started) * 1000)
+    return np.array(latencies)
+
+def report(name, latencies):
+    print(f"  {name:<28} mean {latencies.mean():8.3f} ms   p50 {np.percentile(latencies, 50):8.3f} ms   "
+          f"p95 {np.percentile(latencies, 95):8.3f} ms")
+
+def open_matrix(mode, paths):
+    if mode == 'np.load float32':
+        return np.load(paths['raw'])
+    return open_normalized(paths[mode])
+
+def worker(mode, paths, query, barrier, results):
+    rss_before, pss_before = memory_kb()
+    matrix = open_matrix(mode, paths)
+    cosine_scores(query, matrix)  # touch every page
+    barrier.wait()                # every worker holds the matrix now
+    rss_after, pss_after = memory_kb()
+    results.put((rss_after - rss_before, pss_after - pss_before))
+    barrier.wait()
+
+def measure_workers(mode, paths, query, num_workers):
+    """Mean RSS and PSS growth per worker, in MB"""
+    context = multiprocessing.get_context('fork')
+    barrier = context.Barrier(num_workers)
+    results = context.Queue()
+    processes = [context.Process(target=worker, args=(mode, paths, query, barrier, results))
+                 for _ in range(num_workers)]
+    for process in processes:
+        process.start()
+    samples = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    rss, pss = np.mean(samples, axis=0) / 1024
+    return rss, pss
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark destination embedding formats')
+    parser.add_argument('--workers', type=int, default=4, help='Concurrent worker processes')
+    parser.add_argument('--synthetic', type=int, default=0,
+                        help='Use N random embeddings instead of destination_embeddings.npy')
+    parser.add_argument('--repeats', type=int, default=200, help='Scoring calls per format')
+    args = parser.parse_args()
+
+    if args.synthetic or not os.path.exists(DESTINATION_EMBEDDINGS_PATH):
+        count = args.synthetic or 20000
+        print(f"Using {count} synthetic embeddings")
+        embeddings = np.random.default_rng(0).standard_normal((count, HIDDEN_SIZE)).astype(np.float32)
+    else:
+        embeddings = np.load(DESTINATION_EMBEDDINGS_PATH)
+    query = np.random.default_rng(1).standard_normal((1, embeddings.shape[1])).astype(np.float32)
+
+    with tempfile.TemporaryDirectory() as directory:
+        paths = {
+            'raw': os.path.join(directory, 'raw.npy'),
+            'mmap normalized float32': os.path.join(directory, 'normalized_float32.npy'),
+            'mmap normalized float16': os.path.join(directory, 'normalized_float16.npy'),
+        }
+        np.save(paths['raw'], embeddings)
+        write_normalized(paths['mmap normalized float32'], embeddings, 'float32')
+        write_normalized(paths['mmap normalized float16'], embeddings, 'float16')
+        modes = ['np.load float32', 'mmap normalized float32', 'mmap normalized float16']
+
+        print(f"Destinations: {len(embeddings)}, dimensions: {embeddings.shape[1]}, "
+              f"float32 size: {embeddings.nbytes / 1e6:.1f} MB")
+
+        reference = cosine_scores(query, embeddings)
+        print("\nScore agreement with the float32 path:")
+        for mode in modes[1:]:
+            scores = cosine_scores(query, open_matrix(mode, paths))
+            same_top = np.array_equal(np.argsort(-reference)[:10], np.argsort(-scores)[:10])
+            print(f"  {mode:<28} max abs error {np.abs(scores - reference).max():.2e}   same top-10: {same_top}")
+
+        print("\nScoring latency (one query against every destination):")
+        for mode in modes:
+            matrix = open_matrix(mode, paths)
+            report(mode, time_calls(lambda: cosine_scores(query, matrix), args.repeats))
+
+        print(f"\nMemory growth per worker ({args.workers} workers holding the matrix at once):")
+        for mode in modes:
+            rss, pss = measure_workers(mode, paths, query, args.workers)
+            print(f"  {mode:<28} RSS {rss:8.1f} MB   PSS {pss:8.1f} MB")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""
+Regression check and benchmark for the fuzzy city index
+
+Runs the original SequenceMatcher loops from recommend_internal (query vs.
+every city and every city word) and from the extract_query_info city
+validation (detected name vs. every city) over a regression set of typo'd,
+truncated, multi-word and unrelated queries, checks that FuzzyCityIndex
+returns the same city and ratio for every one, and reports latency.
+
+Usage (from the utils directory):
+    python benchmarks/bench_fuzzy_cities.py [--cities 50 500 2000] [--queries 500]
+"""
+import os
+import sys
+import time
+import argparse
+from difflib import SequenceMatcher
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fuzzy_match import FuzzyCityIndex
+from reranker import CAVITE_CITIES
+from bench_ann_index import report
+
+KNOWN_CITIES = [city.title() for city in CAVITE_CITIES] + [
+    'Manila', 'Quezon City', 'Makati', 'Pasig', 'Taguig', 'Baguio', 'Cebu City', 'Davao City',
+    'Cavite City', 'San Pablo', 'Puerto Princesa', 'El Nido', 'Coron', 'Vigan', 'Sagada',
+    'Iloilo City', 'Bacolod', 'Dumaguete', 'San Juan', 'Los Baños', 'Calamba', 'Santa Rosa',
+]
+SYLLABLES = ['ba', 'ca', 'da', 'ga', 'la', 'ma', 'na', 'pa', 'sa', 'ta', 'an', 'ig', 'on', 'ro', 'si', 'lu', 'co', 'nes']
+FILLER = ['cafe', 'in', 'near', 'best', 'beach', 'resort', 'the', 'city', 'hotel', 'museum']
+
+def synthetic_cities(count, seed=0):
+    rng = np.random.default_rng(seed)
+    cities = list(dict.fromkeys(KNOWN_CITIES))
+    while len(cities) < count:
+        words = [''.join(rng.choice(SYLLABLES, rng.integers(2, 5))).title() for _ in range(rng.integers(1, 3))]
+        cities.append(' '.join(words))
+        cities = list(dict.fromkeys(cities))
+    return cities
+
+def typo(text, rng):
+    chars = list(text)
+    for _ in range(rng.integers(1, 3)):
+        position = int(rng.integers(0, max(len(chars), 1)))
+        action = rng.integers(0, 3)
+        if action == 0 and chars:
+            del chars[position % len(chars)]
+        elif action == 1:
+            chars.insert(position, rng.choice(list('aeiounrst')))
+        elif chars:
+            chars[position % len(chars)] = rng.choice(list('aeiounrst'))
+    return ''.join(chars)
+
+def regression_queries(cities, count, seed=1):
+    rng = np.random.default_rng(seed)
+    queries = ['', '?', '   ', 'tagaytay', 'tagaytya', 'gen trias', 'dasma', 'imus cafe', 'quezon', 'cebu']
+    while len(queries) < count:
+        city = cities[int(rng.integers(0, len(cities)))].lower()
+        kind = rng.integers(0, 5)
+        if kind == 0:
+            query = typo(city, rng)
+        elif kind == 1:
+            query = city[:max(3, int(len(city) * rng.uniform(0.4, 0.9)))]
+        elif kind == 2:
+            query = f"{rng.choice(FILLER)} {typo(city, rng)}"
+        elif kind == 3:
+            query = f"{typo(city.split()[0], rng)} {rng.choice(FILLER)} {rng.choice(FILLER)}"
+        else:
+            query = ' '.join(rng.choice(FILLER, rng.integers(1, 4)))
+        queries.append(query)
+    return queries
+
+def reference_match_query(query_lower, available_cities):
+    """The original fuzzy block from recommend_internal"""
+    best_match = None
+    best_ratio = 0.7
+    for available_city in available_cities:
+        city_parts = available_city.lower().split()
+        query_parts = query_lower.split()
+        normalized_city = ''.join(e for e in available_city.lower() if e.isalnum())
+        normalized_query = ''.join(e for e in query_lower if e.isalnum())
+        full_ratio = SequenceMatcher(None, normalized_query, normalized_city).ratio()
+        if full_ratio > best_ratio:
+            best_ratio = full_ratio
+            best_match = available_city
+        for city_part in city_parts:
+            for query_part in query_parts:
+                normalized_city_part = ''.join(e for e in city_part if e.isalnum())
+                normalized_query_part = ''.join(e for e in query_part if e.isalnum())
+                part_ratio = SequenceMatcher(None, normalized_query_part, normalized_city_part).ratio()
+                weighted_ratio = part_ratio * (len(normalized_query_part) / len(normalized_query))
+                if weighted_ratio > best_ratio:
+                    best_ratio = weighted_ratio
+                    best_match = available_city
+    return best_match, best_ratio
+
+def reference_closest(detected_city, available_cities):
+    """The original fuzzy fallback of the extract_query_info city validation"""
+    best_match = None
+    best_ratio = 0.6
+    for available_city in available_cities:
+        ratio = SequenceMatcher(None, detected_city.lower(), available_city.lower()).ratio()
+        if ratio > best_ratio:
+            best_ratio = ratio
+            best_match = available_city
+    return best_match, best_ratio
+
+def timed(function, queries):
+    latencies = []
+    results = []
+    for query in queries:
+        started = time.perf_counter()
+        try:
+            results.append(function(query))
+        except ZeroDivisionError:
+            # The old loop divided by zero on queries without letters or digits
+            results.append((None, None))
+        latencies.append((time.perf_counter() - started) * 1000)
+    return results, np.array(latencies)
+
+def main():
+    parser = argparse.ArgumentParser(description='Check and benchmark the fuzzy city index')
+    parser.add_argument('--cities', type=int, nargs='+', default=[50, 500, 2000])
+    parser.add_argument('--queries', type=int, default=500)
+    args = parser.parse_args()
+
+    for count in args.cities:
+        cities = synthetic_cities(count)
+        queries = regression_queries(cities, args.queries)
+        started = time.perf_counter()
+        index = FuzzyCityIndex(cities)
+        print(f"\n{len(cities)} cities, {len(queries)} queries, index build: {(time.perf_counter() - started) * 1000:.1f} ms")
+
+        for name, reference, indexed, threshold in (
+                ('query match', lambda q: reference_match_query(q, cities), index.match_query, 0.7),
+                ('name validation', lambda q: reference_closest(q, cities), index.closest, 0.6)):
+            expected, loop_latencies = timed(reference, queries)
+            actual, index_latencies = timed(indexed, queries)
+            matched = 0
+            for query, want, got in zip(queries, expected, actual):
+                if want == (None, None):
+                    if got != (None, threshold):
+                        raise SystemExit(f"{name}: expected no match for {query!r}, got {got}")
+                    continue
+                if want != got:
+                    raise SystemExit(f"{name}: mismatch for {query!r}: loop {want}, index {got}")
+                matched += want[0] is not None
+            print(f"{name}: identical results ({matched} matched)")
+            report('SequenceMatcher loop', loop_latencies)
+            report('fuzzy index', index_latencies)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Benchmark query encoding latency: PyTorch vs ONNX Runtime
+
+Export the encoder first with: python onnx_encoder.py
+Usage (from the utils directory):
+    python benchmarks/bench_onnx_encoder.py
+"""
+import os
+import sys
+import time
+import numpy as np
+import torch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from queries import SAMPLE_QUERIES
+import model_handler
+from model_artifacts import ONNX_MODEL_PATH
+from onnx_encoder import OnnxEncoder, check_parity, PARITY_THRESHOLD
+from text_encoder import encode_texts
+
+def time_calls(fn, repeats):
+    """Run fn repeatedly and return latencies in milliseconds"""
+    fn()  # warm-up
+    latencies = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn()
+        latencies.append((time.perf_counter() - started) * 1000)
+    return np.array(latencies)
+
+def report(name, latencies):
+    print(f"  {name:<14} mean {latencies.mean():8.2f} ms   p50 {np.percentile(latencies, 50):8.2f} ms   "
+          f"p95 {np.percentile(latencies, 95):8.2f} ms")
+
+def main(repeats=10):
+    model = model_handler.model
+    tokenizer = model_handler.tokenizer
+    if model is None or tokenizer is None:
+        print("Model is not available. Train it first with: python revised.py")
+        return
+    if not os.path.exists(ONNX_MODEL_PATH):
+        print(f"{ONNX_MODEL_PATH} not found. Export it first with: python onnx_encoder.py")
+        return
+
+    onnx_encoder = OnnxEncoder(ONNX_MODEL_PATH)
+    print(f"torch threads: {torch.get_num_threads()}, queries: {len(SAMPLE_QUERIES)}")
+
+    cosine = check_parity(model, onnx_encoder, tokenizer, SAMPLE_QUERIES)
+    status = "PASS" if cosine.min() >= PARITY_THRESHOLD else "FAIL"
+    print(f"Parity: min cosine {cosine.min():.6f}, mean {cosine.mean():.6f} (threshold {PARITY_THRESHOLD}) {status}")
+
+    print("\nPer-query latency:")
+    torch_single = np.concatenate([
+        time_calls(lambda q=q: encode_texts([q], tokenizer, model), repeats) for q in SAMPLE_QUERIES
+    ])
+    onnx_single = np.concatenate([
+        time_calls(lambda q=q: encode_texts([q], tokenizer, onnx_encoder), repeats) for q in SAMPLE_QUERIES
+    ])
+    report("PyTorch", torch_single)
+    report("ONNX Runtime", onnx_single)
+    print(f"  speedup (p50): {np.percentile(torch_single, 50) / np.percentile(onnx_single, 50):.2f}x")
+
+    print(f"\nBatch latency ({len(SAMPLE_QUERIES)} queries):")
+    torch_batch = time_calls(lambda: encode_texts(SAMPLE_QUERIES, tokenizer, model), repeats)
+    onnx_batch = time_calls(lambda: encode_texts(SAMPLE_QUERIES, tokenizer, onnx_encoder), repeats)
+    report("PyTorch", torch_batch)
+    report("ONNX Runtime", onnx_batch)
+    print(f"  speedup (p50): {np.percentile(torch_batch, 50) / np.percentile(onnx_batch, 50):.2f}x")
+
+if __name__ == "__main__":
+    main()
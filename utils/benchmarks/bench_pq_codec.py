@@ -0,0 +1,83 @@
+"""
+Benchmark product-quantized embeddings: memory, recall@k and latency
+
+Compares exact float32 scoring with PQ asymmetric scoring, alone and with an
+exact re-rank of the best candidates against the full vectors. Uses the
+destination embeddings when they exist, otherwise clustered synthetic vectors.
+
+Usage (from the utils directory):
+    python benchmarks/bench_pq_codec.py [--synthetic 20000] [--subspaces 64] [--rerank 0 50 200 1000]
+"""
+import os
+import sys
+import time
+import argparse
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from model_artifacts import DESTINATION_EMBEDDINGS_PATH
+from embedding_matrix import l2_normalize, NormalizedEmbeddings
+from retrieval import top_k_similar
+from pq_codec import PQIndex
+from bench_ann_index import synthetic_embeddings, report
+
+HIDDEN_SIZE = 768
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark product-quantized embeddings')
+    parser.add_argument('--synthetic', type=int, default=0,
+                        help='Use N synthetic embeddings instead of destination_embeddings.npy')
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--subspaces', type=int, default=64)
+    parser.add_argument('--rerank', type=int, nargs='+', default=[0, 50, 200, 1000])
+    args = parser.parse_args()
+
+    if args.synthetic or not os.path.exists(DESTINATION_EMBEDDINGS_PATH):
+        count = args.synthetic or 20000
+        print(f"Using {count} synthetic embeddings")
+        embeddings = synthetic_embeddings(count, HIDDEN_SIZE)
+        queries = synthetic_embeddings(args.queries, HIDDEN_SIZE, seed=1)
+    else:
+        embeddings = np.load(DESTINATION_EMBEDDINGS_PATH)
+        rng = np.random.default_rng(1)
+        sources = l2_normalize(embeddings[rng.integers(0, len(embeddings), args.queries)])
+        queries = sources + 0.5 * rng.standard_normal(sources.shape).astype(np.float32) / np.sqrt(sources.shape[1])
+    vectors = l2_normalize(embeddings).view(NormalizedEmbeddings)
+
+    started = time.perf_counter()
+    index = PQIndex.build(vectors, num_subspaces=args.subspaces)
+    build_seconds = time.perf_counter() - started
+
+    print(f"Destinations: {len(vectors)}, dimensions: {vectors.shape[1]}, "
+          f"subspaces: {args.subspaces}, build: {build_seconds:.1f} s")
+    print("\nMemory held per process:")
+    print(f"  float32 vectors   {vectors.nbytes / 1e6:8.2f} MB   ({vectors.nbytes // len(vectors)} bytes per destination)")
+    print(f"  PQ codes+codebooks{index.nbytes / 1e6:8.2f} MB   ({args.subspaces} bytes per destination, "
+          f"{vectors.nbytes / index.nbytes:.0f}x smaller)")
+
+    exact = []
+    latencies = []
+    for query in queries:
+        started = time.perf_counter()
+        positions, _ = top_k_similar(query, vectors, args.k)
+        latencies.append((time.perf_counter() - started) * 1000)
+        exact.append(set(positions.tolist()))
+
+    print(f"\nTop-{args.k} search over {len(queries)} queries:")
+    report('exact float32', np.array(latencies), 1.0)
+
+    for rerank in args.rerank:
+        latencies = []
+        hits = 0
+        for query, expected in zip(queries, exact):
+            started = time.perf_counter()
+            positions, _ = index.search(query, args.k, rerank=rerank)
+            latencies.append((time.perf_counter() - started) * 1000)
+            hits += len(expected & set(positions.tolist()))
+        name = 'pq (no re-rank)' if not rerank else f'pq + re-rank {rerank}'
+        report(name, np.array(latencies), hits / (args.k * len(queries)))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Benchmark query encoding latency: fixed 512-token padding vs dynamic padding
+
+Usage (from the utils directory):
+    python benchmarks/bench_query_encoding.py
+"""
+import os
+import sys
+import time
+import numpy as np
+import torch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from queries import SAMPLE_QUERIES
+import model_handler
+from text_encoder import encode_texts
+
+def encode_fixed_padding(texts, tokenizer, model, device):
+    """The previous encoding path: every text padded to 512 tokens"""
+    encoding = tokenizer(
+        list(texts),
+        add_special_tokens=True,
+        max_length=512,
+        return_token_type_ids=False,
+        padding='max_length',
+        truncation=True,
+        return_attention_mask=True,
+        return_tensors='pt'
+    ).to(device)
+    with torch.no_grad():
+        outputs = model.roberta(
+            input_ids=encoding['input_ids'],
+            attention_mask=encoding['attention_mask']
+        )
+        return outputs.last_hidden_state[:, 0, :].cpu().numpy()
+
+def time_calls(fn, repeats):
+    """Run fn repeatedly and return latencies in milliseconds"""
+    fn()  # warm-up
+    latencies = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn()
+        latencies.append((time.perf_counter() - started) * 1000)
+    return np.array(latencies)
+
+def report(name, latencies):
+    print(f"  {name:<28} mean {latencies.mean():8.2f} ms   p50 {np.percentile(latencies, 50):8.2f} ms   "
+          f"p95 {np.percentile(latencies, 95):8.2f} ms")
+
+def main(repeats=5):
+    model = model_handler.model
+    tokenizer = model_handler.tokenizer
+    device = model_handler.device
+    if model is None or tokenizer is None:
+        print("Model is not available. Train it first with: python revised.py")
+        return
+
+    model.eval()
+    print(f"Device: {device}, torch threads: {torch.get_num_threads()}, queries: {len(SAMPLE_QUERIES)}")
+
+    # Embeddings must agree between the two paths
+    fixed = encode_fixed_padding(SAMPLE_QUERIES, tokenizer, model, device)
+    dynamic = encode_texts(SAMPLE_QUERIES, tokenizer, model, device=device)
+    cosine = np.sum(fixed * dynamic, axis=1) / (np.linalg.norm(fixed, axis=1) * np.linalg.norm(dynamic, axis=1))
+    print(f"Min cosine similarity between paths: {cosine.min():.6f}")
+
+    print("\nPer-query latency (one query per forward pass):")
+    fixed_single = np.concatenate([
+        time_calls(lambda q=q: encode_fixed_padding([q], tokenizer, model, device), repeats)
+        for q in SAMPLE_QUERIES
+    ])
+    dynamic_single = np.concatenate([
+        time_calls(lambda q=q: encode_texts([q], tokenizer, model, device=device), repeats)
+        for q in SAMPLE_QUERIES
+    ])
+    report("padding='max_length' (512)", fixed_single)
+    report("dynamic padding", dynamic_single)
+    print(f"  speedup (p50): {np.percentile(fixed_single, 50) / np.percentile(dynamic_single, 50):.1f}x")
+
+    print(f"\nBatch latency ({len(SAMPLE_QUERIES)} queries per forward pass):")
+    fixed_batch = time_calls(lambda: encode_fixed_padding(SAMPLE_QUERIES, tokenizer, model, device), repeats)
+    dynamic_batch = time_calls(lambda: encode_texts(SAMPLE_QUERIES, tokenizer, model, device=device), repeats)
+    report("padding='max_length' (512)", fixed_batch)
+    report("dynamic padding + buckets", dynamic_batch)
+    print(f"  speedup (p50): {np.percentile(fixed_batch, 50) / np.percentile(dynamic_batch, 50):.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Benchmark spaCy NER for query understanding: full pipeline vs. the lean NER-only one
+
+Loads en_core_web_sm with every component and the lean pipeline from
+query_understanding, checks that both find the same place names (GPE) in
+every query, and reports latency per query (nlp(text)) and per batch of 64
+(nlp.pipe), plus extract_query_info one at a time vs. extract_query_info_batch.
+
+Usage (from the utils directory):
+    python benchmarks/bench_query_ner.py [--batch-size 64] [--batches 20]
+"""
+import os
+import sys
+import time
+import argparse
+import numpy as np
+import spacy
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from queries import SAMPLE_QUERIES
+from bench_ann_index import report
+import query_understanding
+from query_understanding import SPACY_MODEL, get_nlp, extract_query_info, extract_query_info_batch
+from serving_config import SERVING_CONFIG
+
+CITIES = ['Tagaytay', 'Ternate', 'Silang', 'Kawit', 'Imus', 'Maragondon', 'Dasmarinas', 'Bacoor',
+          'Amadeo', 'Indang', 'General Trias', 'Cavite City', 'Alfonso']
+CATEGORIES = ['Cafe', 'Beach Resort', 'Historical Site', 'Church', 'Natural Attraction', 'Restaurant',
+              'Park', 'Hotel', 'Museum']
+
+def places(doc):
+    return tuple(ent.text for ent in doc.ents if ent.label_ == "GPE")
+
+def per_query(nlp, queries):
+    latencies = []
+    for query in queries:
+        started = time.perf_counter()
+        nlp(query)
+        latencies.append((time.perf_counter() - started) * 1000)
+    return np.array(latencies)
+
+def per_batch(function, batches):
+    latencies = []
+    for batch in batches:
+        started = time.perf_counter()
+        function(batch)
+        latencies.append((time.perf_counter() - started) * 1000)
+    return np.array(latencies)
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the lean spaCy NER pipeline')
+    parser.add_argument('--batch-size', type=int, default=64)
+    parser.add_argument('--batches', type=int, default=20)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    batches = [list(rng.choice(SAMPLE_QUERIES, args.batch_size)) for _ in range(args.batches)]
+    queries = [query for batch in batches for query in batch]
+
+    started = time.perf_counter()
+    full = spacy.load(SPACY_MODEL)
+    print(f"Full pipeline {full.pipe_names}: loaded in {time.perf_counter() - started:.2f} s")
+    started = time.perf_counter()
+    lean = get_nlp()
+    print(f"Lean pipeline {lean.pipe_names}: loaded in {time.perf_counter() - started:.2f} s")
+
+    for query in SAMPLE_QUERIES:
+        if places(full(query)) != places(lean(query)):
+            raise SystemExit(f"Different place names for {query!r}: {places(full(query))} vs {places(lean(query))}")
+    print(f"Same place names for all {len(SAMPLE_QUERIES)} sample queries")
+
+    for nlp in (full, lean):
+        nlp(SAMPLE_QUERIES[0])  # warm-up
+    print(f"\nPer query ({len(queries)} queries):")
+    report('full nlp(text)', per_query(full, queries))
+    report('lean nlp(text)', per_query(lean, queries))
+
+    print(f"\nPer batch of {args.batch_size} ({args.batches} batches):")
+    report('full nlp.pipe', per_batch(lambda batch: list(full.pipe(batch, batch_size=args.batch_size)), batches))
+    report('lean nlp.pipe', per_batch(lambda batch: list(lean.pipe(batch, batch_size=args.batch_size)), batches))
+
+    # Whole extract_query_info (NER, gazetteer, budget, cleaned query), without the request queue
+    SERVING_CONFIG['ner_micro_batching'] = False
+    one_by_one = per_batch(lambda batch: [extract_query_info(query, CITIES, CATEGORIES) for query in batch], batches)
+    batched = per_batch(lambda batch: extract_query_info_batch(batch, CITIES, CATEGORIES, batch_size=args.batch_size), batches)
+    for batch in batches[:3]:
+        if [extract_query_info(query, CITIES, CATEGORIES) for query in batch] != extract_query_info_batch(batch, CITIES, CATEGORIES):
+            raise SystemExit("extract_query_info_batch differs from extract_query_info")
+    print(f"\nextract_query_info per batch of {args.batch_size} (same results):")
+    report('one query at a time', one_by_one)
+    report('extract_query_info_batch', batched)
+    print(f"\nLoaded resources: {query_understanding.loaded_resources()}")
+
+if __name__ == "__main__":
+    main()
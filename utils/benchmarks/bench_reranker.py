@@ -0,0 +1,126 @@
+"""
+Benchmark the vectorized re-ranker against the per-row df.iloc scoring loop
+
+Builds a synthetic catalog (with Cavite rows, provinces, missing and
+unparseable ratings and popularity), checks that both paths give bit-identical
+scores and the same ranking, and reports per-request latency for several
+candidate counts.
+
+Usage (from the utils directory):
+    python benchmarks/bench_reranker.py [--destinations 20000] [--candidates 100 1000 5000]
+"""
+import os
+import sys
+import time
+import argparse
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from reranker import DestinationReranker, CAVITE_CITIES
+from retrieval import top_k
+from bench_ann_index import report
+
+CITIES = CAVITE_CITIES + ['Manila', 'Quezon City', 'Makati', 'Baguio', 'Cebu City', 'Cavite City', 'San Pablo']
+PROVINCES = ['Cavite', 'Metro Manila', 'Benguet', 'Cebu', 'Laguna', '']
+CATEGORIES = ['Cafe', 'Restaurant', 'Resort', 'Museum', 'Park', 'Historical Site']
+
+def synthetic_catalog(count, seed=0):
+    rng = np.random.default_rng(seed)
+    ratings = np.round(rng.uniform(1, 5, count), 1).astype(str).astype(object)
+    ratings[rng.random(count) < 0.05] = ''
+    ratings[rng.random(count) < 0.02] = None
+    popularity = rng.integers(0, 100, count).astype(object)
+    popularity[rng.random(count) < 0.05] = 'n/a'
+    return pd.DataFrame({
+        'name': [f'Place {i}' for i in range(count)],
+        'city': rng.choice(CITIES, count),
+        'province': rng.choice(PROVINCES, count),
+        'category': rng.choice(CATEGORIES, count),
+        'ratings': ratings,
+        'popularity_score': popularity,
+    })
+
+def reference_scores(df, filtered_indices, similarities, detected_city, detected_category):
+    """The original per-row scoring loop from recommend_internal"""
+    scored_indices = []
+    filtered_scores = []
+    for idx in filtered_indices:
+        base_score = similarities[idx]
+        location_multiplier = 1.0
+        if detected_city:
+            current_city = df.iloc[idx]['city'].lower()
+            current_province = df.iloc[idx]['province'].lower() if 'province' in df.columns else ''
+            if current_city == detected_city.lower():
+                location_multiplier = 2.5
+            elif current_province == 'cavite':
+                if detected_city.lower() in CAVITE_CITIES:
+                    location_multiplier = 2.0
+                elif 'cavite' in detected_city.lower():
+                    location_multiplier = 1.8
+            elif detected_city.lower() in current_city or current_city in detected_city.lower():
+                location_multiplier = 1.5
+            elif current_province and detected_city.lower() in current_province:
+                location_multiplier = 1.2
+        base_score *= location_multiplier
+        if detected_category and df.iloc[idx]['category'].lower() == detected_category.lower():
+            base_score *= 1.3
+        if 'ratings' in df.columns and df.iloc[idx]['ratings'] is not None:
+            try:
+                rating = float(df.iloc[idx]['ratings'])
+                base_score *= (1 + (rating / 10))
+            except (ValueError, TypeError):
+                pass
+        if 'popularity_score' in df.columns and df.iloc[idx]['popularity_score'] is not None:
+            try:
+                popularity = float(df.iloc[idx]['popularity_score'])
+                base_score *= (1 + (popularity / 100))
+            except (ValueError, TypeError):
+                pass
+        scored_indices.append(idx)
+        filtered_scores.append(base_score)
+    return scored_indices, filtered_scores
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the vectorized re-ranker')
+    parser.add_argument('--destinations', type=int, default=20000)
+    parser.add_argument('--candidates', type=int, nargs='+', default=[100, 1000, 5000])
+    parser.add_argument('--requests', type=int, default=10)
+    args = parser.parse_args()
+
+    df = synthetic_catalog(args.destinations)
+    started = time.perf_counter()
+    reranker = DestinationReranker(df)
+    print(f"Destinations: {len(df)}, precompute: {(time.perf_counter() - started) * 1000:.1f} ms")
+
+    rng = np.random.default_rng(1)
+    queries = [('Tagaytay', 'Cafe'), ('cavite', None), ('Manila', 'Restaurant'), ('Benguet', None), (None, 'Park')]
+    for count in args.candidates:
+        count = min(count, len(df))
+        loop_latencies = []
+        vector_latencies = []
+        for request in range(args.requests):
+            city, category = queries[request % len(queries)]
+            positions = np.sort(rng.choice(len(df), count, replace=False))
+            similarities = rng.random(len(df)).astype(np.float32)
+
+            started = time.perf_counter()
+            expected_indices, expected_scores = reference_scores(df, positions.tolist(), similarities, city, category)
+            expected_top, _ = top_k(expected_scores, 25)
+            loop_latencies.append((time.perf_counter() - started) * 1000)
+
+            started = time.perf_counter()
+            scores = reranker.score(positions, similarities[positions], detected_city=city, detected_category=category)
+            top, _ = top_k(scores, 25)
+            vector_latencies.append((time.perf_counter() - started) * 1000)
+
+            if not np.array_equal(np.asarray(expected_scores), scores, equal_nan=True) or not np.array_equal(expected_top, top):
+                raise SystemExit(f"Score mismatch for city={city!r}, category={category!r}")
+
+        print(f"\nRe-ranking {count} candidates per request ({args.requests} requests, scores identical):")
+        report('df.iloc loop', np.array(loop_latencies))
+        report('vectorized', np.array(vector_latencies))
+
+if __name__ == "__main__":
+    main()
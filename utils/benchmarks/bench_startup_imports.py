@@ -0,0 +1,96 @@
+"""
+Startup cost of loading query understanding: per-loader revised.py vs. the shared module
+
+"before" replays the old startup: revised.py (as it was before
+query_understanding.py existed, taken from git) is executed three times, once
+each for model_handler, recommender.py's exec_module and app.py's import, and
+every execution loads spaCy, runs the NLTK check and imports the training
+stack. "after" is the current serving path: model_handler and app.py import
+destination_model (the serving half of revised.py) once and spaCy is loaded
+once through query_understanding. Each scenario runs in a fresh interpreter;
+wall time and peak RSS are reported.
+
+Usage (from the utils directory):
+    python benchmarks/bench_startup_imports.py [--repeat 3] [--before <git revision>]
+"""
+import os
+import sys
+import json
+import argparse
+import tempfile
+import subprocess
+import numpy as np
+
+UTILS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+BEFORE_SCRIPT = """
+import sys, time, json, resource, importlib.util
+sys.path.insert(0, {utils_dir!r})
+started = time.perf_counter()
+for name in ('travel_model', 'travel_model', 'revised'):
+    spec = importlib.util.spec_from_file_location(name, {revised_path!r})
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+elapsed = time.perf_counter() - started
+print(json.dumps({{'seconds': elapsed, 'max_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}}))
+"""
+
+AFTER_SCRIPT = """
+import sys, time, json, resource, importlib
+sys.path.insert(0, {utils_dir!r})
+started = time.perf_counter()
+travel_model = importlib.import_module('destination_model')  # model_handler
+from query_understanding import extract_query_info, get_nlp  # recommender.py
+from destination_model import get_recommendations  # app.py
+get_nlp()
+elapsed = time.perf_counter() - started
+print(json.dumps({{'seconds': elapsed, 'max_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}}))
+"""
+
+def revision_before_shared_module():
+    """The commit just before query_understanding.py was added"""
+    added = subprocess.run(['git', 'log', '--diff-filter=A', '--format=%H', '--', 'query_understanding.py'],
+                           cwd=UTILS_DIR, capture_output=True, text=True, check=True).stdout.split()
+    if not added:
+        raise SystemExit("query_understanding.py is not committed yet; pass --before")
+    return f"{added[-1]}^"
+
+def old_revised(revision):
+    prefix = subprocess.run(['git', 'rev-parse', '--show-prefix'], cwd=UTILS_DIR,
+                            capture_output=True, text=True, check=True).stdout.strip()
+    source = subprocess.run(['git', 'show', f"{revision}:{prefix}revised.py"], cwd=UTILS_DIR,
+                            capture_output=True, text=True, check=True).stdout
+    handle = tempfile.NamedTemporaryFile('w', suffix='_revised.py', delete=False)
+    with handle:
+        handle.write(source)
+    return handle.name
+
+def run(script):
+    result = subprocess.run([sys.executable, '-c', script], cwd=UTILS_DIR, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise SystemExit(result.stderr[-2000:])
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure query-understanding startup cost before and after sharing it')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--before', help='git revision with the old revised.py (default: before query_understanding.py)')
+    args = parser.parse_args()
+
+    revision = args.before or revision_before_shared_module()
+    revised_path = old_revised(revision)
+    try:
+        scenarios = {
+            f'before ({revision})': BEFORE_SCRIPT.format(utils_dir=UTILS_DIR, revised_path=revised_path),
+            'after (shared)': AFTER_SCRIPT.format(utils_dir=UTILS_DIR),
+        }
+        for name, script in scenarios.items():
+            runs = [run(script) for _ in range(args.repeat)]
+            seconds = np.array([entry['seconds'] for entry in runs])
+            rss_mb = max(entry['max_rss_kb'] for entry in runs) / 1024
+            print(f"{name:28s} median {np.median(seconds):7.2f} s   min {seconds.min():7.2f} s   peak RSS {rss_mb:7.0f} MB")
+    finally:
+        os.unlink(revised_path)
+
+if __name__ == "__main__":
+    main()
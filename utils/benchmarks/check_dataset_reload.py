@@ -0,0 +1,111 @@
+"""
+End-to-end check of the per-worker dataset reload
+
+Boots the API in-process (Flask test client) on a copy of the dataset and
+checks that a request only reloads when the file's content changes: touching
+it keeps the /api/dataset/info ETag, while appending a destination makes the
+next request start a background reload that publishes a new catalog. The
+ETag then changes, a conditional request with the old ETag gets the new body,
+and queries parsed against the old catalog are dropped from the parsed query
+cache. Every worker process runs the same check, so they all converge on the
+new file.
+
+Usage (from the utils directory):
+    python benchmarks/check_dataset_reload.py
+"""
+import os
+import sys
+import time
+import shutil
+import tempfile
+import threading
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from queries import SAMPLE_QUERIES
+from serving_config import SERVING_CONFIG
+import model_handler
+from app import app
+from knowledge_cache import query_info_cache
+from model_artifacts import digest_path_for
+from query_understanding import parse_query
+
+RELOAD_TIMEOUT_S = 600
+
+def check(condition, message):
+    if not condition:
+        raise SystemExit(f"FAILED: {message}")
+    print(f"ok: {message}")
+
+def dataset_etag(client):
+    response = client.get('/api/dataset/info')
+    check(response.status_code == 200, f"/api/dataset/info answers 200 (got {response.status_code})")
+    return response.headers['ETag']
+
+def cached_versions():
+    with query_info_cache.lock:
+        return {version for _, version in query_info_cache.cache}
+
+def request_after_check_interval(client):
+    """A request made once the reload check interval has passed; returns whether it started a reload"""
+    model_handler.last_dataset_check = time.monotonic() - SERVING_CONFIG['dataset_reload_check_s']
+    reloads = [thread for thread in threading.enumerate() if thread.name == 'dataset-reload']
+    client.get('/api/health')
+    started = [thread for thread in threading.enumerate()
+               if thread.name == 'dataset-reload' and thread not in reloads]
+    for thread in started:
+        thread.join(RELOAD_TIMEOUT_S)
+    return bool(started)
+
+def main():
+    original_file = model_handler.DATA_FILE
+    client = app.test_client()
+
+    handle, data_file = tempfile.mkstemp(suffix='.csv')
+    os.close(handle)
+    shutil.copyfile(original_file, data_file)
+    try:
+        # Serve the copy; same content, so the same catalog version
+        model_handler.DATA_FILE = data_file
+        check(model_handler.reload_dataset() is not None, "the copy of the dataset loads")
+        etag = dataset_etag(client)
+
+        check(not request_after_check_interval(client), "an unchanged dataset is not reloaded")
+        os.utime(data_file, None)
+        check(not request_after_check_interval(client), "touching the dataset without changing it is not a reload")
+        check(dataset_etag(client) == etag, "ETag is unchanged")
+
+        old_version = model_handler.get_catalog().version
+        for query in SAMPLE_QUERIES[:10]:
+            parse_query(query, model_handler.get_catalog())
+        check(old_version in cached_versions(), "parsed queries are cached for the current catalog")
+
+        # One more destination
+        data = pd.read_csv(original_file)
+        extra = data.iloc[[0]].copy()
+        extra['name'] = extra['name'].astype(str) + ' (reload check)'
+        pd.concat([data, extra], ignore_index=True).to_csv(data_file, index=False)
+
+        check(request_after_check_interval(client), "the first request after the change starts a reload")
+        check(model_handler.get_catalog().size == len(data) + 1, "the new catalog has the extra destination")
+        check(len(model_handler.get_snapshot().embeddings) == len(data) + 1,
+              "embeddings in the published snapshot match the new catalog")
+
+        new_etag = dataset_etag(client)
+        check(new_etag != etag, f"ETag changed ({etag} -> {new_etag})")
+        conditional = client.get('/api/dataset/info', headers={'If-None-Match': etag})
+        check(conditional.status_code == 200, "a conditional request with the old ETag gets the new body")
+        check(old_version not in cached_versions(), "queries parsed against the old catalog were dropped")
+        check(not request_after_check_interval(client), "the reloaded file is not reloaded again")
+    finally:
+        model_handler.DATA_FILE = original_file
+        for path in (data_file, digest_path_for(data_file)):
+            if os.path.exists(path):
+                os.unlink(path)
+        model_handler.reload_dataset()
+
+    check(dataset_etag(client) == etag, "reloading the original dataset restores the original ETag")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Offline evaluation of the int8 quantized encoder against the fp32 model
+
+Reports embedding drift, top-5 recommendation overlap, model size and latency.
+Run with SERVING_CONFIG['quantize_encoder'] = False so the served model is fp32.
+Usage (from the utils directory):
+    python benchmarks/eval_quantization.py
+"""
+import os
+import sys
+import copy
+import time
+import numpy as np
+import torch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from queries import SAMPLE_QUERIES
+import model_handler
+from quantization import apply_int8_quantization, module_size_bytes
+from text_encoder import encode_texts
+
+TOP_K = 5
+
+def normalize(vectors):
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+def top_k_indices(query_vectors, destination_vectors, k=TOP_K):
+    scores = normalize(query_vectors) @ normalize(destination_vectors).T
+    return np.argsort(-scores, axis=1)[:, :k]
+
+def per_query_latency(model, tokenizer, repeats=5):
+    """Mean per-query encoding latency in milliseconds"""
+    encode_texts([SAMPLE_QUERIES[0]], tokenizer, model)  # warm-up
+    started = time.perf_counter()
+    for _ in range(repeats):
+        for query in SAMPLE_QUERIES:
+            encode_texts([query], tokenizer, model)
+    return (time.perf_counter() - started) * 1000 / (repeats * len(SAMPLE_QUERIES))
+
+def main():
+    fp32_model = model_handler.model
+    tokenizer = model_handler.tokenizer
+    embeddings = model_handler.get_snapshot().embeddings
+    if fp32_model is None or tokenizer is None or embeddings is None or len(embeddings) == 0:
+        print("Model or embeddings not available. Train the model first with: python revised.py")
+        return
+    if fp32_model.model_version.endswith('+int8'):
+        print("The served model is already quantized. Set SERVING_CONFIG['quantize_encoder'] = False.")
+        return
+
+    int8_model = apply_int8_quantization(copy.deepcopy(fp32_model).cpu(), fp32_model.model_version)
+
+    fp32_vectors = encode_texts(SAMPLE_QUERIES, tokenizer, fp32_model)
+    int8_vectors = encode_texts(SAMPLE_QUERIES, tokenizer, int8_model)
+
+    # Embedding drift
+    cosine = np.sum(normalize(fp32_vectors) * normalize(int8_vectors), axis=1)
+    relative_l2 = np.linalg.norm(fp32_vectors - int8_vectors, axis=1) / np.linalg.norm(fp32_vectors, axis=1)
+
+    # Ranking agreement against the destination embeddings
+    fp32_top = top_k_indices(fp32_vectors, embeddings)
+    int8_top = top_k_indices(int8_vectors, embeddings)
+    overlap = np.array([len(set(a) & set(b)) / TOP_K for a, b in zip(fp32_top, int8_top)])
+    top1_agreement = np.mean(fp32_top[:, 0] == int8_top[:, 0])
+
+    # Size and latency
+    fp32_size = module_size_bytes(fp32_model.roberta)
+    int8_size = module_size_bytes(int8_model.roberta)
+    fp32_latency = per_query_latency(fp32_model, tokenizer)
+    int8_latency = per_query_latency(int8_model, tokenizer)
+
+    print(f"Queries evaluated: {len(SAMPLE_QUERIES)}, destinations: {len(embeddings)}, torch threads: {torch.get_num_threads()}")
+    print("\nEmbedding drift (fp32 vs int8):")
+    print(f"  cosine       mean {cosine.mean():.5f}   min {cosine.min():.5f}")
+    print(f"  relative L2  mean {relative_l2.mean():.5f}   max {relative_l2.max():.5f}")
+    print(f"\nTop-{TOP_K} overlap: mean {overlap.mean():.3f}   min {overlap.min():.3f}   top-1 agreement {top1_agreement:.3f}")
+    print("\nEncoder weights:")
+    print(f"  fp32 {fp32_size / 1e6:8.1f} MB   int8 {int8_size / 1e6:8.1f} MB   saving {(1 - int8_size / fp32_size) * 100:.1f}%")
+    print("\nPer-query latency:")
+    print(f"  fp32 {fp32_latency:8.2f} ms   int8 {int8_latency:8.2f} ms   speedup {fp32_latency / int8_latency:.2f}x")
+
+if __name__ == "__main__":
+    main()
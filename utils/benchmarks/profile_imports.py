@@ -0,0 +1,79 @@
+"""
+Import-time profile of the serving process: per-module cost and training-only leaks
+
+Imports each target module in a fresh interpreter under `python -X importtime`,
+sums self and cumulative time per top-level package, and lists the slowest
+modules. Fails if a training-only package (matplotlib, seaborn, sklearn
+metrics and model selection, tqdm) shows up in the serving import graph.
+
+Module bodies run at import, so for app and model_handler the profile includes
+init_model() (model, catalog and index loading) under those modules' own time.
+
+Usage (from the utils directory):
+    python benchmarks/profile_imports.py [--modules destination_model query_understanding app] [--top 25]
+"""
+import os
+import sys
+import argparse
+import subprocess
+
+UTILS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Packages only training and evaluation need; the API must not import them
+TRAINING_ONLY = ('matplotlib', 'seaborn', 'sklearn.metrics', 'sklearn.model_selection', 'tqdm')
+
+def import_times(module):
+    """(module name, self microseconds, cumulative microseconds) for every module imported"""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            cwd=UTILS_DIR, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise SystemExit(f"import {module} failed:\n{result.stderr[-2000:]}")
+    rows = []
+    for line in result.stderr.splitlines():
+        # "import time:   self [us] | cumulative | imported package"
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        rows.append((name.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+def report_module(module, rows, top):
+    total_us = sum(self_us for _, self_us, _ in rows)
+    print(f"\nimport {module}: {total_us / 1e6:.2f} s across {len(rows)} modules")
+
+    by_package = {}
+    for name, self_us, _ in rows:
+        package = name.split('.')[0]
+        by_package[package] = by_package.get(package, 0) + self_us
+    print(f"  {'package':32s} {'self s':>8s} {'share':>7s}")
+    for package, self_us in sorted(by_package.items(), key=lambda item: -item[1])[:top]:
+        print(f"  {package:32s} {self_us / 1e6:8.3f} {self_us / total_us:7.1%}")
+
+    print(f"  {'slowest modules (cumulative)':32s} {'cum s':>8s} {'self s':>8s}")
+    for name, self_us, cumulative_us in sorted(rows, key=lambda row: -row[2])[:top]:
+        print(f"  {name[:32]:32s} {cumulative_us / 1e6:8.3f} {self_us / 1e6:8.3f}")
+
+    names = {name for name, _, _ in rows}
+    return sorted(name for name in names
+                  if any(name == package or name.startswith(package + '.') for package in TRAINING_ONLY))
+
+def main():
+    parser = argparse.ArgumentParser(description='Profile import time of the serving modules')
+    parser.add_argument('--modules', nargs='+', default=['destination_model', 'query_understanding', 'app'])
+    parser.add_argument('--top', type=int, default=25)
+    args = parser.parse_args()
+
+    leaks = {}
+    for module in args.modules:
+        training_modules = report_module(module, import_times(module), args.top)
+        if training_modules:
+            leaks[module] = training_modules
+
+    if leaks:
+        for module, training_modules in leaks.items():
+            print(f"\nimport {module} loads training-only modules: {', '.join(training_modules[:10])}")
+        sys.exit(1)
+    print("\nNo training-only packages in the serving import graph")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,22 @@
+"""
+Sample travel queries shared by the benchmarks
+"""
+
+SAMPLE_QUERIES = [
+    "cafes in Tagaytay",
+    "beach resorts in Ternate",
+    "Hidden gem cafes in Silang",
+    "historical sites in Kawit",
+    "Find beach resorts in Ternate under 3000 pesos",
+    "I want to visit Tagaytay and I only have a budget of 500 pesos, where should I go?",
+    "churches in Imus",
+    "nature spots near Maragondon",
+    "restaurants in Dasmarinas",
+    "family friendly parks in Bacoor",
+    "romantic dinner with a view in Tagaytay",
+    "waterfalls in Amadeo",
+    "coffee shops in Indang",
+    "cheap hotels in General Trias",
+    "museums and heritage sites in Cavite City",
+    "where can I go hiking in Alfonso",
+]
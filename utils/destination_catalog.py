@@ -0,0 +1,107 @@
+"""
+Immutable, columnar view of the destination dataset
+
+Built once per dataset load from the preprocessed dataframe. Every column is
+kept as a list of native Python values (ready for JSON), city and category
+values are interned to integer codes on their lowercased form, and the unique
+city/category lists are computed up front. Request handlers filter on the
+row bitmaps of the filter index and materialize only the rows they return,
+instead of slicing and copying the dataframe on every request.
+"""
+import hashlib
+import time
+import numpy as np
+import pandas as pd
+
+from filter_index import FilterIndex
+from availability import CityCategoryAvailability
+
+
+def _intern(values):
+    """Integer code per value (on its lowercased form) and the lowercase -> code table"""
+    ids = {}
+    codes = np.array([ids.setdefault(str(value).lower(), len(ids)) for value in values], dtype=np.int32)
+    return codes, ids
+
+def ordered_unique(values):
+    """Distinct values in order of first appearance (same order as pandas unique())"""
+    return tuple(dict.fromkeys(values))
+
+
+class DestinationCatalog:
+    """Structure-of-arrays destination rows with interned codes and filter bitmaps"""
+
+    def __init__(self, df):
+        self.size = len(df)
+        self.column_names = tuple(df.columns)
+        self.labels = df.index.tolist()  # original index labels, reported as destination ids
+        self.columns = {name: df[name].tolist() for name in self.column_names}
+        self.loaded_at = time.time()
+        self._frame = df  # for callers whose API still returns DataFrames
+
+        cities = self.columns.get('city', [''] * self.size)
+        categories = self.columns.get('category', [''] * self.size)
+        self.cities = ordered_unique(cities)
+        self.categories = ordered_unique(categories)
+        self.city_codes, self.city_ids = _intern(cities)
+        self.category_codes, self.category_ids = _intern(categories)
+
+        # Lowercased entries of each row's category list (a row can list several)
+        if 'all_categories' in self.columns:
+            self.category_lists = [tuple(str(entry).lower() for entry in entries)
+                                   for entries in self.columns['all_categories']]
+        else:
+            self.category_lists = [(str(category).lower(),) for category in categories]
+
+        # Budgets as numbers (NaN if not numeric) and as lowercased labels (None if not text)
+        budgets = self.columns.get('budget', [''] * self.size)
+        self.budget_amounts = pd.to_numeric(pd.Series(budgets, dtype=object), errors='coerce').to_numpy(dtype=np.float64)
+        self.budget_labels = [value.lower() if isinstance(value, str) else None for value in budgets]
+
+        # Row bitmaps per lowercased filter value
+        provinces = self.columns.get('province')
+        self.filters = FilterIndex(self.size, {
+            'city': [str(city).lower() for city in cities],
+            'province': [str(province).lower() for province in provinces] if provinces is not None else [None] * self.size,
+            'category': [str(category).lower() for category in categories],
+            'categories': self.category_lists,
+            'budget': self.budget_labels,
+        }, self.budget_amounts)
+
+        for array in (self.city_codes, self.category_codes, self.budget_amounts):
+            array.setflags(write=False)
+        self.availability = CityCategoryAvailability(self)
+        self.version = self._fingerprint()
+
+    def __len__(self):
+        return self.size
+
+    def _fingerprint(self):
+        """Content hash, identical for the same data in every worker process"""
+        digest = hashlib.sha1()
+        for name in self.column_names:
+            digest.update(str(name).encode('utf-8'))
+            digest.update(repr(self.columns[name]).encode('utf-8'))
+        return digest.hexdigest()[:16]
+
+    def has_city(self, city):
+        return bool(city) and city.lower() in self.city_ids
+
+    def has_category(self, category):
+        return bool(category) and category.lower() in self.category_ids
+
+    def unique(self, column, positions):
+        """Distinct values of a column among the rows at positions, in row order"""
+        values = self.columns[column]
+        return ordered_unique(values[position] for position in positions)
+
+    def row(self, position):
+        """One destination as a dict, like df.iloc[position].to_dict()"""
+        return {name: self.columns[name][position] for name in self.column_names}
+
+    def rows(self, positions):
+        return [self.row(position) for position in positions]
+
+    def frame(self, positions):
+        """Rows as a DataFrame for callers that return one"""
+        return self._frame.iloc[positions]
@@ -0,0 +1,267 @@
+"""
+Serving side of the destination model: data loading, model classes and recommendations
+
+Everything the API process needs from revised.py, without the training stack
+(matplotlib, seaborn, sklearn metrics, tqdm, the optimizer and data loaders),
+which stays in revised.py. revised.py re-exports these names, so training and
+the CLI are unchanged.
+"""
+import os
+import logging
+import numpy as np
+import pandas as pd
+import torch
+from transformers import RobertaModel, RobertaConfig
+from text_encoder import encode_query
+from embedding_matrix import cosine_scores
+from retrieval import top_k
+from destination_catalog import DestinationCatalog
+from knowledge_cache import query_embedding_cache
+
+logger = logging.getLogger(__name__)
+
+device = torch.device('cpu')
+
+def get_device():
+    """Get the device to use for computations"""
+    return device
+
+# Load the data
+def load_data(file_path):
+    try:
+        df = pd.read_csv(file_path)
+        logger.info(f"Data loaded successfully. Shape: {df.shape}")
+        return df
+    except Exception as e:
+        logger.error(f"Error loading data: {e}")
+        raise
+
+# Preprocess the data
+def preprocess_data(df):
+    # Fill NaN values
+    df = df.fillna('')
+
+    # Split combined categories and create a list of all categories
+    df['all_categories'] = df['category'].apply(lambda x: [cat.strip() for cat in str(x).split(',')])
+
+    # Create a combined text field with weighted importance
+    # Description is repeated twice to give it more weight in the model
+    df['combined_text'] = df['description'] + ' ' + df['description'] + ' ' + \
+                         df['name'] + ' ' + \
+                         df['category'] + ' ' + \
+                         df['metadata']
+
+    # Encode the categories - now using the first category as primary
+    from sklearn.preprocessing import LabelEncoder
+    label_encoder = LabelEncoder()
+    df['category_encoded'] = label_encoder.fit_transform(df['category'].apply(lambda x: str(x).split(',')[0].strip()))
+
+    # Save the label encoder mapping for future use
+    category_mapping = dict(zip(label_encoder.classes_, label_encoder.transform(label_encoder.classes_)))
+    logger.info(f"Category mapping: {category_mapping}")
+
+    return df, label_encoder
+
+# Texts encoded into destination embeddings, one per row (combined_text, truncated if too long)
+def embedding_texts(df):
+    return [str(text)[:1000] for text in df['combined_text']]
+
+# Model definition
+class DestinationRecommender(torch.nn.Module):
+    def __init__(self, num_labels, dropout=0.5, config=None):
+        super(DestinationRecommender, self).__init__()
+        # With a config the encoder is built empty for a saved state dict, without any download
+        self.roberta = RobertaModel(config) if config is not None else RobertaModel.from_pretrained('roberta-base')
+        self.dropout = torch.nn.Dropout(dropout)
+        self.dropout2 = torch.nn.Dropout(dropout)
+        self.intermediate = torch.nn.Linear(self.roberta.config.hidden_size, self.roberta.config.hidden_size // 2)
+        self.classifier = torch.nn.Linear(self.roberta.config.hidden_size // 2, num_labels)
+
+    def forward(self, input_ids, attention_mask):
+        outputs = self.roberta(input_ids=input_ids, attention_mask=attention_mask)
+        pooled_output = outputs.last_hidden_state[:, 0, :]
+        pooled_output = self.dropout(pooled_output)
+        pooled_output = torch.relu(self.intermediate(pooled_output))
+        pooled_output = self.dropout2(pooled_output)
+        logits = self.classifier(pooled_output)
+        return logits
+
+# Smaller student encoder distilled from the DestinationRecommender encoder
+class StudentEncoder(torch.nn.Module):
+    """
+    A shallower RoBERTa encoder trained to reproduce the teacher's CLS embeddings.
+    Keeps the teacher's hidden size so its query embeddings can be compared directly
+    against destination embeddings produced by the teacher.
+    """
+    def __init__(self, config):
+        super(StudentEncoder, self).__init__()
+        self.roberta = RobertaModel(config, add_pooling_layer=False)
+
+    def forward(self, input_ids, attention_mask):
+        outputs = self.roberta(input_ids=input_ids, attention_mask=attention_mask)
+        return outputs.last_hidden_state[:, 0, :]
+
+def load_student(model_dir):
+    """Load a saved student encoder; returns (student, metadata)"""
+    import json
+    with open(os.path.join(model_dir, 'student_encoder.json')) as f:
+        metadata = json.load(f)
+    student = StudentEncoder(RobertaConfig.from_dict(metadata['config']))
+    state_dict = torch.load(os.path.join(model_dir, 'student_encoder.pt'), map_location='cpu')
+    student.load_state_dict(state_dict)
+    student.to(device)
+    student.eval()
+    return student, metadata
+
+# Enhanced recommendation function with intelligent filtering including budget
+def get_recommendations(query_text, tokenizer, model, embeddings, df, city=None, category=None, budget=None, budget_amount=None, top_n=5, province=None):
+    """
+    Get destination recommendations based on a query text and optional filters.
+    Now includes numeric budget filtering and handles multiple categories.
+    category may be one category or a list of them (rows matching any are kept).
+    df is the destination DataFrame or a DestinationCatalog built from it.
+    """
+    # Get the query embedding (cached per model version, padded only to the query's real length)
+    model.eval()
+    query_embedding = encode_query(query_text, tokenizer, model, device=device, cache=query_embedding_cache)
+
+    # Calculate cosine similarity (pre-normalized matrices are a single dot product)
+    similarities = cosine_scores(query_embedding, embeddings)
+
+    # Filters AND precomputed row bitmaps; the dataframe is never copied or scanned
+    catalog = df if isinstance(df, DestinationCatalog) else DestinationCatalog(df)
+    filters = catalog.filters
+    filter_applied = False
+    selected = filters.full()
+
+    # Apply city filter if specified
+    if city:
+        city_rows = selected & filters.match('city', city)
+        if not filters.any(city_rows):
+            logger.warning(f"No destinations found in city: {city}")
+            return pd.DataFrame(), np.array([])
+        selected = city_rows
+        filter_applied = True
+
+    # Apply province filter if specified
+    if province:
+        province_rows = selected & filters.match('province', province)
+        if not filters.any(province_rows):
+            logger.warning(f"No destinations found in province: {province}")
+            return pd.DataFrame(), np.array([])
+        selected = province_rows
+        filter_applied = True
+
+    # Apply category filter if specified
+    if category:
+        # Check if the category exists in any of the categories in all_categories
+        categories = category if isinstance(category, (list, tuple)) else [category]
+        category_rows = selected & filters.match_any('categories', categories)
+        if not filters.any(category_rows):
+            logger.warning(f"No destinations found with category: {category}")
+            if filter_applied:
+                return pd.DataFrame(), np.array([])
+        else:
+            selected = category_rows
+            filter_applied = True
+    
+    # Apply budget filter if specified
+    if budget_amount is not None:
+        # Check if the query contains "under", "below", or "less than"
+        is_strict_budget = any(word in query_text.lower() for word in ['under', 'below', 'less than'])
+        
+        if is_strict_budget:
+            # For "under" queries, strictly enforce the budget limit
+            budget_rows = selected & filters.budget_at_most(budget_amount)
+        else:
+            # For other queries, allow a small buffer (10% instead of 20%)
+            budget_rows = selected & filters.budget_at_most(budget_amount * 1.1)
+        
+        # Log budget filtering details
+        logger.info(f"Budget filtering: Amount={budget_amount}, Strict={is_strict_budget}")
+        logger.info(f"Found {filters.count(budget_rows)} destinations within budget")
+        
+        if not filters.any(budget_rows):
+            logger.warning(f"No destinations found within budget: {budget_amount}")
+            if filter_applied:
+                return pd.DataFrame(), np.array([])
+        else:
+            selected = budget_rows
+            filter_applied = True
+    elif budget:  # Fallback to categorical budget if no amount specified
+        budget_rows = selected & filters.match('budget', budget)
+        if not filters.any(budget_rows):
+            logger.warning(f"No destinations found with budget: {budget}")
+            if filter_applied:
+                return pd.DataFrame(), np.array([])
+        else:
+            selected = budget_rows
+            filter_applied = True
+
+    filtered_positions = filters.positions(selected)
+    if budget_amount is not None:
+        # Sort by budget within the filtered results (as sort_values does: NaN last)
+        budgets = catalog.budget_amounts[filtered_positions]
+        known = ~np.isnan(budgets)
+        filtered_positions = np.concatenate([
+            filtered_positions[known][np.argsort(budgets[known], kind='quicksort')],
+            filtered_positions[~known]
+        ])
+
+    if filter_applied:
+        # Get similarities only for filtered destinations (in filtered order, so ties follow it)
+        # Get top recommendations
+        if len(filtered_positions) == 0:
+            return pd.DataFrame(), np.array([])
+
+        top_positions, scores = top_k(similarities, top_n, candidates=filtered_positions)
+    else:
+        # Get top recommendations from all destinations
+        top_positions, scores = top_k(similarities, top_n)
+
+    recommendations = catalog.frame(top_positions)
+    return recommendations, scores
+
+def load_model(model_path, num_labels):
+    """Load the trained model"""
+    try:
+        model = DestinationRecommender(num_labels)
+        # Load state dict to CPU first
+        state_dict = torch.load(model_path, map_location='cpu')
+        model.load_state_dict(state_dict)
+        model.to(device)
+        model.eval()
+        return model
+    except Exception as e:
+        logger.error(f"Error loading model: {e}")
+        raise
+
+def format_recommendations(recommendations, scores):
+    """
+    Format recommendations in a user-friendly way.
+
+    Args:
+        recommendations (pd.DataFrame): Recommendations dataframe
+        scores (np.array): Similarity scores
+
+    Returns:
+        list: List of dictionaries containing formatted recommendations
+    """
+    if recommendations.empty:
+        return []
+
+    formatted_recs = []
+    for i, (idx, row) in enumerate(recommendations.iterrows()):
+        rec = {
+            'name': row['name'],
+            'city': row['city'],
+            'category': row['category'],
+            'description': row['description'],
+            'score': scores[i],
+            'budget': row.get('budget', 'Not specified'),
+            'operating_hours': row.get('operating hours', 'Not specified'),
+            'contact_info': row.get('contact information', 'Not specified')
+        }
+        formatted_recs.append(rec)
+
+    return formatted_recs
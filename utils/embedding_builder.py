@@ -0,0 +1,176 @@
+"""
+Batched builder for destination embeddings
+
+Texts are sorted by token length and encoded in dynamically padded batches.
+Work is split into fixed chunks that are checkpointed to disk, so an
+interrupted build resumes where it stopped. Chunks can optionally be fanned
+out across CPU worker processes.
+"""
+import os
+import json
+import shutil
+import hashlib
+import logging
+import threading
+import multiprocessing
+from types import SimpleNamespace
+import numpy as np
+import torch
+
+from text_encoder import tokenize_texts, pad_batch, cls_embeddings, DEFAULT_MAX_LENGTH
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILE = 'manifest.json'
+
+# Model state inherited by forked worker processes
+_worker_state = {}
+
+def build_fingerprint(texts, model_version, max_length):
+    """Identify a build by its texts, model version and max length"""
+    digest = hashlib.sha256()
+    digest.update(f"{model_version}|{max_length}|{len(texts)}".encode('utf-8'))
+    for text in texts:
+        digest.update(b'\0')
+        digest.update(text.encode('utf-8'))
+    return digest.hexdigest()
+
+def _encode_token_batches(encoder, pad_token_id, token_ids, batch_size, device):
+    """Encode a length-sorted list of token id lists in padded batches"""
+    padding = SimpleNamespace(pad_token_id=pad_token_id)
+    vectors = []
+    for start in range(0, len(token_ids), batch_size):
+        input_ids, attention_mask = pad_batch(padding, token_ids[start:start + batch_size], device=device)
+        vectors.append(cls_embeddings(encoder, input_ids, attention_mask))
+    return np.vstack(vectors)
+
+def _init_worker(num_threads):
+    # Split the cores between workers instead of each one using all of them
+    torch.set_num_threads(num_threads)
+
+def _encode_chunk_in_worker(job):
+    chunk_id, token_ids = job
+    vectors = _encode_token_batches(
+        _worker_state['model'],
+        _worker_state['pad_token_id'],
+        token_ids,
+        _worker_state['batch_size'],
+        'cpu'
+    )
+    return chunk_id, vectors
+
+class _Checkpoint:
+    """Chunk files plus a manifest tying them to one build fingerprint"""
+
+    def __init__(self, directory, fingerprint):
+        self.directory = directory
+        self.fingerprint = fingerprint
+        if directory is None:
+            return
+
+        manifest_path = os.path.join(directory, MANIFEST_FILE)
+        if os.path.exists(manifest_path):
+            with open(manifest_path) as f:
+                manifest = json.load(f)
+            if manifest.get('fingerprint') != fingerprint:
+                logger.info("Discarding embedding checkpoint from a different build")
+                shutil.rmtree(directory, ignore_errors=True)
+
+        os.makedirs(directory, exist_ok=True)
+        with open(manifest_path, 'w') as f:
+            json.dump({'fingerprint': fingerprint}, f)
+
+    def _chunk_path(self, chunk_id):
+        return os.path.join(self.directory, f"chunk_{chunk_id:05d}.npy")
+
+    def load(self, chunk_id):
+        if self.directory is None or not os.path.exists(self._chunk_path(chunk_id)):
+            return None
+        try:
+            return np.load(self._chunk_path(chunk_id))
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable checkpoint chunk {chunk_id}: {e}")
+            return None
+
+    def save(self, chunk_id, vectors):
+        if self.directory is None:
+            return
+        # Write then rename so an interrupted save never leaves a partial chunk
+        temp_path = self._chunk_path(chunk_id) + '.tmp.npy'
+        np.save(temp_path, vectors)
+        os.replace(temp_path, self._chunk_path(chunk_id))
+
+    def remove(self):
+        if self.directory is not None:
+            shutil.rmtree(self.directory, ignore_errors=True)
+
+def build_embeddings(texts, tokenizer, model, device='cpu', batch_size=16, chunk_size=128,
+                     num_workers=1, checkpoint_dir=None, max_length=DEFAULT_MAX_LENGTH):
+    """
+    Encode texts into CLS embeddings using length-sorted, dynamically padded batches
+    Returns an array of shape (len(texts), hidden_size) in the original text order
+    """
+    texts = [str(text) for text in texts]
+    if not texts:
+        return np.zeros((0, 0), dtype=np.float32)
+
+    token_ids = tokenize_texts(tokenizer, texts, max_length=max_length)
+    order = np.argsort([len(ids) for ids in token_ids], kind='stable')
+    chunks = [order[i:i + chunk_size] for i in range(0, len(order), chunk_size)]
+
+    fingerprint = build_fingerprint(texts, getattr(model, 'model_version', ''), max_length)
+    checkpoint = _Checkpoint(checkpoint_dir, fingerprint)
+
+    results = {}
+    for chunk_id in range(len(chunks)):
+        vectors = checkpoint.load(chunk_id)
+        if vectors is not None and len(vectors) == len(chunks[chunk_id]):
+            results[chunk_id] = vectors
+    if results:
+        logger.info(f"Resuming embedding build: {len(results)}/{len(chunks)} chunks already done")
+
+    pending = [chunk_id for chunk_id in range(len(chunks)) if chunk_id not in results]
+    jobs = ((chunk_id, [token_ids[i] for i in chunks[chunk_id]]) for chunk_id in pending)
+
+    def finish(chunk_id, vectors):
+        results[chunk_id] = vectors
+        checkpoint.save(chunk_id, vectors)
+        logger.info(f"Encoded chunk {len(results)}/{len(chunks)} ({len(chunks[chunk_id])} texts)")
+
+    # Workers are forked so they share the loaded model pages instead of reloading it
+    # (spawned workers would re-import the server's main module and load everything again)
+    use_workers = (
+        num_workers > 1 and len(pending) > 1
+        and torch.device(device).type == 'cpu'
+        and 'fork' in multiprocessing.get_all_start_methods()
+    )
+    # A fork copies only the calling thread: locks held by any other thread (request
+    # handlers, the inference queue, the intra-op pools they drive) would never be
+    # released in the children and can hang them, so only fork a single-threaded process
+    if use_workers and threading.active_count() > 1:
+        logger.info(f"{threading.active_count()} threads are running; encoding in-process instead of forking workers")
+        use_workers = False
+    if use_workers:
+        num_workers = min(num_workers, len(pending))
+        num_threads = max(1, (os.cpu_count() or 1) // num_workers)
+        logger.info(f"Encoding {len(pending)} chunks with {num_workers} worker processes ({num_threads} threads each)")
+
+        _worker_state.update(model=model, pad_token_id=tokenizer.pad_token_id, batch_size=batch_size)
+        try:
+            context = multiprocessing.get_context('fork')
+            with context.Pool(num_workers, initializer=_init_worker, initargs=(num_threads,)) as pool:
+                for chunk_id, vectors in pool.imap_unordered(_encode_chunk_in_worker, jobs):
+                    finish(chunk_id, vectors)
+        finally:
+            _worker_state.clear()
+    else:
+        for chunk_id, chunk_token_ids in jobs:
+            finish(chunk_id, _encode_token_batches(model, tokenizer.pad_token_id, chunk_token_ids, batch_size, device))
+
+    hidden_size = results[0].shape[1]
+    embeddings = np.zeros((len(texts), hidden_size), dtype=results[0].dtype)
+    for chunk_id, positions in enumerate(chunks):
+        embeddings[positions] = results[chunk_id]
+
+    checkpoint.remove()
+    return embeddings
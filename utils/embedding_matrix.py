@@ -0,0 +1,106 @@
+"""
+Pre-normalized, memory-mapped destination embedding matrix
+
+Destination embeddings are L2-normalized once and saved as a separate .npy
+artifact (optionally float16) that is opened with mmap, so worker processes
+share its pages through the OS page cache. Cosine similarity against a
+normalized matrix is a single matrix-vector product.
+"""
+import os
+import json
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SUPPORTED_DTYPES = ('float32', 'float16')
+
+# Rows scored per step when upcasting float16 or re-normalizing raw rows (bounds the temporary copy)
+SCORE_CHUNK_ROWS = 2048
+
+
+class NormalizedEmbeddings(np.ndarray):
+    """Embedding matrix whose rows are already L2-normalized"""
+
+
+def l2_normalize(vectors):
+    """Scale rows to unit length; all-zero rows are left as zeros"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+def metadata_path_for(matrix_path):
+    return os.path.splitext(matrix_path)[0] + '.json'
+
+def write_normalized(matrix_path, embeddings, dtype='float32', source_fingerprint=None):
+    """Normalize embeddings and save them, with metadata tying them to their source"""
+    if dtype not in SUPPORTED_DTYPES:
+        raise ValueError(f"Unsupported embedding matrix dtype '{dtype}', expected one of {SUPPORTED_DTYPES}")
+
+    normalized = np.zeros(np.shape(embeddings), dtype=dtype)
+    for start in range(0, len(embeddings), SCORE_CHUNK_ROWS):
+        normalized[start:start + SCORE_CHUNK_ROWS] = l2_normalize(embeddings[start:start + SCORE_CHUNK_ROWS])
+
+    # Write then rename so processes that have the old matrix mapped keep a valid file;
+    # the metadata goes last, so a matrix is never paired with another matrix's metadata
+    os.makedirs(os.path.dirname(matrix_path), exist_ok=True)
+    metadata_path = metadata_path_for(matrix_path)
+    try:
+        os.remove(metadata_path)
+    except FileNotFoundError:
+        pass
+    temp_path = f"{matrix_path}.{os.getpid()}.tmp.npy"
+    np.save(temp_path, normalized)
+    os.replace(temp_path, matrix_path)
+    with open(f"{metadata_path}.{os.getpid()}.tmp", 'w') as f:
+        json.dump({'dtype': dtype, 'source_fingerprint': source_fingerprint}, f)
+    os.replace(f"{metadata_path}.{os.getpid()}.tmp", metadata_path)
+
+def open_normalized(matrix_path, dtype=None, source_fingerprint=None):
+    """
+    Open a normalized matrix with mmap
+    Returns None if it's missing or was built from other embeddings or with another dtype
+    """
+    if not os.path.exists(matrix_path) or not os.path.exists(metadata_path_for(matrix_path)):
+        return None
+    with open(metadata_path_for(matrix_path)) as f:
+        metadata = json.load(f)
+    if dtype is not None and metadata.get('dtype') != dtype:
+        return None
+    if source_fingerprint is not None and metadata.get('source_fingerprint') != source_fingerprint:
+        return None
+    return np.load(matrix_path, mmap_mode='r').view(NormalizedEmbeddings)
+
+def load_normalized(matrix_path, embeddings, dtype='float32', source_fingerprint=None):
+    """
+    Open the normalized matrix for these embeddings, rebuilding it if it's stale
+    Returns a read-only, memory-mapped NormalizedEmbeddings array
+    """
+    matrix = open_normalized(matrix_path, dtype, source_fingerprint)
+    if matrix is None or matrix.shape != np.shape(embeddings):
+        logger.info(f"Writing normalized {dtype} embedding matrix to {matrix_path}")
+        write_normalized(matrix_path, embeddings, dtype, source_fingerprint)
+        matrix = open_normalized(matrix_path, dtype, source_fingerprint)
+    return matrix
+
+def cosine_scores(query_embedding, embeddings):
+    """
+    Cosine similarity between one query embedding and every destination embedding
+    Rows of a NormalizedEmbeddings matrix are not re-normalized
+    Returns a float32 array with one score per destination
+    """
+    query = l2_normalize(np.asarray(query_embedding, dtype=np.float32).reshape(-1))
+    normalized = isinstance(embeddings, NormalizedEmbeddings)
+
+    if normalized and embeddings.dtype == np.float32:
+        return np.asarray(embeddings.dot(query))
+
+    # Raw or float16 matrices are scored in float32 chunks
+    scores = np.empty(len(embeddings), dtype=np.float32)
+    for start in range(0, len(embeddings), SCORE_CHUNK_ROWS):
+        chunk = np.asarray(embeddings[start:start + SCORE_CHUNK_ROWS], dtype=np.float32)
+        if not normalized:
+            chunk = l2_normalize(chunk)
+        scores[start:start + SCORE_CHUNK_ROWS] = chunk.dot(query)
+    return scores
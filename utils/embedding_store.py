@@ -0,0 +1,203 @@
+"""
+Destination embedding store keyed by destination and content
+
+Each stored row is tagged with a destination key and a hash of the encoded
+text plus the model version. Refreshing against a new dataset re-encodes only
+rows whose key is new or whose hash changed, and lookups align rows by key
+instead of by position.
+"""
+import os
+import json
+import hashlib
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# How destination keys are derived from a dataframe
+KEY_SCHEME_ID = 'id'
+KEY_SCHEME_NAME_CITY = 'name_city'
+
+def manifest_path_for(embeddings_path):
+    return os.path.splitext(embeddings_path)[0] + '.json'
+
+def destination_keys(df, key_scheme=None):
+    """
+    Build one key per destination row
+    Uses the 'id' column when present, otherwise name and city
+    Returns (key_scheme, keys)
+    """
+    if key_scheme is None:
+        key_scheme = KEY_SCHEME_ID if 'id' in df.columns else KEY_SCHEME_NAME_CITY
+
+    if key_scheme == KEY_SCHEME_ID:
+        keys = [str(value) for value in df['id']]
+    else:
+        names = df['name'] if 'name' in df.columns else [''] * len(df)
+        cities = df['city'] if 'city' in df.columns else [''] * len(df)
+        keys = [f"{str(name).strip().lower()}|{str(city).strip().lower()}" for name, city in zip(names, cities)]
+
+    # Disambiguate repeated keys by their occurrence number
+    seen = {}
+    unique_keys = []
+    for key in keys:
+        seen[key] = seen.get(key, 0) + 1
+        unique_keys.append(key if seen[key] == 1 else f"{key}#{seen[key]}")
+    return key_scheme, unique_keys
+
+def content_hash(text, model_version):
+    """Hash of the encoded text and the model version that encoded it"""
+    return hashlib.sha1(f"{model_version}\0{text}".encode('utf-8')).hexdigest()
+
+class EmbeddingStore:
+    """Embeddings on disk plus a manifest of the key and content hash of every row"""
+
+    def __init__(self, embeddings_path):
+        self.embeddings_path = embeddings_path
+        self.manifest_path = manifest_path_for(embeddings_path)
+        self.embeddings = None
+        self.key_scheme = None
+        self.model_version = None
+        self.rows = {}  # key -> (row, content hash)
+
+    @property
+    def fingerprint(self):
+        """Digest of the stored keys and content hashes"""
+        digest = hashlib.sha1()
+        for key, (row, row_hash) in sorted(self.rows.items(), key=lambda item: item[1][0]):
+            digest.update(f"{key}\0{row_hash}\n".encode('utf-8'))
+        return digest.hexdigest()
+
+    def load(self):
+        """
+        Load the stored embeddings and manifest
+        Returns False if either is missing or they don't describe each other
+        """
+        self.embeddings = None
+        self.rows = {}
+        if not os.path.exists(self.embeddings_path):
+            return False
+        if not os.path.exists(self.manifest_path):
+            # Written before the store kept a manifest (or a save was interrupted):
+            # nothing says which destination or model version each row belongs to
+            logger.warning(f"{self.embeddings_path} has no manifest {self.manifest_path}; "
+                           "re-encoding all destinations and replacing it")
+            return False
+
+        try:
+            with open(self.manifest_path) as f:
+                manifest = json.load(f)
+            embeddings = np.load(self.embeddings_path, mmap_mode='r')
+        except Exception as e:
+            logger.warning(f"Could not read embedding store {self.embeddings_path}: {e}")
+            return False
+
+        keys = manifest.get('keys', [])
+        hashes = manifest.get('hashes', [])
+        if len(keys) != len(embeddings) or len(hashes) != len(embeddings):
+            # The embeddings file was rewritten without its manifest
+            logger.warning("Embedding store manifest doesn't match the embeddings file; ignoring it")
+            return False
+
+        self.embeddings = embeddings
+        self.key_scheme = manifest.get('key_scheme')
+        self.model_version = manifest.get('model_version')
+        self.rows = {key: (row, row_hash) for row, (key, row_hash) in enumerate(zip(keys, hashes))}
+        return True
+
+    def save(self, key_scheme, keys, hashes, embeddings, model_version):
+        """Write the embeddings and manifest, replacing any previous store"""
+        # Write then rename so processes that have the old file mapped keep a valid file.
+        # The old manifest goes first and the new one is renamed in last, so an
+        # interrupted save leaves embeddings without a manifest, which load() rejects
+        os.makedirs(os.path.dirname(self.embeddings_path), exist_ok=True)
+        try:
+            os.remove(self.manifest_path)
+        except FileNotFoundError:
+            pass
+        temp_path = f"{self.embeddings_path}.{os.getpid()}.tmp.npy"
+        np.save(temp_path, embeddings)
+        os.replace(temp_path, self.embeddings_path)
+        temp_manifest_path = f"{self.manifest_path}.{os.getpid()}.tmp"
+        with open(temp_manifest_path, 'w') as f:
+            json.dump({
+                'key_scheme': key_scheme,
+                'model_version': model_version,
+                'keys': keys,
+                'hashes': hashes
+            }, f)
+        os.replace(temp_manifest_path, self.manifest_path)
+
+        self.embeddings = embeddings
+        self.key_scheme = key_scheme
+        self.model_version = model_version
+        self.rows = {key: (row, row_hash) for row, (key, row_hash) in enumerate(zip(keys, hashes))}
+
+    def refresh(self, df, texts, model_version, encode_fn):
+        """
+        Bring the store in line with a dataset, re-encoding only new or changed rows
+        texts are the strings encoded for each df row; encode_fn encodes a list of them
+        Returns embeddings aligned to the rows of df
+        """
+        self.load()
+        key_scheme, keys = destination_keys(df, self.key_scheme if self.rows else None)
+        hashes = [content_hash(text, model_version) for text in texts]
+
+        reused_rows = []
+        reused_positions = []
+        changed_positions = []
+        for position, (key, row_hash) in enumerate(zip(keys, hashes)):
+            stored = self.rows.get(key)
+            if stored is not None and stored[1] == row_hash:
+                reused_positions.append(position)
+                reused_rows.append(stored[0])
+            else:
+                changed_positions.append(position)
+
+        # Nothing changed and the stored rows are already in dataset order
+        if len(self.rows) == len(keys) and reused_rows == list(range(len(keys))):
+            logger.info(f"Loaded embeddings for {len(keys)} destinations.")
+            return self.embeddings
+
+        removed = len(set(self.rows) - set(keys))
+        logger.info(
+            f"Refreshing embeddings: {len(reused_positions)} reused, "
+            f"{len(changed_positions)} to encode, {removed} removed"
+        )
+
+        new_vectors = encode_fn([texts[i] for i in changed_positions]) if changed_positions else None
+        if self.embeddings is not None and len(reused_rows):
+            width, dtype = self.embeddings.shape[1], self.embeddings.dtype
+        else:
+            width, dtype = new_vectors.shape[1], new_vectors.dtype
+
+        embeddings = np.zeros((len(keys), width), dtype=dtype)
+        if reused_rows:
+            embeddings[reused_positions] = self.embeddings[reused_rows]
+        if changed_positions:
+            embeddings[changed_positions] = new_vectors
+
+        try:
+            self.save(key_scheme, keys, hashes, embeddings, model_version)
+            logger.info(f"Saved embeddings for {len(embeddings)} destinations.")
+        except Exception as e:
+            logger.warning(f"Failed to save embeddings: {e}")
+        return embeddings
+
+    def align(self, df):
+        """
+        Look up stored embeddings for the rows of df by destination key
+        Returns (positions, embeddings) for the rows that have an embedding
+        """
+        if self.embeddings is None and not self.load():
+            return np.zeros(0, dtype=np.int64), None
+
+        _, keys = destination_keys(df, self.key_scheme)
+        positions = []
+        rows = []
+        for position, key in enumerate(keys):
+            stored = self.rows.get(key)
+            if stored is not None:
+                positions.append(position)
+                rows.append(stored[0])
+        return np.asarray(positions, dtype=np.int64), self.embeddings[rows]
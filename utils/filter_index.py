@@ -0,0 +1,85 @@
+"""
+Bitmap inverted index over the destination filter columns
+
+Every lowercased city, province, category, category-list entry and budget
+label maps to a packed bitmap (one bit per catalog row) of the rows that carry
+it. Request filters combine bitmaps with & and |, so no string column is
+scanned per request. Numeric budgets are kept sorted, so "at most X" is a
+binary search.
+"""
+import numpy as np
+
+FIELDS = ('city', 'province', 'category', 'categories', 'budget')
+
+# Set bits per byte value, for counting matches without unpacking
+POPCOUNT = np.array([bin(value).count('1') for value in range(256)], dtype=np.uint8)
+
+
+class FilterIndex:
+    """Packed row bitmaps per (field, lowercased token)"""
+
+    def __init__(self, size, tokens_by_field, budget_amounts=None):
+        """
+        tokens_by_field maps a field name to one entry per row: a token or a
+        tuple of tokens (rows may carry several categories); None skips the row
+        """
+        self.size = size
+        self.bitmaps = {}
+        for field, row_tokens in tokens_by_field.items():
+            rows_by_token = {}
+            for position, tokens in enumerate(row_tokens):
+                if tokens is None:
+                    continue
+                for token in (tokens if isinstance(tokens, tuple) else (tokens,)):
+                    rows_by_token.setdefault(token, []).append(position)
+            self.bitmaps[field] = {token: self.from_positions(rows) for token, rows in rows_by_token.items()}
+
+        # Numeric budgets in ascending order (NaN rows left out), for range filters
+        if budget_amounts is None:
+            budget_amounts = np.full(size, np.nan)
+        known = np.flatnonzero(~np.isnan(budget_amounts))
+        order = np.argsort(budget_amounts[known], kind='stable')
+        self.budget_positions = known[order]
+        self.budget_values = budget_amounts[known][order]
+
+    def empty(self):
+        return np.zeros((self.size + 7) // 8, dtype=np.uint8)
+
+    def full(self):
+        return self.from_positions(np.arange(self.size))
+
+    def from_positions(self, positions):
+        mask = np.zeros(self.size, dtype=bool)
+        mask[np.asarray(positions, dtype=np.int64)] = True
+        return np.packbits(mask)
+
+    def match(self, field, value):
+        """Rows whose field equals value case-insensitively (a new array, safe to modify)"""
+        bitmap = self.bitmaps[field].get(str(value).lower())
+        return self.empty() if bitmap is None else bitmap.copy()
+
+    def match_any(self, field, values):
+        """Rows matching any of the values"""
+        bitmap = self.empty()
+        for value in values:
+            bitmap |= self.match(field, value)
+        return bitmap
+
+    def budget_at_most(self, amount):
+        """Rows with a numeric budget <= amount"""
+        count = np.searchsorted(self.budget_values, amount, side='right')
+        return self.from_positions(self.budget_positions[:count])
+
+    def count(self, bitmap):
+        return int(POPCOUNT[bitmap].sum())
+
+    def any(self, bitmap):
+        return bool(bitmap.any())
+
+    def mask(self, bitmap):
+        """Boolean array with one entry per row"""
+        return np.unpackbits(bitmap, count=self.size).astype(bool)
+
+    def positions(self, bitmap):
+        """Matching row positions in ascending order"""
+        return np.flatnonzero(np.unpackbits(bitmap, count=self.size))
@@ -0,0 +1,132 @@
+"""
+Fuzzy city-name matching without scanning every city per request
+
+Candidate names are bucketed by length and carry their character counts.
+A SequenceMatcher ratio can never exceed 2*min(len)/(total len) nor
+2*(shared characters)/(total len) (difflib's real_quick_ratio/quick_ratio),
+so a binary search over lengths plus the character-count bound discards
+nearly all names before the real ratio is computed on the few left. The
+surviving ratios are the exact SequenceMatcher values, so matches are the
+same as the old loops over every city (first city wins on ties).
+"""
+import bisect
+from collections import Counter
+from difflib import SequenceMatcher
+from functools import lru_cache
+
+
+def normalize_name(text):
+    """Lowercase alphanumeric characters only"""
+    return ''.join(e for e in text.lower() if e.isalnum())
+
+
+def _ratio(matches, length):
+    # Same arithmetic as SequenceMatcher.ratio(), so bounds compare exactly
+    return 2.0 * matches / length if length else 1.0
+
+
+class FuzzyTable:
+    """Distinct strings sorted by length, each owned by one or more cities"""
+
+    def __init__(self, owners_by_string):
+        entries = sorted(owners_by_string.items(), key=lambda item: len(item[0]))
+        self.strings = [string for string, _ in entries]
+        self.owners = [owners for _, owners in entries]
+        self.lengths = [len(string) for string in self.strings]
+        self.counts = [Counter(string) for string in self.strings]
+
+    def matches(self, query, threshold, weight=1.0):
+        """
+        (owners, ratio) for every string with ratio * weight > threshold, where
+        ratio is SequenceMatcher(None, query, string).ratio()
+        """
+        if weight <= threshold:
+            return  # ratio <= 1, so the weighted ratio cannot beat the threshold
+        size = len(query)
+        # Length window from 2*min(len)/(total len) > threshold/weight, widened by one
+        # on each side; the exact bound below settles the edges
+        target = threshold / weight
+        low = bisect.bisect_left(self.lengths, int(size * target / (2 - target)) - 1)
+        high = bisect.bisect_right(self.lengths, int(size * (2 - target) / target) + 1) if target > 0 else len(self.lengths)
+        query_counts = Counter(query)
+        for position in range(low, high):
+            length = size + self.lengths[position]
+            if _ratio(min(size, self.lengths[position]), length) * weight <= threshold:
+                continue
+            counts = self.counts[position]
+            shared = sum(min(count, counts[char]) for char, count in query_counts.items() if char in counts)
+            if _ratio(shared, length) * weight <= threshold:
+                continue
+            ratio = SequenceMatcher(None, query, self.strings[position]).ratio()
+            if ratio * weight > threshold:
+                yield self.owners[position], ratio
+
+
+class FuzzyCityIndex:
+    """Fuzzy lookups over a fixed list of city names"""
+
+    def __init__(self, cities):
+        self.cities = tuple(cities)
+        names = {}
+        normalized = {}
+        parts = {}
+        for position, city in enumerate(self.cities):
+            names.setdefault(city.lower(), []).append(position)
+            normalized.setdefault(normalize_name(city), []).append(position)
+            for part in city.lower().split():
+                owners = parts.setdefault(normalize_name(part), [])
+                if not owners or owners[-1] != position:
+                    owners.append(position)
+        self.names = FuzzyTable(names)
+        self.normalized = FuzzyTable(normalized)
+        self.parts = FuzzyTable(parts)
+
+    def _best(self, scores, threshold):
+        """First city (in list order) with the highest score, as a running '>' loop picks it"""
+        if not scores:
+            return None, threshold
+        position = min(scores, key=lambda position: (-scores[position], position))
+        return self.cities[position], scores[position]
+
+    def closest(self, name, threshold=0.6):
+        """
+        City whose lowercased name is most similar to name (ratio > threshold)
+        Returns (city, ratio), or (None, threshold) when nothing is close enough
+        """
+        scores = {}
+        for owners, ratio in self.names.matches(name.lower(), threshold):
+            for position in owners:
+                scores[position] = ratio
+        return self._best(scores, threshold)
+
+    def match_query(self, query, threshold=0.7):
+        """
+        City best matching a short free-text query: the whole query against each
+        whole name (alphanumerics only), and each query word against each word of
+        the name, weighted by the word's share of the query's characters
+        Returns (city, score), or (None, threshold) when nothing beats threshold
+        """
+        normalized_query = normalize_name(query)
+        if not normalized_query:
+            return None, threshold
+        scores = {}
+        for owners, ratio in self.normalized.matches(normalized_query, threshold):
+            for position in owners:
+                scores[position] = max(scores.get(position, 0.0), ratio)
+        for query_part in query.lower().split():
+            normalized_part = normalize_name(query_part)
+            weight = len(normalized_part) / len(normalized_query)
+            for owners, ratio in self.parts.matches(normalized_part, threshold, weight):
+                weighted_ratio = ratio * weight
+                for position in owners:
+                    scores[position] = max(scores.get(position, 0.0), weighted_ratio)
+        return self._best(scores, threshold)
+
+
+@lru_cache(maxsize=8)
+def _build_city_index(cities):
+    return FuzzyCityIndex(cities)
+
+def get_city_index(cities=()):
+    """The shared fuzzy index for a list of cities (built once per distinct list)"""
+    return _build_city_index(tuple(cities))
@@ -0,0 +1,253 @@
+"""
+Keyword gazetteer for query understanding
+
+All the city names, category names and synonym tables the query parsers look
+for are compiled into one Aho-Corasick automaton, so a single pass over the
+lowercased query finds every hit with its span. Hits keep the old substring
+semantics ("shop" matches inside "shopping"); when several keywords of a kind
+match, the longest wins, then the leftmost, then the earliest table entry.
+"""
+from collections import deque, namedtuple
+from functools import lru_cache
+
+# Kinds of keyword in the gazetteer
+CITY = 'city'                          # city names from the catalog
+CATEGORY = 'category'                  # category names from the catalog
+MAPPED_CATEGORY = 'mapped_category'    # CATEGORY_MAPPING synonyms of catalog categories
+CATEGORY_KEYWORD = 'category_keyword'  # CATEGORY_NORMALIZATIONS keywords
+CATEGORY_SYNONYM = 'category_synonym'  # CATEGORY_SYNONYMS names and synonyms
+CAVITE_CITY = 'cavite_city'            # CAVITE_CITY_NAMES spellings
+
+# Query variations mapped to standard categories
+CATEGORY_NORMALIZATIONS = {
+    # Cafe/Coffee categories
+    'cafe': 'Cafe', 'café': 'Cafe', 'coffee': 'Cafe', 'coffee shop': 'Cafe', 'cafeteria': 'Cafe',
+
+    # Food Shop categories
+    'food shop': 'Food Shop', 'eatery': 'Food Shop', 'food stall': 'Food Shop', 'food court': 'Food Shop',
+
+    # Restaurant categories
+    'restaurant': 'Restaurant', 'dining': 'Restaurant', 'bistro': 'Restaurant', 'diner': 'Restaurant',
+
+    # Shopping categories
+    'shopping': 'Shopping/Restaurant', 'mall': 'Shopping/Restaurant', 'shop': 'Shopping/Restaurant',
+
+    # Resort/Hotel categories
+    'resort': 'Resort', 'beach resort': 'Beach Resort', 'hotel & resort': 'Hotel & Resort',
+    'hotel resort': 'Hotel & Resort', 'accommodation': 'Accommodation', 'hotel': 'Hotel',
+    'restaurant/resort': 'Restaurant/Resort', 'stay': 'Accommodation',
+
+    # Religious/Historical sites
+    'church': 'Religious Site', 'temple': 'Religious Site', 'mosque': 'Religious Site', 'shrine': 'Religious Site',
+    'historical': 'Historical Site', 'heritage': 'Historical Site', 'museum': 'Museum', 'landmark': 'Landmark',
+    'historical place': 'Historical Site', 'historic': 'Historical Site', 'monument': 'Historical Site',
+
+    # Nature categories
+    'beach': 'Beach', 'mountain': 'Mountain', 'park': 'Park', 'garden': 'Garden',
+    'nature': 'Natural Attraction', 'falls': 'Natural Attraction', 'waterfall': 'Natural Attraction',
+    'natural': 'Natural Attraction', 'scenery': 'Natural Attraction', 'outdoor': 'Natural Attraction',
+    'landscape': 'Natural Attraction', 'view': 'Natural Attraction',
+
+    # Leisure/Recreation
+    'spa': 'Spa/Restaurant', 'farm': 'Farm', 'zoo': 'Zoo', 'sports': 'Sports Facility',
+    'golf': 'Golf Course', 'golf course': 'Golf Course', 'leisure': 'Leisure',
+    'recreation': 'Leisure', 'entertainment': 'Leisure', 'amusement': 'Leisure',
+
+    # Mixed categories
+    'spa/restaurant': 'Spa/Restaurant', 'farm/restaurant': 'Farm/Restaurant',
+    'café/restaurant': 'Café/Restaurant', 'cafe restaurant': 'Café/Restaurant'
+}
+
+# Categories with their synonyms and variations
+CATEGORY_SYNONYMS = {
+    'Restaurant': ['restaurant', 'dining', 'eatery', 'food', 'cuisine', 'meal', 'bistro', 'diner', 'eating place'],
+    'Resort': ['resort', 'vacation spot', 'getaway', 'retreat'],
+    'Landmark': ['landmark', 'attraction', 'monument', 'famous place', 'tourist spot', 'destination'],
+    'Shopping/Restaurant': ['shopping', 'mall', 'shop', 'store', 'boutique', 'retail', 'shopping center', 'plaza'],
+    'Spa/Restaurant': ['spa', 'massage', 'wellness', 'relaxation', 'treatment'],
+    'Zoo': ['zoo', 'animal', 'wildlife', 'safari', 'animals'],
+    'Farm/Restaurant': ['farm', 'agriculture', 'ranch', 'plantation', 'orchard', 'farm to table'],
+    'Food Shop': ['food shop', 'bakery', 'pastry', 'dessert', 'sweets', 'delicatessen', 'specialty food'],
+    'Beach Resort': ['beach resort', 'seaside resort', 'coastal resort', 'beachfront'],
+    'Beach': ['beach', 'shore', 'coast', 'seaside', 'sand', 'bay'],
+    'Natural Attraction': ['natural attraction', 'nature', 'scenery', 'landscape', 'waterfall', 'falls', 'cave', 'rock formation'],
+    'Religious Site': ['religious site', 'church', 'temple', 'mosque', 'shrine', 'cathedral', 'chapel', 'monastery'],
+    'Sports Facility': ['sports', 'athletics', 'stadium', 'arena', 'court', 'field', 'gym', 'fitness'],
+    'Golf Course': ['golf', 'golf course', 'country club'],
+    'Park': ['park', 'plaza', 'square', 'gardens', 'playground', 'recreation area'],
+    'Mountain': ['mountain', 'hill', 'peak', 'summit', 'highlands', 'volcano', 'cliff', 'ridge'],
+    'Hotel': ['hotel', 'inn', 'lodge', 'motel', 'accommodation', 'place to stay'],
+    'Museum': ['museum', 'gallery', 'exhibit', 'collection', 'artifacts', 'heritage center'],
+    'Garden': ['garden', 'botanical', 'flowers', 'plants', 'greenhouse'],
+    'Accommodation': ['accommodation', 'lodging', 'stay', 'room', 'boarding'],
+    'Historical Site': ['historical site', 'historic', 'heritage', 'ancient', 'ruins', 'archaeology', 'old'],
+    'Hotel & Resort': ['hotel and resort', 'hotel & resort', 'resort hotel', 'luxury resort'],
+    'Leisure': ['leisure', 'entertainment', 'recreation', 'fun', 'relaxation', 'pastime', 'amusement'],
+    'Café/Restaurant': ['café', 'cafe', 'coffee shop', 'coffee', 'tea house', 'patisserie'],
+    'Farm': ['farm', 'ranch', 'plantation', 'orchard', 'agricultural', 'dairy'],
+    'Cafe': ['cafe', 'café', 'coffee shop', 'coffee house', 'espresso', 'cafeteria']
+}
+
+# Category mapping with synonyms and related terms (keys are lowercased category names)
+CATEGORY_MAPPING = {
+    "hotel": ["hotel", "resort", "lodge", "inn", "hostel", "stay", "bed and breakfast", "guesthouse", "motel", "lodging", "room"],
+    "cafe": ["cafe", "coffee", "restaurant", "breakfast", "lunch", "dinner"],
+    "restaurant": ["eat", "hungry"],
+    "historical site": ["historical", "history", "heritage", "museum", "shrine", "ancient", "old", "traditional"],
+    "natural attraction": ["nature", "natural", "outdoors", "mountain", "lake", "volcano", "falls",
+                           "waterfall", "beach", "ocean", "sea", "river", "hiking", "trek", "forest"],
+    "leisure": ["park", "amusement", "rides", "attraction", "entertainment", "fun", "thrill"],
+    "museum": ["museum", "collection", "exhibit", "gallery", "art", "cultural", "artifacts"],
+    "beach resort": ["beach resort", "seaside resort", "coastal resort", "ocean resort", "beachfront resort"]
+}
+
+# Cavite city spellings with proper capitalization
+CAVITE_CITY_NAMES = {
+    'kawit': 'Kawit',
+    'tagaytay': 'Tagaytay',
+    'amadeo': 'Amadeo',
+    'indang': 'Indang',
+    'ternate': 'Ternate',
+    'maragondon': 'Maragondon',
+    'mendez': 'Mendez',
+    'alfonso': 'Alfonso',
+    'silang': 'Silang',
+    'imus': 'Imus',
+    'bailen': 'Bailen',
+    'laurel': 'Laurel',
+    'dasmarinas': 'Dasmarinas',
+    'bacoor': 'Bacoor',
+    'trece martires': 'Trece Martires',
+    'tanza': 'Tanza',
+    'naic': 'Naic',
+    'rosario': 'Rosario',
+    'general trias': 'General Trias',
+    'cavite city': 'Cavite City'
+}
+
+GazetteerMatch = namedtuple('GazetteerMatch', ['start', 'end', 'keyword', 'kind', 'value', 'rank'])
+
+
+class AhoCorasick:
+    """Multi-pattern substring matcher: every occurrence of every keyword in one pass"""
+
+    def __init__(self, keywords):
+        self.keywords = list(keywords)
+        self.transitions = [{}]
+        fail = [0]
+        outputs = [[]]
+
+        # Trie of the keywords
+        for index, keyword in enumerate(self.keywords):
+            node = 0
+            for char in keyword:
+                child = self.transitions[node].get(char)
+                if child is None:
+                    child = len(self.transitions)
+                    self.transitions[node][char] = child
+                    self.transitions.append({})
+                    fail.append(0)
+                    outputs.append([])
+                node = child
+            outputs[node].append(index)
+
+        # Failure links breadth-first; each node also reports the keywords ending on its failure chain
+        queue = deque(self.transitions[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self.transitions[node].items():
+                queue.append(child)
+                state = fail[node]
+                while state and char not in self.transitions[state]:
+                    state = fail[state]
+                fail[child] = self.transitions[state].get(char, 0)
+                outputs[child].extend(outputs[fail[child]])
+
+        self.fail = fail
+        self.outputs = [tuple(found) for found in outputs]
+
+    def find(self, text):
+        """(start, end, keyword index) for every occurrence, in order of end position"""
+        found = []
+        node = 0
+        for position, char in enumerate(text):
+            while node and char not in self.transitions[node]:
+                node = self.fail[node]
+            node = self.transitions[node].get(char, 0)
+            for index in self.outputs[node]:
+                found.append((position + 1 - len(self.keywords[index]), position + 1, index))
+        return found
+
+
+class Gazetteer:
+    """Keyword tables of several kinds compiled into one automaton"""
+
+    def __init__(self, tables):
+        """
+        tables maps a kind to {keyword: value}; keywords are matched lowercased
+        Table order, then entry order, breaks ties between equally long hits
+        """
+        entries = {}
+        rank = 0
+        for kind, table in tables.items():
+            for keyword, value in table.items():
+                keyword = keyword.lower()
+                if keyword:
+                    entries.setdefault(keyword, []).append((kind, value, rank))
+                rank += 1
+        self.entries = entries
+        self.automaton = AhoCorasick(entries)
+
+    def scan(self, text):
+        """Every keyword hit in the text, with spans"""
+        keywords = self.automaton.keywords
+        matches = []
+        for start, end, index in self.automaton.find(text.lower()):
+            keyword = keywords[index]
+            for kind, value, rank in self.entries[keyword]:
+                matches.append(GazetteerMatch(start, end, keyword, kind, value, rank))
+        return matches
+
+    @staticmethod
+    def best(matches, kinds):
+        """The longest hit of the given kind(s), then the leftmost, then the earliest table entry"""
+        kinds = (kinds,) if isinstance(kinds, str) else kinds
+        candidates = [match for match in matches if match.kind in kinds]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda match: (match.start - match.end, match.start, match.rank))
+
+
+def _first_per_key(pairs):
+    """Dict of lowercased keys to values where the first pair for a key wins"""
+    table = {}
+    for keyword, value in pairs:
+        table.setdefault(keyword.lower(), value)
+    return table
+
+@lru_cache(maxsize=8)
+def _build_gazetteer(cities, categories):
+    categories_by_key = _first_per_key((category, category) for category in categories)
+    return Gazetteer({
+        CITY: _first_per_key((city, city) for city in cities),
+        CATEGORY: categories_by_key,
+        MAPPED_CATEGORY: _first_per_key(
+            (synonym, categories_by_key[mapped])
+            for mapped, synonyms in CATEGORY_MAPPING.items() if mapped in categories_by_key
+            for synonym in synonyms
+        ),
+        CATEGORY_KEYWORD: CATEGORY_NORMALIZATIONS,
+        CATEGORY_SYNONYM: _first_per_key(
+            (keyword, category)
+            for category, synonyms in CATEGORY_SYNONYMS.items()
+            for keyword in [category] + synonyms
+        ),
+        CAVITE_CITY: CAVITE_CITY_NAMES,
+    })
+
+def get_gazetteer(cities=(), categories=()):
+    """
+    The shared gazetteer for a set of available cities and categories
+    Compiled once per distinct set (in practice once per catalog version)
+    """
+    return _build_gazetteer(tuple(cities), tuple(categories))
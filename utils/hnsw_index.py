@@ -0,0 +1,291 @@
+"""
+HNSW approximate nearest-neighbour index over destination embeddings
+
+A hierarchical navigable small world graph built with numpy on L2-normalized
+vectors, so similarity is a dot product. The graph is saved next to the
+destination embeddings and tied to them by the embedding store fingerprint.
+Search cost grows roughly with log(n) instead of n; ef trades recall for speed.
+
+Build (from the utils directory):
+    python hnsw_index.py [--m 16] [--ef-construction 200]
+"""
+import os
+import sys
+import json
+import heapq
+import logging
+import argparse
+import numpy as np
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+if CURRENT_DIR not in sys.path:
+    sys.path.append(CURRENT_DIR)
+
+from embedding_matrix import NormalizedEmbeddings, l2_normalize
+from retrieval import top_k_similar
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_M = 16
+DEFAULT_EF_CONSTRUCTION = 200
+DEFAULT_EF_SEARCH = 64
+
+
+def as_normalized(embeddings):
+    """Use a normalized matrix as is; normalize anything else in memory"""
+    if isinstance(embeddings, NormalizedEmbeddings):
+        return embeddings
+    return l2_normalize(embeddings).view(NormalizedEmbeddings)
+
+
+class HNSWIndex:
+    """Layered proximity graph searched greedily from the top layer down"""
+
+    def __init__(self, vectors, m=DEFAULT_M, ef_construction=DEFAULT_EF_CONSTRUCTION, seed=0):
+        self.vectors = as_normalized(vectors)
+        self._matrix = np.asarray(self.vectors)  # plain ndarray view for fast row lookups
+        self.m = m
+        self.m0 = 2 * m  # the bottom layer keeps twice as many links
+        self.ef_construction = ef_construction
+        self.level_multiplier = 1 / np.log(m)
+        self.rng = np.random.default_rng(seed)
+
+        self.entry_point = None
+        self.max_level = -1
+        self.levels = np.zeros(len(self.vectors), dtype=np.int8)
+        # layers[level] maps node -> neighbour ids (a list during builds, an array once loaded)
+        self.layers = []
+        self.source_fingerprint = None
+
+    def __len__(self):
+        return len(self.vectors)
+
+    def _neighbors(self, node, level):
+        links = self.layers[level][node]
+        if isinstance(links, np.ndarray):
+            return links[links >= 0].tolist()
+        return links
+
+    def _similarities(self, query, nodes):
+        return self._matrix[nodes].astype(np.float32, copy=False).dot(query)
+
+    def _search_layer(self, query, entry_points, ef, level):
+        """
+        Beam search on one layer
+        Returns up to ef (similarity, node) pairs, best last in heap order
+        """
+        visited = set(entry_points)
+        similarities = self._similarities(query, entry_points)
+        candidates = [(-s, node) for s, node in zip(similarities.tolist(), entry_points)]
+        results = [(s, node) for s, node in zip(similarities.tolist(), entry_points)]
+        heapq.heapify(candidates)
+        heapq.heapify(results)
+        while len(results) > ef:
+            heapq.heappop(results)
+
+        while candidates:
+            negative_similarity, node = heapq.heappop(candidates)
+            if -negative_similarity < results[0][0] and len(results) >= ef:
+                break
+
+            unvisited = [neighbor for neighbor in self._neighbors(node, level) if neighbor not in visited]
+            if not unvisited:
+                continue
+            visited.update(unvisited)
+
+            for similarity, neighbor in zip(self._similarities(query, unvisited).tolist(), unvisited):
+                if len(results) < ef or similarity > results[0][0]:
+                    heapq.heappush(candidates, (-similarity, neighbor))
+                    heapq.heappush(results, (similarity, neighbor))
+                    if len(results) > ef:
+                        heapq.heappop(results)
+        return results
+
+    def _select_neighbors(self, candidates, m):
+        """
+        Keep candidates that are closer to the new node than to an already kept
+        neighbour (spreads links across directions), then fill up by similarity
+        """
+        ordered = sorted(candidates, reverse=True)
+        nodes = [node for _, node in ordered]
+        vectors = self._matrix[nodes].astype(np.float32, copy=False)
+        pairwise = vectors.dot(vectors.T).tolist()
+
+        selected = []
+        pruned = []
+        for row, (similarity, _) in enumerate(ordered):
+            if len(selected) >= m:
+                break
+            row_similarities = pairwise[row]
+            if any(row_similarities[kept] >= similarity for kept in selected):
+                pruned.append(row)
+            else:
+                selected.append(row)
+        return [nodes[row] for row in selected + pruned[:m - len(selected)]]
+
+    def _random_level(self):
+        return int(-np.log(1.0 - self.rng.random()) * self.level_multiplier)
+
+    def add(self, node):
+        """Insert one row of the vector matrix into the graph"""
+        query = np.asarray(self.vectors[node], dtype=np.float32)
+        level = self._random_level()
+        self.levels[node] = level
+        while len(self.layers) <= level:
+            self.layers.append({})
+        for layer in range(level + 1):
+            self.layers[layer][node] = []
+
+        if self.entry_point is None:
+            self.entry_point, self.max_level = node, level
+            return
+
+        entry_points = [self.entry_point]
+        for layer in range(self.max_level, level, -1):
+            best = max(self._search_layer(query, entry_points, 1, layer))
+            entry_points = [best[1]]
+
+        for layer in range(min(level, self.max_level), -1, -1):
+            found = self._search_layer(query, entry_points, self.ef_construction, layer)
+            max_links = self.m0 if layer == 0 else self.m
+            neighbors = self._select_neighbors(found, self.m)
+            self.layers[layer][node] = neighbors
+
+            for neighbor in neighbors:
+                links = self.layers[layer][neighbor]
+                links.append(node)
+                if len(links) > max_links:
+                    similarities = self._similarities(np.asarray(self.vectors[neighbor], dtype=np.float32), links)
+                    self.layers[layer][neighbor] = self._select_neighbors(
+                        list(zip(similarities.tolist(), links)), max_links
+                    )
+            entry_points = [candidate for _, candidate in found]
+
+        if level > self.max_level:
+            self.entry_point, self.max_level = node, level
+
+    def build(self, log_every=10000):
+        """Insert every vector; returns self"""
+        for node in range(len(self.vectors)):
+            self.add(node)
+            if log_every and (node + 1) % log_every == 0:
+                logger.info(f"Indexed {node + 1}/{len(self.vectors)} destinations")
+        return self
+
+    def search(self, query_embedding, k, ef=DEFAULT_EF_SEARCH, mask=None):
+        """
+        Approximate top-k by cosine similarity
+        ef is the width of the layer-0 beam, which also bounds the result count:
+        at most min(k, ef) results are returned, so raising ef trades latency
+        for recall whatever k is
+        With a mask, results are filtered and topped up exactly if too few pass
+        Returns (positions, similarities), best first
+        """
+        k = min(k, ef)
+        if self.entry_point is None or k <= 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+
+        query = l2_normalize(np.asarray(query_embedding, dtype=np.float32).reshape(-1))
+        entry_points = [self.entry_point]
+        for layer in range(self.max_level, 0, -1):
+            best = max(self._search_layer(query, entry_points, 1, layer))
+            entry_points = [best[1]]
+
+        found = sorted(self._search_layer(query, entry_points, ef, 0), reverse=True)
+        if mask is not None:
+            found = [(similarity, node) for similarity, node in found if mask[node]]
+            if len(found) < k:
+                # Too selective for the graph walk; score the allowed rows exactly
+                return top_k_similar(query, self.vectors, k, mask=mask)
+
+        found = found[:k]
+        positions = np.array([node for _, node in found], dtype=np.int64)
+        similarities = np.array([similarity for similarity, _ in found], dtype=np.float32)
+        return positions, similarities
+
+    def save(self, path):
+        """Pack the graph into fixed-width arrays and write it to an .npz file"""
+        arrays = {'levels': self.levels}
+        for layer, links_by_node in enumerate(self.layers):
+            width = self.m0 if layer == 0 else self.m
+            nodes = np.array(sorted(links_by_node), dtype=np.int64)
+            links = np.full((len(nodes), width), -1, dtype=np.int32)
+            for row, node in enumerate(nodes):
+                neighbors = self._neighbors(node, layer)
+                links[row, :len(neighbors)] = neighbors
+            arrays[f'nodes_{layer}'] = nodes
+            arrays[f'links_{layer}'] = links
+
+        arrays['metadata'] = np.array(json.dumps({
+            'count': len(self.vectors),
+            'm': self.m,
+            'ef_construction': self.ef_construction,
+            'entry_point': None if self.entry_point is None else int(self.entry_point),
+            'max_level': self.max_level,
+            'source_fingerprint': self.source_fingerprint
+        }))
+
+        # Write then rename so a running server never reads a partial index
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = path + '.tmp.npz'
+        np.savez(temp_path, **arrays)
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path, vectors, source_fingerprint=None):
+        """
+        Load a saved graph over the given vectors
+        Returns None if it's missing or was built from other embeddings
+        """
+        if not os.path.exists(path):
+            return None
+        with np.load(path) as data:
+            metadata = json.loads(str(data['metadata']))
+            if metadata['count'] != len(vectors):
+                return None
+            if source_fingerprint is not None and metadata['source_fingerprint'] != source_fingerprint:
+                return None
+
+            index = cls(vectors, m=metadata['m'], ef_construction=metadata['ef_construction'])
+            index.entry_point = metadata['entry_point']
+            index.max_level = metadata['max_level']
+            index.source_fingerprint = metadata['source_fingerprint']
+            index.levels = data['levels']
+
+            # The bottom layer holds every node, so it stays a dense array indexed by node
+            index.layers = [data['links_0']]
+            for layer in range(1, index.max_level + 1):
+                nodes = data[f'nodes_{layer}'].tolist()
+                index.layers.append(dict(zip(nodes, data[f'links_{layer}'])))
+        return index
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    from model_artifacts import DESTINATION_EMBEDDINGS_PATH, NORMALIZED_EMBEDDINGS_PATH, HNSW_INDEX_PATH
+    from embedding_store import EmbeddingStore
+    from embedding_matrix import open_normalized
+
+    parser = argparse.ArgumentParser(description='Build the HNSW index for destination embeddings')
+    parser.add_argument('--m', type=int, default=DEFAULT_M, help='Links per node on upper layers')
+    parser.add_argument('--ef-construction', type=int, default=DEFAULT_EF_CONSTRUCTION,
+                        help='Beam width while building (higher = better graph, slower build)')
+    args = parser.parse_args()
+
+    store = EmbeddingStore(DESTINATION_EMBEDDINGS_PATH)
+    if not store.load():
+        logger.error("No destination embeddings found. Start the model server once to build them.")
+        sys.exit(1)
+
+    vectors = open_normalized(NORMALIZED_EMBEDDINGS_PATH, source_fingerprint=store.fingerprint)
+    if vectors is None:
+        vectors = store.embeddings
+
+    logger.info(f"Building HNSW index over {len(vectors)} destinations (m={args.m}, ef_construction={args.ef_construction})")
+    index = HNSWIndex(vectors, m=args.m, ef_construction=args.ef_construction).build()
+    index.source_fingerprint = store.fingerprint
+    index.save(HNSW_INDEX_PATH)
+    logger.info(f"Saved HNSW index to {HNSW_INDEX_PATH}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""
+Micro-batching queue for query embeddings
+
+Collects query-encoding requests arriving from concurrent request threads for a
+few milliseconds and runs them through the encoder as one batched forward pass.
+"""
+import time
+import threading
+import logging
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+
+class _PendingQuery:
+    """A single query waiting for its embedding"""
+
+    __slots__ = ('text', 'event', 'result', 'error', 'enqueued_at')
+
+    def __init__(self, text):
+        self.text = text
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+        self.enqueued_at = time.time()
+
+
+class InferenceQueue:
+    def __init__(self, encode_batch, max_batch_size=16, max_wait_ms=5, timeout_s=30):
+        """
+        encode_batch: function taking a list of texts and returning one vector per text
+        max_batch_size: maximum number of queries per forward pass
+        max_wait_ms: how long to wait for more queries once the first one arrives
+        timeout_s: how long a caller waits for its result
+        """
+        self.encode_batch = encode_batch
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0, max_wait_ms) / 1000.0
+        self.timeout_s = timeout_s
+
+        self._pending = deque()
+        self._condition = threading.Condition()
+        self._worker = None
+        self._running = False
+
+        # Metrics
+        self._stats_lock = threading.Lock()
+        self.total_requests = 0
+        self.total_batches = 0
+        self.total_errors = 0
+        self.max_batch_seen = 0
+        self.max_queue_depth = 0
+        self.total_wait_time = 0.0
+        self.total_inference_time = 0.0
+        self.batch_size_histogram = {}
+
+    def start(self):
+        """Start the background worker thread"""
+        with self._condition:
+            if self._running:
+                return
+            self._running = True
+            self._worker = threading.Thread(target=self._run, name='inference-queue', daemon=True)
+            self._worker.start()
+        logger.info(f"Inference queue started (max_batch_size={self.max_batch_size}, max_wait_ms={self.max_wait * 1000:.1f})")
+
+    def stop(self):
+        """Stop the worker; queries still queued are failed"""
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+        if self._worker is not None:
+            self._worker.join(timeout=5)
+            self._worker = None
+
+    def encode(self, text):
+        """
+        Submit a single query and block until its embedding is ready
+        Returns a 1-D vector for the query
+        """
+        if not self._running:
+            self.start()
+
+        pending = _PendingQuery(text)
+        with self._condition:
+            self._pending.append(pending)
+            self.max_queue_depth = max(self.max_queue_depth, len(self._pending))
+            self._condition.notify()
+
+        if not pending.event.wait(self.timeout_s):
+            raise TimeoutError(f"Query embedding not ready after {self.timeout_s}s")
+        if pending.error is not None:
+            raise pending.error
+        return pending.result
+
+    def _next_batch(self):
+        """Wait for the first query, then gather more until the batch is full or the wait expires"""
+        with self._condition:
+            while self._running and not self._pending:
+                self._condition.wait()
+            if not self._running:
+                return []
+
+            deadline = self._pending[0].enqueued_at + self.max_wait
+            while len(self._pending) < self.max_batch_size:
+                remaining = deadline - time.time()
+                if remaining <= 0 or not self._running:
+                    break
+                self._condition.wait(remaining)
+
+            batch = []
+            while self._pending and len(batch) < self.max_batch_size:
+                batch.append(self._pending.popleft())
+            return batch
+
+    def _run(self):
+        while self._running:
+            batch = self._next_batch()
+            if batch:
+                self._process(batch)
+
+        # Fail anything left behind so callers don't hang
+        with self._condition:
+            leftover = list(self._pending)
+            self._pending.clear()
+        for pending in leftover:
+            pending.error = RuntimeError("Inference queue stopped")
+            pending.event.set()
+
+    def _process(self, batch):
+        started = time.time()
+        try:
+            vectors = self.encode_batch([pending.text for pending in batch])
+            if len(vectors) != len(batch):
+                raise RuntimeError(f"Encoder returned {len(vectors)} vectors for {len(batch)} queries")
+            for pending, vector in zip(batch, vectors):
+                pending.result = vector
+        except Exception as e:
+            logger.error(f"Error encoding query batch of {len(batch)}: {e}")
+            for pending in batch:
+                pending.error = e
+            with self._stats_lock:
+                self.total_errors += 1
+        finally:
+            finished = time.time()
+            with self._stats_lock:
+                self.total_requests += len(batch)
+                self.total_batches += 1
+                self.max_batch_seen = max(self.max_batch_seen, len(batch))
+                self.total_wait_time += sum(started - pending.enqueued_at for pending in batch)
+                self.total_inference_time += finished - started
+                self.batch_size_histogram[len(batch)] = self.batch_size_histogram.get(len(batch), 0) + 1
+            for pending in batch:
+                pending.event.set()
+
+    def get_stats(self):
+        """Batch-size and queue-depth metrics"""
+        with self._stats_lock:
+            batches = self.total_batches
+            requests = self.total_requests
+            return {
+                'running': self._running,
+                'max_batch_size': self.max_batch_size,
+                'max_wait_ms': self.max_wait * 1000,
+                'queue_depth': len(self._pending),
+                'max_queue_depth': self.max_queue_depth,
+                'total_requests': requests,
+                'total_batches': batches,
+                'total_errors': self.total_errors,
+                'avg_batch_size': requests / batches if batches else 0,
+                'max_batch_seen': self.max_batch_seen,
+                'avg_queue_wait_ms': (self.total_wait_time / requests * 1000) if requests else 0,
+                'avg_batch_inference_ms': (self.total_inference_time / batches * 1000) if batches else 0,
+                'batch_size_histogram': dict(sorted(self.batch_size_histogram.items()))
+            }
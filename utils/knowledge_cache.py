@@ -1,6 +1,8 @@
 import time
-from collections import defaultdict, Counter
+import threading
+from collections import defaultdict, Counter, OrderedDict
 import logging
+from serving_config import SERVING_CONFIG
 
 logger = logging.getLogger(__name__)
 
@@ -321,5 +323,118 @@ class KnowledgeCache:
             
         return (positive_count - negative_count) / total
 
+# Bounded LRU cache with expiry, shared by the query caches below
+class VersionedLRUCache:
+    """
+    Thread-safe LRU cache with a TTL, keyed by normalized query text and a version
+    (model version for embeddings, catalog version for parsed queries)
+    """
+    def __init__(self, max_size=1000, expiry_time=3600):
+        self.cache = OrderedDict()
+        self.max_size = max_size
+        self.expiry_time = expiry_time
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+    
+    @staticmethod
+    def normalize_text(text):
+        """Collapse whitespace; case is kept because the encoder is case-sensitive"""
+        return " ".join(str(text).split())
+    
+    def get(self, text, version):
+        """Get the cached value for a query, or None"""
+        key = (self.normalize_text(text), version)
+        with self.lock:
+            entry = self.cache.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            
+            value, timestamp = entry
+            if time.time() - timestamp > self.expiry_time:
+                del self.cache[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            
+            # Mark as most recently used
+            self.cache.move_to_end(key)
+            self.hits += 1
+            return value
+    
+    def add(self, text, version, value):
+        """Cache the value for a query"""
+        key = (self.normalize_text(text), version)
+        with self.lock:
+            self.cache[key] = (value, time.time())
+            self.cache.move_to_end(key)
+            
+            # Evict least recently used entries
+            while len(self.cache) > self.max_size:
+                self.cache.popitem(last=False)
+                self.evictions += 1
+    
+    def clear(self):
+        """Remove all cached entries"""
+        with self.lock:
+            self.cache.clear()
+    
+    def get_stats(self):
+        """Get hit/miss counters for the cache"""
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self.cache),
+                'max_size': self.max_size,
+                'expiry_time': self.expiry_time,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0,
+                'evictions': self.evictions,
+                'expirations': self.expirations
+            }
+
+# Query embeddings per model version, so repeated queries skip the encoder
+class QueryEmbeddingCache(VersionedLRUCache):
+    def add(self, text, model_version, embedding):
+        """Cache the embedding (a numpy array) for a query"""
+        # Cached arrays are shared between requests, so guard against in-place edits
+        embedding.setflags(write=False)
+        super().add(text, model_version, embedding)
+
+# Parsed queries per catalog version, so repeated phrasings skip NER and keyword matching
+class QueryInfoCache(VersionedLRUCache):
+    def __init__(self, max_size=1000, expiry_time=3600):
+        super().__init__(max_size, expiry_time)
+        self.invalidations = 0
+    
+    def retain_version(self, version):
+        """Drop entries parsed against any other catalog version"""
+        with self.lock:
+            stale = [key for key in self.cache if key[1] != version]
+            for key in stale:
+                del self.cache[key]
+            self.invalidations += len(stale)
+    
+    def get_stats(self):
+        stats = super().get_stats()
+        stats['invalidations'] = self.invalidations
+        return stats
+
 # Initialize knowledge cache
-knowledge_cache = KnowledgeCache() 
\ No newline at end of file
+knowledge_cache = KnowledgeCache()
+
+# Initialize query embedding cache
+query_embedding_cache = QueryEmbeddingCache(
+    max_size=SERVING_CONFIG['query_embedding_cache_size'],
+    expiry_time=SERVING_CONFIG['query_embedding_cache_ttl_s']
+)
+
+# Initialize parsed query cache
+query_info_cache = QueryInfoCache(
+    max_size=SERVING_CONFIG['query_info_cache_size'],
+    expiry_time=SERVING_CONFIG['query_info_cache_ttl_s']
+)
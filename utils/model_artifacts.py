@@ -0,0 +1,66 @@
+"""
+Locations and version tags of model artifacts
+"""
+import os
+import json
+import hashlib
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+MODEL_OUTPUT_DIR = os.path.join(CURRENT_DIR, 'model_output')
+
+MODEL_PATH = os.path.join(MODEL_OUTPUT_DIR, 'wertigo.pt')
+ONNX_MODEL_PATH = os.path.join(MODEL_OUTPUT_DIR, 'query_encoder.onnx')
+QUANTIZED_MODEL_PATH = os.path.join(MODEL_OUTPUT_DIR, 'wertigo_int8.pt')
+DESTINATION_EMBEDDINGS_PATH = os.path.join(MODEL_OUTPUT_DIR, 'destination_embeddings.npy')
+NORMALIZED_EMBEDDINGS_PATH = os.path.join(MODEL_OUTPUT_DIR, 'destination_embeddings_normalized.npy')
+HNSW_INDEX_PATH = os.path.join(MODEL_OUTPUT_DIR, 'destination_embeddings_hnsw.npz')
+PQ_INDEX_PATH = os.path.join(MODEL_OUTPUT_DIR, 'destination_embeddings_pq.npz')
+EMBEDDING_CHECKPOINT_DIR = os.path.join(MODEL_OUTPUT_DIR, 'embedding_checkpoint')
+SERVING_BUNDLE_PATH = os.path.join(MODEL_OUTPUT_DIR, 'wertigo_serving.bundle')
+
+DATA_FILE = os.path.join(CURRENT_DIR, 'final_dataset.csv')
+TOKENIZER_DIR = os.path.join(CURRENT_DIR, 'tokenizer')
+
+def digest_path_for(path):
+    return path + '.sha256.json'
+
+def file_digest(path):
+    """
+    SHA-256 of a file's content
+    Cached next to the file keyed by its size and mtime, so the file is only
+    re-read after it changes; a copy or touch just re-hashes to the same digest
+    """
+    stat = os.stat(path)
+    cache_path = digest_path_for(path)
+    try:
+        with open(cache_path) as f:
+            cached = json.load(f)
+        if cached.get('size') == stat.st_size and cached.get('mtime_ns') == stat.st_mtime_ns:
+            return cached['sha256']
+    except (OSError, ValueError, KeyError):
+        pass
+
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    sha256 = digest.hexdigest()
+
+    # Write then rename; a read-only directory just means hashing again next time
+    try:
+        temp_path = f"{cache_path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump({'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': sha256}, f)
+        os.replace(temp_path, cache_path)
+    except OSError:
+        pass
+    return sha256
+
+def get_model_version(model_path):
+    """
+    Build a version tag for a saved model (or any artifact) from its content digest
+    Returns 'untrained' if the model file doesn't exist
+    """
+    if not os.path.exists(model_path):
+        return 'untrained'
+    return f"{os.path.basename(model_path)}-{file_digest(model_path)[:16]}"
@@ -2,8 +2,25 @@ import os
 import sys
 import torch
 import numpy as np
-import importlib.util
+import importlib
+import time
 import logging
+import threading
+from serving_config import SERVING_CONFIG
+from inference_queue import InferenceQueue
+from text_encoder import encode_texts
+from embedding_builder import build_embeddings
+from embedding_store import EmbeddingStore, manifest_path_for
+from embedding_matrix import load_normalized
+from partitioned_index import PartitionedIndex
+from reranker import DestinationReranker
+from destination_catalog import DestinationCatalog
+from serving_snapshot import ServingSnapshot
+from knowledge_cache import query_embedding_cache, query_info_cache
+from query_understanding import extract_query_info
+from model_artifacts import (MODEL_OUTPUT_DIR, MODEL_PATH, ONNX_MODEL_PATH, EMBEDDING_CHECKPOINT_DIR,
+                             DESTINATION_EMBEDDINGS_PATH, NORMALIZED_EMBEDDINGS_PATH, HNSW_INDEX_PATH, PQ_INDEX_PATH,
+                             SERVING_BUNDLE_PATH, DATA_FILE, get_model_version)
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -15,41 +32,123 @@ if CURRENT_DIR not in sys.path:
     sys.path.append(CURRENT_DIR)
 
 # Constants
-MODEL_OUTPUT_DIR = os.path.join(CURRENT_DIR, 'model_output')
 device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
 
 # Global variables
 model = None
-df = None
-embeddings = None
 tokenizer = None
+query_queue = None
+model_version = None
+query_encoder = None
+travel_model = None
+serving_bundle = None
+snapshot = ServingSnapshot()  # current catalog, embeddings and search indexes
+catalog_listeners = []
+reload_lock = threading.Lock()
+last_dataset_check = time.monotonic()
 
 # Initialize model state
 logger.info(f"Using device: {device}")
 
-# Import from revised.py
+# Load the serving half of the model code once and reuse the module
+def get_travel_model():
+    global travel_model
+    if travel_model is None:
+        # destination_model, not revised: the API never loads the training stack
+        travel_model = importlib.import_module("destination_model")
+    return travel_model
+
+# Import the model components
 def import_model_components():
     try:
-        # Use importlib.util to load the revised module
-        revised_path = os.path.join(CURRENT_DIR, "revised.py")
-        spec = importlib.util.spec_from_file_location("travel_model", revised_path)
-        travel_model = importlib.util.module_from_spec(spec)
-        spec.loader.exec_module(travel_model)
-        
-        # Import the required components from revised.py
-        return travel_model.DestinationRecommender, travel_model.extract_query_info, travel_model.load_data, travel_model.preprocess_data
+        travel_model = get_travel_model()
+        
+        # Import the required components from destination_model
+        return travel_model.DestinationRecommender, extract_query_info, travel_model.load_data, travel_model.preprocess_data
     except Exception as e:
-        logger.error(f"Error importing from revised.py: {e}")
+        logger.error(f"Error importing from destination_model.py: {e}")
         raise
 
+# Optionally serve with int8 quantized encoder weights
+def quantize_for_serving(loaded_model):
+    if not SERVING_CONFIG['quantize_encoder']:
+        return
+    if device.type != 'cpu':
+        logger.warning("Int8 dynamic quantization is CPU-only; serving the fp32 model")
+    else:
+        from quantization import apply_int8_quantization
+        apply_int8_quantization(loaded_model, loaded_model.model_version)
+        loaded_model.model_version += '+int8'
+
+# Load the model and catalog from the single-file serving bundle
+def load_serving_bundle():
+    """
+    Returns (model, df), or (None, None) to fall back to the dataset and checkpoint
+    """
+    global serving_bundle
+    if not SERVING_CONFIG['serving_bundle']:
+        return None, None
+    
+    from serving_bundle import open_bundle
+    bundle = open_bundle(SERVING_BUNDLE_PATH, model_path=MODEL_PATH, data_file=DATA_FILE)
+    if bundle is None:
+        return None, None
+    
+    try:
+        loaded_model = bundle.build_model(device)
+        quantize_for_serving(loaded_model)
+        if loaded_model.model_version != bundle.sources.get('embedding_version'):
+            logger.warning(f"Serving bundle embeddings were encoded by {bundle.sources.get('embedding_version')}, "
+                           f"not {loaded_model.model_version}; falling back to the dataset")
+            return None, None
+        data_df = bundle.catalog_frame()
+    except Exception as e:
+        logger.warning(f"Error loading serving bundle, falling back to the dataset: {e}")
+        return None, None
+    
+    serving_bundle = bundle
+    logger.info(f"Serving bundle {bundle.version} loaded with {len(data_df)} destinations")
+    return loaded_model, data_df
+
+# Rebuild the int8 model from its cache, skipping from_pretrained and the fp32 checkpoint
+def load_quantized_model(DestinationRecommender, num_labels):
+    """
+    Returns the quantized model, or None if there is no current cache for wertigo.pt
+    """
+    from quantization import load_cached_model
+    
+    source_version = get_model_version(MODEL_PATH)
+    try:
+        loaded_model = load_cached_model(
+            lambda labels, dropout, config: DestinationRecommender(labels, dropout=dropout, config=config),
+            source_version
+        )
+    except Exception as e:
+        logger.warning(f"Error loading quantized model cache: {e}")
+        return None
+    if loaded_model is None:
+        return None
+    if loaded_model.classifier.out_features != num_labels:
+        logger.warning("Quantized model cache has a different number of labels than the dataset")
+        return None
+    
+    loaded_model.model_version = source_version + '+int8'
+    logger.info(f"Loaded int8 quantized model for {source_version} from its cache")
+    return loaded_model
+
 # Load model from saved state
 def load_model():
     """
     Load the recommendation model and destination data
     """
     # Check if model output directory exists
-    model_path = os.path.join(MODEL_OUTPUT_DIR, 'wertigo.pt')
-    data_file = os.path.join(CURRENT_DIR, "final_dataset.csv")
+    model_path = MODEL_PATH
+    data_file = DATA_FILE
+    
+    # A current serving bundle holds everything, without the CSV or a download
+    loaded_model, data_df = load_serving_bundle()
+    if loaded_model is not None:
+        return loaded_model, data_df, None
     
     # Check if data file exists
     if not os.path.exists(data_file):
@@ -71,6 +170,12 @@ def load_model():
         num_labels = len(label_encoder.classes_)
         logger.info(f"Number of categories (labels): {num_labels}")
         
+        # A current int8 cache is all the quantized mode needs; the fp32 model is never built
+        if SERVING_CONFIG['quantize_encoder'] and device.type == 'cpu' and os.path.exists(model_path):
+            loaded_model = load_quantized_model(DestinationRecommender, num_labels)
+            if loaded_model is not None:
+                return loaded_model, data_df, label_encoder
+        
         # Initialize model with correct architecture
         loaded_model = DestinationRecommender(num_labels=num_labels).to(device)
         
@@ -97,6 +202,10 @@ def load_model():
                     if os.path.exists(embeddings_path):
                         os.remove(embeddings_path)
                         logger.info("Removed incompatible embeddings file")
+                    
+                    manifest_path = manifest_path_for(embeddings_path)
+                    if os.path.exists(manifest_path):
+                        os.remove(manifest_path)
                         
                     indices_path = os.path.join(MODEL_OUTPUT_DIR, 'embedding_indices.npy')
                     if os.path.exists(indices_path):
@@ -111,6 +220,11 @@ def load_model():
             logger.info("No existing model found. Model initialized but needs training.")
         
         loaded_model.eval()
+        loaded_model.model_version = get_model_version(model_path)
+        
+        if os.path.exists(model_path):
+            quantize_for_serving(loaded_model)
+        
         return loaded_model, data_df, label_encoder
         
     except Exception as e:
@@ -123,74 +237,42 @@ def load_model():
 def get_embeddings(model, df):
     """
     Load or create embeddings for destinations
+    Only destinations that are new or whose text changed are re-encoded
     """
-    embeddings_path = os.path.join(MODEL_OUTPUT_DIR, 'destination_embeddings.npy')
-    
     try:
-        if os.path.exists(embeddings_path):
-            loaded_embeddings = np.load(embeddings_path)
-            # Check if the shape matches our current data
-            if len(loaded_embeddings) == len(df):
-                logger.info(f"Loaded embeddings for {len(loaded_embeddings)} destinations.")
-                return loaded_embeddings
-            else:
-                logger.warning(f"Embeddings size mismatch. Expected {len(df)}, got {len(loaded_embeddings)}. Creating new embeddings...")
-        else:
-            logger.info("Embeddings file not found. Creating new embeddings...")
-        
-        # If embeddings don't exist or don't match, create them
-        logger.info(f"Generating embeddings for {len(df)} destinations...")
-        embeddings = []
-        
-        # Process in batches to avoid memory issues
-        batch_size = 8  # Smaller batch size for safety
-        for i in range(0, len(df), batch_size):
-            batch_df = df.iloc[i:i + batch_size]
-            if i % 32 == 0:  # Log every 32 items
-                logger.info(f"Processing destinations {i}/{len(df)}...")
-            
-            with torch.no_grad():
-                for _, row in batch_df.iterrows():
-                    # Use the combined_text field
-                    text = str(row['combined_text'])
-                    
-                    # Truncate if too long
-                    if len(text) > 1000:
-                        text = text[:1000]
-                    
-                    encoding = tokenizer(
-                        text,
-                        add_special_tokens=True,
-                        max_length=512,
-                        return_token_type_ids=False,
-                        padding='max_length',
-                        truncation=True,
-                        return_attention_mask=True,
-                        return_tensors='pt'
-                    ).to(device)
-                    
-                    outputs = model.roberta(
-                        input_ids=encoding['input_ids'],
-                        attention_mask=encoding['attention_mask']
-                    )
-                    embedding = outputs.last_hidden_state[:, 0, :].cpu().numpy()
-                    embeddings.append(embedding[0])  # Remove the batch dimension
+        # Use the combined_text field, truncated if too long
+        texts = get_travel_model().embedding_texts(df)
         
-        # Convert to numpy array
-        embeddings = np.array(embeddings)
+        def encode(changed_texts):
+            logger.info(f"Generating embeddings for {len(changed_texts)} destinations...")
+            # Length-sorted, dynamically padded batches, checkpointed so an interrupted build resumes
+            return build_embeddings(
+                changed_texts,
+                tokenizer,
+                model,
+                device=device,
+                batch_size=SERVING_CONFIG['embedding_batch_size'],
+                chunk_size=SERVING_CONFIG['embedding_checkpoint_chunk_size'],
+                num_workers=SERVING_CONFIG['embedding_build_workers'],
+                checkpoint_dir=EMBEDDING_CHECKPOINT_DIR
+            )
+        
+        store = EmbeddingStore(DESTINATION_EMBEDDINGS_PATH)
+        embeddings = store.refresh(df, texts, model.model_version, encode)
         
         # Verify the embeddings shape
         if len(embeddings) != len(df):
-            logger.error(f"Generated embeddings count ({len(embeddings)}) doesn't match destinations count ({len(df)})")
+            logger.error(f"Embeddings count ({len(embeddings)}) doesn't match destinations count ({len(df)})")
             return np.array([])
         
-        # Save the embeddings
-        try:
-            os.makedirs(os.path.dirname(embeddings_path), exist_ok=True)
-            np.save(embeddings_path, embeddings)
-            logger.info(f"Saved embeddings for {len(embeddings)} destinations.")
-        except Exception as e:
-            logger.warning(f"Failed to save embeddings: {e}")
+        # Serve pre-normalized vectors from a memory-mapped file shared by all workers
+        if SERVING_CONFIG['embedding_mmap']:
+            embeddings = load_normalized(
+                NORMALIZED_EMBEDDINGS_PATH,
+                embeddings,
+                dtype=SERVING_CONFIG['embedding_matrix_dtype'],
+                source_fingerprint=store.fingerprint
+            )
         
         return embeddings
         
@@ -200,27 +282,311 @@ def get_embeddings(model, df):
         traceback.print_exc()
         return np.array([])
 
+# Load the approximate nearest-neighbour index for large catalogs
+def load_ann_index(embeddings):
+    """
+    Load the HNSW index built for the current destination embeddings
+    Returns None for small catalogs, or if the index is missing or stale
+    """
+    if not SERVING_CONFIG['ann_index'] or len(embeddings) < SERVING_CONFIG['ann_min_destinations']:
+        return None
+    
+    try:
+        from hnsw_index import HNSWIndex
+        
+        store = EmbeddingStore(DESTINATION_EMBEDDINGS_PATH)
+        if not store.load():
+            return None
+        
+        index = HNSWIndex.load(HNSW_INDEX_PATH, embeddings, source_fingerprint=store.fingerprint)
+        if index is None:
+            logger.warning("HNSW index is missing or out of date; scoring every destination. "
+                           "Build it with: python hnsw_index.py")
+            return None
+        
+        logger.info(f"Loaded HNSW index over {len(index)} destinations")
+        return index
+    except Exception as e:
+        logger.warning(f"HNSW index unavailable, scoring every destination: {e}")
+        return None
+
+# Load product-quantized codes when the compact embedding format is selected
+def load_pq_index(embeddings):
+    """
+    Load the PQ codes built for the current destination embeddings
+    Returns None unless embedding_format is 'pq' and the codes are up to date
+    """
+    if SERVING_CONFIG['embedding_format'] != 'pq':
+        if SERVING_CONFIG['embedding_format'] != 'dense':
+            logger.warning(f"Unknown embedding format '{SERVING_CONFIG['embedding_format']}', using dense embeddings")
+        return None
+    
+    try:
+        from pq_codec import PQIndex
+        
+        store = EmbeddingStore(DESTINATION_EMBEDDINGS_PATH)
+        if not store.load():
+            return None
+        
+        # Full vectors stay on disk behind mmap; only re-ranked rows are read
+        index = PQIndex.load(PQ_INDEX_PATH, vectors=embeddings, source_fingerprint=store.fingerprint)
+        if index is None:
+            logger.warning("PQ codes are missing or out of date; using dense embeddings. "
+                           "Build them with: python pq_codec.py")
+            return None
+        
+        logger.info(f"Loaded PQ codes for {len(index)} destinations ({index.nbytes / 1e6:.1f} MB)")
+        return index
+    except Exception as e:
+        logger.warning(f"PQ codes unavailable, using dense embeddings: {e}")
+        return None
+
+def get_snapshot():
+    """
+    The current catalog, embeddings and search indexes
+    Read it once per request and use only it: a reload replaces the whole snapshot
+    """
+    return snapshot
+
+def get_catalog():
+    """The columnar catalog of the loaded destinations (None until data is loaded)"""
+    return snapshot.catalog
+
+def add_catalog_listener(listener):
+    """Call listener(catalog) every time a new destination catalog is published"""
+    catalog_listeners.append(listener)
+
+def publish_snapshot(new_snapshot):
+    """Make a snapshot current with a single assignment, then notify catalog listeners"""
+    global snapshot
+    snapshot = new_snapshot
+    catalog = new_snapshot.catalog
+    logger.info(f"Destination catalog version {catalog.version}: {catalog.size} rows")
+    # Parsed queries refer to the previous catalog's cities and categories
+    query_info_cache.retain_version(catalog.version)
+    for listener in list(catalog_listeners):
+        try:
+            listener(catalog)
+        except Exception as e:
+            logger.error(f"Error in catalog listener {listener}: {e}")
+    return catalog
+
+def build_snapshot(data_df, data_embeddings, data_version=None):
+    """
+    Catalog, ANN index, PQ codes, partitions and re-ranker for a dataframe and its embeddings
+    data_version is the version of the dataset file the dataframe was read from
+    """
+    new_catalog = DestinationCatalog(data_df)
+    if data_embeddings is None or len(data_embeddings) == 0:
+        return ServingSnapshot(catalog=new_catalog, embeddings=data_embeddings, data_version=data_version)
+    return ServingSnapshot(
+        catalog=new_catalog,
+        embeddings=data_embeddings,
+        ann_index=load_ann_index(data_embeddings),
+        pq_index=load_pq_index(data_embeddings),
+        destination_index=PartitionedIndex(data_df, SERVING_CONFIG['partition_max_fraction']),
+        destination_reranker=DestinationReranker(data_df),
+        data_version=data_version
+    )
+
+def reload_dataset(data_file=None, only_if_changed=False):
+    """
+    Reload final_dataset.csv (or data_file) and rebuild everything derived from it
+    Only new or changed destinations are re-encoded. Returns the new catalog, or None on failure
+    With only_if_changed, a file whose content digest matches the current snapshot's is not reloaded
+    """
+    with reload_lock:
+        data_file = data_file or DATA_FILE
+        try:
+            # Versioned before reading, so a change made during the load is seen by the next check
+            data_version = get_model_version(data_file)
+            if only_if_changed and data_version == snapshot.data_version:
+                return snapshot.catalog
+            
+            _, _, load_data, preprocess_data = import_model_components()
+            data_df, _ = preprocess_data(load_data(data_file))
+            data_embeddings = get_embeddings(model, data_df) if model is not None else None
+            new_snapshot = build_snapshot(data_df, data_embeddings, data_version)
+        except Exception as e:
+            logger.error(f"Error reloading dataset, keeping the current one: {e}")
+            return None
+        
+        # Requests in flight keep the snapshot they already read
+        return publish_snapshot(new_snapshot)
+
+def check_dataset_version():
+    """
+    Start a background reload if final_dataset.csv changed since the current snapshot was loaded
+    Called on every request of every worker process; the file is looked at most once per
+    dataset_reload_check_s, and its digest is cached by size and mtime, so a check is a stat
+    Returns True if a reload was started
+    """
+    global last_dataset_check
+    interval = SERVING_CONFIG['dataset_reload_check_s']
+    now = time.monotonic()
+    if not interval or now - last_dataset_check < interval:
+        return False
+    last_dataset_check = now
+    
+    current = snapshot
+    if current.catalog is None or current.data_version is None or not os.path.exists(DATA_FILE):
+        return False
+    try:
+        if get_model_version(DATA_FILE) == current.data_version:
+            return False
+    except OSError as e:
+        logger.warning(f"Could not check {DATA_FILE} for changes: {e}")
+        return False
+    
+    # Requests keep being served from the current snapshot while this worker reloads
+    logger.info(f"{os.path.basename(DATA_FILE)} changed; reloading it in the background")
+    threading.Thread(target=reload_dataset, kwargs={'only_if_changed': True},
+                     name='dataset-reload', daemon=True).start()
+    return True
+
+# Select the runtime that serves query embeddings
+def load_query_encoder(model, backend='torch', encoder_model='teacher'):
+    """
+    Load the query encoder for the configured backend and encoder model
+    Returns (encoder, version tag); falls back to the full PyTorch model if the choice is unavailable
+    """
+    base_version = model.model_version
+    
+    if encoder_model == 'student':
+        try:
+            student_config = os.path.join(MODEL_OUTPUT_DIR, 'student_encoder.json')
+            if not os.path.exists(student_config):
+                raise FileNotFoundError(f"{student_config} not found. Distill it with: python train_revised_model.py --distill")
+            
+            student, metadata = get_travel_model().load_student(MODEL_OUTPUT_DIR)
+            teacher_version = get_model_version(MODEL_PATH)
+            if metadata.get('teacher_model_version') != teacher_version:
+                raise ValueError(
+                    f"Student was distilled from {metadata.get('teacher_model_version')}, "
+                    f"but the teacher is {teacher_version}. Re-run: python train_revised_model.py --distill"
+                )
+            
+            num_layers = student.roberta.config.num_hidden_layers
+            if backend != 'torch':
+                # Only the teacher is exported to ONNX
+                logger.warning(f"Query encoder backend '{backend}' is not available for the student encoder; "
+                               "serving it with PyTorch")
+            logger.info(f"Serving query embeddings with the {num_layers}-layer student encoder")
+            return student, f"{teacher_version}+student-{num_layers}l"
+        except Exception as e:
+            logger.warning(f"Student query encoder unavailable, using the full model: {e}")
+    elif encoder_model != 'teacher':
+        logger.warning(f"Unknown query encoder model '{encoder_model}', using the full model")
+    
+    if backend == 'onnx':
+        try:
+            from onnx_encoder import OnnxEncoder
+            if not os.path.exists(ONNX_MODEL_PATH):
+                raise FileNotFoundError(f"{ONNX_MODEL_PATH} not found. Export it with: python onnx_encoder.py")
+            
+            onnx_encoder = OnnxEncoder(ONNX_MODEL_PATH, num_threads=SERVING_CONFIG['onnx_num_threads'])
+            if onnx_encoder.source_model_version != base_version:
+                raise ValueError(
+                    f"ONNX export was made from {onnx_encoder.source_model_version}, "
+                    f"but the loaded model is {base_version}. Re-export with: python onnx_encoder.py"
+                )
+            
+            logger.info(f"Serving query embeddings with ONNX Runtime from {ONNX_MODEL_PATH}")
+            return onnx_encoder, f"{base_version}+onnx"
+        except Exception as e:
+            logger.warning(f"ONNX query encoder unavailable, using PyTorch: {e}")
+    elif backend != 'torch':
+        logger.warning(f"Unknown query encoder backend '{backend}', using PyTorch")
+    
+    return model, base_version
+
+# Encode a batch of query texts in a single forward pass
+def encode_query_batch(texts):
+    """
+    Encode a list of query texts with the query encoder
+    Returns an array with one CLS embedding per text
+    """
+    return encode_texts(texts, tokenizer, query_encoder, device=device, batch_size=len(texts))
+
+def encode_query(text):
+    """
+    Encode a single query, using the embedding cache and the micro-batching queue
+    Returns a (1, hidden_size) array
+    """
+    text = query_embedding_cache.normalize_text(text)
+    cached = query_embedding_cache.get(text, model_version)
+    if cached is not None:
+        return cached
+    
+    if query_queue is None:
+        embedding = encode_query_batch([text])
+    else:
+        # The queue hands back a row of the whole batch's output; copy it so the
+        # cached entry doesn't keep the batch matrix alive
+        embedding = query_queue.encode(text).reshape(1, -1).copy()
+    
+    query_embedding_cache.add(text, model_version, embedding)
+    return embedding
+
+def get_queue_stats():
+    """Get metrics for the query inference queue"""
+    return query_queue.get_stats() if query_queue is not None else None
+
+def get_cache_stats():
+    """Get metrics for the query embedding cache"""
+    stats = query_embedding_cache.get_stats()
+    stats['model_version'] = model_version
+    return stats
+
 # Initialize the model at module import time
 def init_model():
     """
     Initialize the model, data, and embeddings
     """
-    global model, df, embeddings, tokenizer
+    global model, tokenizer, query_queue, model_version, query_encoder
     
+    data_df = None
+    # The file version the snapshot is published with (a current serving bundle was exported from it)
+    data_version = get_model_version(DATA_FILE) if os.path.exists(DATA_FILE) else None
     try:
         logger.info("Loading recommendation model...")
-        model, df, label_encoder = load_model()
+        model, data_df, label_encoder = load_model()
         
-        if model is not None and df is not None:
-            # Initialize tokenizer from transformers
-            from transformers import RobertaTokenizer
-            tokenizer = RobertaTokenizer.from_pretrained('roberta-base')
+        if model is not None and data_df is not None:
+            # Initialize tokenizer from the bundled files, or from transformers
+            if serving_bundle is not None:
+                tokenizer = serving_bundle.tokenizer()
+            else:
+                from transformers import RobertaTokenizer
+                tokenizer = RobertaTokenizer.from_pretrained('roberta-base')
             
+            # Embeddings first: the builder can only fork workers while this
+            # process has no other threads and the model hasn't run yet
             logger.info("Loading embeddings...")
-            embeddings = get_embeddings(model, df)
-            if embeddings is None or len(embeddings) == 0:
+            if serving_bundle is not None:
+                # Already normalized and mapped from the bundle
+                data_embeddings = serving_bundle.embeddings()
+            else:
+                data_embeddings = get_embeddings(model, data_df)
+            if data_embeddings is None or len(data_embeddings) == 0:
                 logger.warning("No embeddings available. Some features may not work correctly.")
                 logger.info("You may need to train the model first by running: python revised.py")
+            publish_snapshot(build_snapshot(data_df, data_embeddings, data_version))
+            
+            query_encoder, model_version = load_query_encoder(
+                model,
+                backend=SERVING_CONFIG['query_encoder_backend'],
+                encoder_model=SERVING_CONFIG['query_encoder_model']
+            )
+            
+            # Batch concurrent query encodings into shared forward passes
+            query_queue = InferenceQueue(
+                encode_query_batch,
+                max_batch_size=SERVING_CONFIG['query_batch_max_size'],
+                max_wait_ms=SERVING_CONFIG['query_batch_max_wait_ms'],
+                timeout_s=SERVING_CONFIG['query_batch_timeout_s']
+            )
+            query_queue.start()
         else:
             logger.warning("Model or data not available. Recommendation features will be limited.")
             logger.info("Please ensure final_dataset.csv exists and run: python revised.py to train the model")
@@ -228,6 +594,13 @@ def init_model():
     except Exception as e:
         logger.error(f"Error initializing model: {e}")
         logger.error("Starting with limited functionality. Recommendation features will not be available.")
+    
+    # Without a model the catalog still serves availability checks and the database fallback
+    if data_df is not None and snapshot.catalog is None:
+        try:
+            publish_snapshot(ServingSnapshot(catalog=DestinationCatalog(data_df), data_version=data_version))
+        except Exception as e:
+            logger.error(f"Error building the destination catalog: {e}")
 
 # Initialize the model when this module is imported
 init_model() 
\ No newline at end of file
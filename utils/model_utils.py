@@ -96,6 +96,26 @@ def get_embeddings_for_model(model_name="roberta_destination_model"):
         traceback.print_exc()
         return None
 
+def get_embedding_store_for_model(model_name="roberta_destination_model"):
+    """
+    Get the keyed embedding store for the specified model from the database metadata
+    Returns None if the embeddings were saved without a key manifest
+    """
+    try:
+        from embedding_store import EmbeddingStore
+        
+        model_info = get_model_metadata(model_name)
+        embedding_path = model_info[0].get('embedding_path') if model_info else None
+        if not embedding_path:
+            return None
+        
+        store = EmbeddingStore(embedding_path)
+        return store if store.load() else None
+    except Exception as e:
+        print(f"Error getting embedding store for model: {e}")
+        traceback.print_exc()
+        return None
+
 def get_destinations_with_embeddings(limit=None):
     """
     Get destinations from the database along with their embeddings
@@ -129,21 +149,22 @@ def get_destinations_with_embeddings(limit=None):
         # Convert to dataframe
         df = pd.DataFrame(destinations)
         
-        # Get embeddings
-        embeddings = get_embeddings_for_model("roberta_destination_model")
+        # Get embeddings, aligned by destination key when the store has a manifest
+        embedding_store = get_embedding_store_for_model("roberta_destination_model")
         
-        # Check if embeddings match destinations
-        if embeddings is not None and len(embeddings) != len(df):
-            print(f"Warning: Number of embeddings ({len(embeddings)}) doesn't match number of destinations ({len(df)})")
+        if embedding_store is not None:
+            positions, embeddings = embedding_store.align(df)
+            if len(positions) != len(df):
+                print(f"Warning: {len(df) - len(positions)} destinations have no stored embedding and were skipped")
+                df = df.iloc[positions].reset_index(drop=True)
+        else:
+            embeddings = get_embeddings_for_model("roberta_destination_model")
             
-            # If we have more destinations than embeddings, truncate destinations
-            if len(df) > len(embeddings):
-                print(f"Truncating destinations to match embeddings")
-                df = df.iloc[:len(embeddings)]
-            # If we have more embeddings than destinations, truncate embeddings
-            else:
-                print(f"Truncating embeddings to match destinations")
-                embeddings = embeddings[:len(df)]
+            # Without a manifest there is no way to tell which row belongs to which destination
+            if embeddings is not None and len(embeddings) != len(df):
+                print(f"Warning: Number of embeddings ({len(embeddings)}) doesn't match number of destinations ({len(df)})")
+                print("The embeddings have no key manifest and can't be aligned; restart the model server to rebuild them")
+                embeddings = None
         
         return df, embeddings
     except Exception as e:
@@ -157,28 +178,10 @@ def encode_text(text, tokenizer, model, max_length=512, device="cpu"):
     Returns the encoded text embedding
     """
     try:
-        # Import torch here to avoid circular imports
-        import torch
-        
-        # Tokenize the text
-        encoding = tokenizer(
-            text,
-            add_special_tokens=True,
-            max_length=max_length,
-            return_token_type_ids=False,
-            padding="max_length",
-            truncation=True,
-            return_attention_mask=True,
-            return_tensors="pt"
-        ).to(device)
-        
-        # Get the embeddings
-        with torch.no_grad():
-            outputs = model.roberta(
-                input_ids=encoding["input_ids"],
-                attention_mask=encoding["attention_mask"]
-            )
-            embedding = outputs.last_hidden_state[:, 0, :].cpu().numpy()
+        from text_encoder import encode_texts
+        
+        # Encode with dynamic padding (only up to the real sequence length)
+        embedding = encode_texts([text], tokenizer, model, device=device, max_length=max_length)
         
         return embedding
     except Exception as e:
@@ -209,12 +212,14 @@ def find_similar_destinations(query_text, tokenizer, model, top_k=10, filter_cit
             print("Could not encode query text")
             return []
         
+        from retrieval import top_k as select_top_k
+        from embedding_matrix import cosine_scores
+        
         # Calculate cosine similarity
-        from sklearn.metrics.pairwise import cosine_similarity
-        similarities = cosine_similarity(query_embedding, dest_embeddings)[0]
+        similarities = cosine_scores(query_embedding, dest_embeddings)
         
-        # Apply filters if specified
-        mask = np.ones(len(df), dtype=bool)
+        # Apply filters if specified, keeping only positive similarities
+        mask = similarities > 0
         
         if filter_city:
             city_mask = df["city"].str.lower() == filter_city.lower()
@@ -224,25 +229,16 @@ def find_similar_destinations(query_text, tokenizer, model, top_k=10, filter_cit
             category_mask = df["category"].str.lower() == filter_category.lower()
             mask = mask & category_mask.values
         
-        # Apply mask and get top K
-        masked_similarities = similarities.copy()
-        masked_similarities[~mask] = -1  # Set filtered out items to -1
-        
-        # Get indices of top K items
-        if top_k > 0:
-            top_indices = masked_similarities.argsort()[-top_k:][::-1]
-        else:
-            # Get all items with positive similarity
-            top_indices = np.where(masked_similarities > 0)[0]
+        # Get indices of top K items (all matching items when top_k isn't positive)
+        top_indices, top_similarities = select_top_k(similarities, top_k if top_k > 0 else None, mask=mask)
         
         # Get top destinations and their similarities
         top_destinations = []
         
-        for idx in top_indices:
-            if masked_similarities[idx] > 0:  # Only include positive similarities
-                dest = df.iloc[idx].to_dict()
-                dest["similarity"] = float(similarities[idx])
-                top_destinations.append(dest)
+        for idx, similarity in zip(top_indices, top_similarities):
+            dest = df.iloc[idx].to_dict()
+            dest["similarity"] = float(similarity)
+            top_destinations.append(dest)
         
         return top_destinations
     except Exception as e:
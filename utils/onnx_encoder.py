@@ -0,0 +1,200 @@
+"""
+ONNX Runtime backend for the query encoder
+
+Exports the RoBERTa encoder of DestinationRecommender to ONNX and serves CLS
+embeddings through ONNX Runtime with graph optimizations enabled.
+
+Export (from the utils directory):
+    python onnx_encoder.py
+"""
+import os
+import sys
+import json
+import logging
+import numpy as np
+import torch
+
+try:
+    import onnxruntime as ort
+except ImportError:
+    ort = None
+
+logger = logging.getLogger(__name__)
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+if CURRENT_DIR not in sys.path:
+    sys.path.append(CURRENT_DIR)
+
+from model_artifacts import MODEL_PATH, ONNX_MODEL_PATH, get_model_version
+
+PARITY_THRESHOLD = 0.999
+
+
+class CLSEncoder(torch.nn.Module):
+    """Wraps the RoBERTa encoder so the exported graph returns only CLS embeddings"""
+
+    def __init__(self, roberta):
+        super(CLSEncoder, self).__init__()
+        self.roberta = roberta
+
+    def forward(self, input_ids, attention_mask):
+        outputs = self.roberta(input_ids=input_ids, attention_mask=attention_mask)
+        return outputs.last_hidden_state[:, 0, :]
+
+
+class OnnxEncoder:
+    """Serves CLS embeddings from an exported encoder through ONNX Runtime"""
+
+    def __init__(self, onnx_path=ONNX_MODEL_PATH, num_threads=None):
+        if ort is None:
+            raise ImportError("onnxruntime is not installed. Install it with: pip install onnxruntime")
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+
+        self.onnx_path = onnx_path
+        self.session = ort.InferenceSession(onnx_path, options, providers=['CPUExecutionProvider'])
+        self.metadata = read_export_metadata(onnx_path)
+
+    @property
+    def source_model_version(self):
+        return self.metadata.get('model_version')
+
+    def encode_cls(self, input_ids, attention_mask):
+        """Run the encoder and return CLS embeddings as a numpy array"""
+        if isinstance(input_ids, torch.Tensor):
+            input_ids = input_ids.cpu().numpy()
+            attention_mask = attention_mask.cpu().numpy()
+        outputs = self.session.run(
+            ['cls_embedding'],
+            {
+                'input_ids': input_ids.astype(np.int64, copy=False),
+                'attention_mask': attention_mask.astype(np.int64, copy=False)
+            }
+        )
+        return outputs[0]
+
+
+def metadata_path_for(onnx_path):
+    return os.path.splitext(onnx_path)[0] + '.json'
+
+def read_export_metadata(onnx_path):
+    """Read the metadata written next to an exported model"""
+    path = metadata_path_for(onnx_path)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+def export_encoder(model, tokenizer, onnx_path=ONNX_MODEL_PATH, model_version=None, opset_version=14):
+    """
+    Export the RoBERTa encoder of a DestinationRecommender to ONNX
+    Batch size and sequence length are dynamic axes
+    """
+    encoder = CLSEncoder(model.roberta).cpu().eval()
+    sample = tokenizer(
+        ["cafes in Tagaytay", "beach resorts in Ternate under 3000 pesos"],
+        padding=True,
+        return_token_type_ids=False,
+        return_tensors='pt'
+    )
+
+    os.makedirs(os.path.dirname(onnx_path), exist_ok=True)
+    with torch.no_grad():
+        torch.onnx.export(
+            encoder,
+            (sample['input_ids'], sample['attention_mask']),
+            onnx_path,
+            input_names=['input_ids', 'attention_mask'],
+            output_names=['cls_embedding'],
+            dynamic_axes={
+                'input_ids': {0: 'batch', 1: 'sequence'},
+                'attention_mask': {0: 'batch', 1: 'sequence'},
+                'cls_embedding': {0: 'batch'}
+            },
+            opset_version=opset_version,
+            do_constant_folding=True
+        )
+
+    with open(metadata_path_for(onnx_path), 'w') as f:
+        json.dump({
+            'model_version': model_version,
+            'opset_version': opset_version,
+            'hidden_size': model.roberta.config.hidden_size
+        }, f, indent=2)
+
+    logger.info(f"Exported query encoder to {onnx_path}")
+    return onnx_path
+
+def staging_path_for(onnx_path):
+    return os.path.splitext(onnx_path)[0] + '.staging.onnx'
+
+def discard_export(onnx_path):
+    """Remove an exported model and its metadata"""
+    for path in (onnx_path, metadata_path_for(onnx_path)):
+        if os.path.exists(path):
+            os.remove(path)
+
+def publish_export(staging_path, onnx_path=ONNX_MODEL_PATH):
+    """
+    Move a checked export into place
+    The old metadata goes first, so an interrupted publish leaves an export
+    without a model version, which model_handler never serves
+    """
+    if os.path.exists(metadata_path_for(onnx_path)):
+        os.remove(metadata_path_for(onnx_path))
+    os.replace(staging_path, onnx_path)
+    os.replace(metadata_path_for(staging_path), metadata_path_for(onnx_path))
+
+def check_parity(model, onnx_encoder, tokenizer, texts, device='cpu'):
+    """
+    Compare ONNX Runtime embeddings against the PyTorch encoder
+    Returns the per-text cosine similarity between the two backends
+    """
+    from text_encoder import encode_texts
+
+    torch_vectors = encode_texts(texts, tokenizer, model, device=device)
+    onnx_vectors = encode_texts(texts, tokenizer, onnx_encoder)
+    norms = np.linalg.norm(torch_vectors, axis=1) * np.linalg.norm(onnx_vectors, axis=1)
+    return np.sum(torch_vectors * onnx_vectors, axis=1) / np.maximum(norms, 1e-12)
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    from transformers import RobertaTokenizer
+    from destination_model import DestinationRecommender
+
+    model_path = MODEL_PATH
+    if not os.path.exists(model_path):
+        logger.error(f"Model not found: {model_path}. Train it first with: python revised.py")
+        sys.exit(1)
+
+    # The number of labels only affects the classifier head, which isn't exported
+    state_dict = torch.load(model_path, map_location='cpu')
+    model = DestinationRecommender(num_labels=state_dict['classifier.weight'].shape[0])
+    model.load_state_dict(state_dict)
+    model.eval()
+
+    tokenizer = RobertaTokenizer.from_pretrained('roberta-base')
+    # Export next to the served model and only replace it once parity passes
+    staging_path = staging_path_for(ONNX_MODEL_PATH)
+    export_encoder(model, tokenizer, onnx_path=staging_path, model_version=get_model_version(model_path))
+
+    # Parity check against the PyTorch encoder
+    sys.path.insert(0, os.path.join(CURRENT_DIR, 'benchmarks'))
+    from queries import SAMPLE_QUERIES
+    cosine = check_parity(model, OnnxEncoder(staging_path), tokenizer, SAMPLE_QUERIES)
+    logger.info(f"Parity with PyTorch: min cosine {cosine.min():.6f}, mean cosine {cosine.mean():.6f}")
+    if cosine.min() < PARITY_THRESHOLD:
+        logger.error(f"Parity check failed: min cosine {cosine.min():.6f} < {PARITY_THRESHOLD}; "
+                     f"keeping the current {ONNX_MODEL_PATH}")
+        discard_export(staging_path)
+        sys.exit(1)
+
+    publish_export(staging_path, ONNX_MODEL_PATH)
+    logger.info(f"Parity check passed; serving export written to {ONNX_MODEL_PATH}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Destination rows partitioned by city and category, with a search planner
+
+Each city and each category value maps to the sorted row positions that carry
+it. A query with a selective filter scores only the rows of its partition;
+a broad filter runs the global search (HNSW when loaded, otherwise every row)
+and keeps the rows that pass the filter.
+"""
+import logging
+import numpy as np
+
+from embedding_matrix import cosine_scores
+
+logger = logging.getLogger(__name__)
+
+# Partitions holding at most this share of the catalog are scored directly
+DEFAULT_MAX_PARTITION_FRACTION = 0.1
+
+
+class SearchPlan:
+    """Rows to score for a query and how they were chosen"""
+
+    def __init__(self, positions, city_matched, category_matched, strategy):
+        self.positions = positions
+        self.city_matched = city_matched          # positions are exactly the rows in the city
+        self.category_matched = category_matched  # positions all have the category
+        self.strategy = strategy                  # 'partition', 'global' or 'all'
+
+
+class PartitionedIndex:
+    """Inverted lists of row positions per city and per category"""
+
+    def __init__(self, df, max_partition_fraction=DEFAULT_MAX_PARTITION_FRACTION):
+        self.size = len(df)
+        self.max_partition_fraction = max_partition_fraction
+        # Keys match the recommender's filters: lowercased, unstripped column values
+        self.cities = self._partition(df['city'] if 'city' in df.columns else [])
+        self.categories = self._partition(df['category'] if 'category' in df.columns else [])
+
+    @staticmethod
+    def _partition(values):
+        groups = {}
+        for position, value in enumerate(values):
+            groups.setdefault(str(value).lower(), []).append(position)
+        return {key: np.array(rows, dtype=np.int64) for key, rows in groups.items()}
+
+    def rows(self, city=None, category=None):
+        """Positions of the rows in a city and/or category (empty if there are none)"""
+        positions = None
+        if city:
+            positions = self.cities.get(city.lower(), np.zeros(0, dtype=np.int64))
+        if category:
+            category_rows = self.categories.get(category.lower(), np.zeros(0, dtype=np.int64))
+            positions = category_rows if positions is None else np.intersect1d(positions, category_rows)
+        return positions
+
+    def plan(self, city=None, category=None):
+        """
+        Choose the rows to score for the detected filters
+        A filter with no matching rows is left out so broader matching can happen later
+        """
+        positions = None
+        city_matched = category_matched = False
+
+        if city and len(self.rows(city=city)):
+            positions = self.rows(city=city)
+            city_matched = True
+        if category and len(self.rows(category=category)):
+            category_rows = self.rows(category=category)
+            narrowed = category_rows if positions is None else np.intersect1d(positions, category_rows)
+            if len(narrowed):
+                positions = narrowed
+                category_matched = True
+
+        if positions is None:
+            return SearchPlan(None, False, False, 'all')
+        strategy = 'partition' if len(positions) <= self.max_partition_fraction * self.size else 'global'
+        return SearchPlan(positions, city_matched, category_matched, strategy)
+
+    def search(self, query_embedding, embeddings, city=None, category=None, nearest=None):
+        """
+        Score the rows a query can match
+        nearest is an optional approximate search: nearest(query_embedding, mask) -> (positions, similarities)
+        Returns (plan, positions, similarities) with positions in row order
+        """
+        plan = self.plan(city, category)
+
+        if plan.strategy == 'partition':
+            # Selective filter: only the partition's vectors are touched
+            positions = plan.positions
+            similarities = cosine_scores(query_embedding, embeddings[positions])
+        elif nearest is not None and not (city and not plan.city_matched):
+            # Broad filter on a large catalog: approximate global search, post-filtered
+            # (an unmatched city is resolved by partial matching over every row, so it stays exact)
+            mask = None
+            if plan.positions is not None:
+                mask = np.zeros(self.size, dtype=bool)
+                mask[plan.positions] = True
+            positions, similarities = nearest(query_embedding, mask)
+            order = np.argsort(positions, kind='stable')
+            positions, similarities = positions[order], similarities[order]
+        else:
+            # Exact global search, post-filtered
+            all_similarities = cosine_scores(query_embedding, embeddings)
+            if plan.positions is None:
+                positions, similarities = np.arange(self.size), all_similarities
+            else:
+                positions, similarities = plan.positions, all_similarities[plan.positions]
+
+        logger.info(f"Search plan: {plan.strategy}, scoring {len(positions)} of {self.size} destinations")
+        return plan, positions, similarities
@@ -0,0 +1,215 @@
+"""
+Product-quantized destination embeddings
+
+Each normalized vector is split into sub-vectors and every sub-vector is
+replaced by the id of its nearest centroid (one byte), so a 768-dim float32
+vector takes 64 bytes instead of 3072. Queries are scored against the codes
+with asymmetric distance computation (a per-query lookup table of sub-vector
+dot products), and the best candidates are re-ranked exactly against the full
+vectors, which stay on disk behind mmap.
+
+Build (from the utils directory):
+    python pq_codec.py [--subspaces 64]
+"""
+import os
+import sys
+import json
+import logging
+import argparse
+import numpy as np
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+if CURRENT_DIR not in sys.path:
+    sys.path.append(CURRENT_DIR)
+
+from embedding_matrix import l2_normalize, cosine_scores
+from retrieval import top_k
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SUBSPACES = 64
+DEFAULT_CENTROIDS = 256       # codes fit in one byte
+DEFAULT_TRAINING_SAMPLE = 50000
+DEFAULT_KMEANS_ITERATIONS = 20
+
+
+def kmeans(vectors, num_centroids, iterations=DEFAULT_KMEANS_ITERATIONS, seed=0):
+    """Plain Lloyd's k-means; returns the centroids"""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), num_centroids, replace=False)].copy()
+    for _ in range(iterations):
+        assignments = nearest_centroids(vectors, centroids)
+        counts = np.bincount(assignments, minlength=num_centroids)
+        sums = np.stack([
+            np.bincount(assignments, weights=vectors[:, column], minlength=num_centroids)
+            for column in range(vectors.shape[1])
+        ], axis=1)
+        filled = counts > 0
+        centroids[filled] = sums[filled] / counts[filled, None]
+        # Re-seed empty clusters on random points
+        if not filled.all():
+            centroids[~filled] = vectors[rng.choice(len(vectors), int((~filled).sum()), replace=False)]
+    return centroids
+
+def nearest_centroids(vectors, centroids):
+    """Index of the closest centroid (squared L2) for every vector"""
+    distances = (
+        np.sum(vectors ** 2, axis=1, keepdims=True)
+        - 2 * vectors.dot(centroids.T)
+        + np.sum(centroids ** 2, axis=1)
+    )
+    return np.argmin(distances, axis=1)
+
+
+class ProductQuantizer:
+    """Per-subspace codebooks that map sub-vectors to one-byte codes"""
+
+    def __init__(self, codebooks):
+        self.codebooks = codebooks  # (subspaces, centroids, sub_dims)
+        self.num_subspaces, self.num_centroids, self.sub_dims = codebooks.shape
+
+    @classmethod
+    def train(cls, vectors, num_subspaces=DEFAULT_SUBSPACES, num_centroids=DEFAULT_CENTROIDS,
+              sample_size=DEFAULT_TRAINING_SAMPLE, seed=0):
+        """Fit one k-means codebook per subspace on a sample of the vectors"""
+        dims = vectors.shape[1]
+        if dims % num_subspaces:
+            raise ValueError(f"{dims} dimensions can't be split into {num_subspaces} equal subspaces")
+
+        rng = np.random.default_rng(seed)
+        sample = np.sort(rng.choice(len(vectors), min(sample_size, len(vectors)), replace=False))
+        sample = l2_normalize(vectors[sample])
+        num_centroids = min(num_centroids, len(sample))
+
+        sub_dims = dims // num_subspaces
+        codebooks = np.zeros((num_subspaces, num_centroids, sub_dims), dtype=np.float32)
+        for subspace in range(num_subspaces):
+            columns = slice(subspace * sub_dims, (subspace + 1) * sub_dims)
+            codebooks[subspace] = kmeans(sample[:, columns], num_centroids, seed=seed + subspace)
+        return cls(codebooks)
+
+    def encode(self, vectors, batch_size=10000):
+        """Codes (n, subspaces) of uint8 for L2-normalized copies of the vectors"""
+        codes = np.zeros((len(vectors), self.num_subspaces), dtype=np.uint8)
+        for start in range(0, len(vectors), batch_size):
+            batch = l2_normalize(vectors[start:start + batch_size])
+            for subspace in range(self.num_subspaces):
+                columns = slice(subspace * self.sub_dims, (subspace + 1) * self.sub_dims)
+                codes[start:start + batch_size, subspace] = nearest_centroids(batch[:, columns], self.codebooks[subspace])
+        return codes
+
+    def decode(self, codes):
+        """Approximate vectors rebuilt from their codes"""
+        return np.concatenate([self.codebooks[s][codes[:, s]] for s in range(self.num_subspaces)], axis=1)
+
+    def lookup_table(self, query):
+        """Dot product of each query sub-vector with every centroid: (subspaces, centroids)"""
+        query = query.reshape(self.num_subspaces, 1, self.sub_dims)
+        return np.sum(self.codebooks * query, axis=2)
+
+    def scores(self, query, codes_by_subspace):
+        """Asymmetric similarity of the exact query to quantized vectors given as (subspaces, n) codes"""
+        table = self.lookup_table(query)
+        scores = np.zeros(codes_by_subspace.shape[1], dtype=np.float32)
+        for subspace in range(self.num_subspaces):
+            scores += np.take(table[subspace], codes_by_subspace[subspace])
+        return scores
+
+
+class PQIndex:
+    """PQ codes for every destination, re-ranked against the full vectors"""
+
+    def __init__(self, quantizer, codes, vectors=None, source_fingerprint=None):
+        self.quantizer = quantizer
+        # Kept subspace-major, shape (subspaces, n), so each table lookup reads contiguous memory
+        self.codes_by_subspace = np.ascontiguousarray(codes.T)
+        self.vectors = vectors  # full vectors for exact re-ranking (an mmap'd matrix)
+        self.source_fingerprint = source_fingerprint
+
+    def __len__(self):
+        return self.codes_by_subspace.shape[1]
+
+    @classmethod
+    def build(cls, vectors, num_subspaces=DEFAULT_SUBSPACES, **train_options):
+        quantizer = ProductQuantizer.train(vectors, num_subspaces, **train_options)
+        return cls(quantizer, quantizer.encode(vectors), vectors)
+
+    @property
+    def nbytes(self):
+        """Memory held per process: codes and codebooks"""
+        return self.codes_by_subspace.nbytes + self.quantizer.codebooks.nbytes
+
+    def search(self, query_embedding, k, rerank=None, mask=None):
+        """
+        Top-k by asymmetric PQ similarity, with the best rerank candidates re-scored exactly
+        Returns (positions, similarities), best first
+        """
+        query = l2_normalize(np.asarray(query_embedding, dtype=np.float32).reshape(-1))
+        if mask is None:
+            candidates = np.arange(len(self))
+            approximate = self.quantizer.scores(query, self.codes_by_subspace)
+        else:
+            candidates = np.flatnonzero(mask)
+            approximate = self.quantizer.scores(query, self.codes_by_subspace[:, candidates])
+
+        order, approximate_scores = top_k(approximate, max(k, rerank or 0))
+        shortlist = candidates[order]
+        if self.vectors is None or not rerank:
+            return shortlist[:k], approximate_scores[:k]
+
+        # Exact scores touch only the shortlisted rows of the full matrix
+        shortlist = np.sort(shortlist)
+        positions, similarities = top_k(cosine_scores(query, self.vectors[shortlist]), k)
+        return shortlist[positions], similarities
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = path + '.tmp.npz'
+        np.savez(
+            temp_path,
+            codebooks=self.quantizer.codebooks,
+            codes=self.codes_by_subspace.T,
+            metadata=np.array(json.dumps({'source_fingerprint': self.source_fingerprint}))
+        )
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path, vectors=None, source_fingerprint=None):
+        """
+        Load saved codes; vectors are the full embeddings used for re-ranking
+        Returns None if the file is missing or was built from other embeddings
+        """
+        if not os.path.exists(path):
+            return None
+        with np.load(path) as data:
+            metadata = json.loads(str(data['metadata']))
+            if source_fingerprint is not None and metadata['source_fingerprint'] != source_fingerprint:
+                return None
+            if vectors is not None and len(data['codes']) != len(vectors):
+                return None
+            return cls(ProductQuantizer(data['codebooks']), data['codes'], vectors, metadata['source_fingerprint'])
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    from model_artifacts import DESTINATION_EMBEDDINGS_PATH, PQ_INDEX_PATH
+    from embedding_store import EmbeddingStore
+
+    parser = argparse.ArgumentParser(description='Build product-quantized destination embeddings')
+    parser.add_argument('--subspaces', type=int, default=DEFAULT_SUBSPACES,
+                        help='Sub-vectors per embedding (bytes per destination)')
+    args = parser.parse_args()
+
+    store = EmbeddingStore(DESTINATION_EMBEDDINGS_PATH)
+    if not store.load():
+        logger.error("No destination embeddings found. Start the model server once to build them.")
+        sys.exit(1)
+
+    logger.info(f"Training {args.subspaces}-subspace product quantizer on {len(store.embeddings)} destinations")
+    index = PQIndex.build(store.embeddings, num_subspaces=args.subspaces)
+    index.source_fingerprint = store.fingerprint
+    index.save(PQ_INDEX_PATH)
+    logger.info(f"Saved PQ codes ({index.nbytes / 1e6:.1f} MB) to {PQ_INDEX_PATH}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Int8 dynamic quantization of the RoBERTa encoder
+
+The quantized model's state dict is cached on disk next to the fp32 weights,
+with the model config and the fp32 model version it was produced from. While
+the cache is current, model_handler rebuilds the quantized model from it
+directly: no from_pretrained download and no fp32 checkpoint load.
+"""
+import os
+import io
+import gc
+import json
+import logging
+import torch
+
+from model_artifacts import QUANTIZED_MODEL_PATH
+
+logger = logging.getLogger(__name__)
+
+CACHE_FORMAT = 'state_dict'
+
+def quantize_encoder(roberta):
+    """Apply dynamic int8 quantization to the linear layers of a RoBERTa encoder"""
+    return torch.quantization.quantize_dynamic(roberta, {torch.nn.Linear}, dtype=torch.qint8)
+
+def quantize_model(model):
+    """Replace model.roberta with its int8 dynamically quantized version"""
+    model.roberta = quantize_encoder(model.roberta.cpu())
+    # Release the fp32 encoder weights
+    gc.collect()
+    return model
+
+def metadata_path_for(cache_path):
+    return os.path.splitext(cache_path)[0] + '.json'
+
+def read_cache_metadata(cache_path, source_version):
+    """
+    Metadata of a cached quantized model
+    Returns None if there is no cache or it was built from a different model version
+    """
+    meta_path = metadata_path_for(cache_path)
+    if not os.path.exists(cache_path) or not os.path.exists(meta_path):
+        return None
+
+    with open(meta_path) as f:
+        metadata = json.load(f)
+    if metadata.get('format') != CACHE_FORMAT:
+        logger.info("Quantized model cache is in an old format")
+        return None
+    if metadata.get('source_model_version') != source_version:
+        logger.info(f"Quantized model cache is stale ({metadata.get('source_model_version')} != {source_version})")
+        return None
+    return metadata
+
+def save_cached_model(model, cache_path, source_version):
+    """Save a quantized DestinationRecommender's state dict with what's needed to rebuild it"""
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    # Weights first, metadata last: a cache without current metadata is never loaded
+    meta_path = metadata_path_for(cache_path)
+    if os.path.exists(meta_path):
+        os.remove(meta_path)
+    torch.save(model.state_dict(), cache_path + '.tmp')
+    os.replace(cache_path + '.tmp', cache_path)
+    with open(meta_path + '.tmp', 'w') as f:
+        json.dump({
+            'format': CACHE_FORMAT,
+            'source_model_version': source_version,
+            'dtype': 'qint8',
+            'num_labels': model.classifier.out_features,
+            'dropout': model.dropout.p,
+            'config': model.roberta.config.to_dict()
+        }, f, indent=2)
+    os.replace(meta_path + '.tmp', meta_path)
+
+def load_cached_model(build_model, source_version, cache_path=QUANTIZED_MODEL_PATH):
+    """
+    Rebuild a quantized DestinationRecommender from the cache
+    build_model(num_labels, dropout, config) returns an untrained model built
+    from a RobertaConfig; its linear layers are quantized, then the cached
+    int8 state is loaded into them
+    Returns None if there is no current cache
+    """
+    from transformers import RobertaConfig
+
+    metadata = read_cache_metadata(cache_path, source_version)
+    if metadata is None:
+        return None
+
+    model = build_model(metadata['num_labels'], metadata['dropout'], RobertaConfig.from_dict(metadata['config']))
+    quantize_model(model)
+    # A plain state dict: tensors and packed int8 params only, no pickled code
+    model.load_state_dict(torch.load(cache_path, map_location='cpu', weights_only=True))
+    model.eval()
+    return model
+
+def apply_int8_quantization(model, source_version, cache_path=QUANTIZED_MODEL_PATH):
+    """
+    Quantize a loaded fp32 model in place, refreshing the cache if it's missing or stale
+    """
+    quantize_model(model)
+    model.roberta.eval()
+    try:
+        if read_cache_metadata(cache_path, source_version) is None:
+            save_cached_model(model, cache_path, source_version)
+            logger.info(f"Saved quantized model to {cache_path}")
+    except Exception as e:
+        logger.warning(f"Failed to save quantized model: {e}")
+    return model
+
+def module_size_bytes(module):
+    """Serialized size of a module's state dict, including packed int8 weights"""
+    buffer = io.BytesIO()
+    torch.save(module.state_dict(), buffer)
+    return buffer.tell()
@@ -0,0 +1,463 @@
+"""
+Query understanding shared by every part of the serving process
+
+spaCy (NER), VADER/TextBlob (sentiment) and the NLTK tokenizer are loaded at
+most once per process and kept in a registry; the keyword tables are module
+constants. extract_query_info pulls city, category, budget and a cleaned
+query out of a query, and understand_query adds intent, trip type, budget
+preference and the session's context. parse_query memoizes everything that
+depends only on the query text and the catalog. Importing this module is
+cheap: each model is loaded on first use.
+
+Only place names (GPE entities) are read from spaCy, so the pipeline is
+loaded with just the components NER needs. extract_query_info_batch runs
+NER over many queries with nlp.pipe, and concurrent single queries share
+nlp.pipe batches through an InferenceQueue.
+"""
+import os
+import re
+import sys
+import logging
+import threading
+from collections import namedtuple
+
+from serving_config import SERVING_CONFIG
+from inference_queue import InferenceQueue
+from gazetteer import get_gazetteer, CITY, CATEGORY, MAPPED_CATEGORY, CATEGORY_MAPPING
+from knowledge_cache import knowledge_cache, query_info_cache
+
+logger = logging.getLogger(__name__)
+
+SPACY_MODEL = "en_core_web_sm"
+
+# Pipeline components the NER step never reads (skipped when loading)
+UNUSED_PIPES = ('tagger', 'morphologizer', 'parser', 'senter', 'attribute_ruler', 'lemmatizer')
+
+# Travel intents, scored by phrase length with a bonus for phrases at the start
+INTENT_PHRASES = {
+    'find_destination': [
+        'show me', 'recommend', 'suggest', 'find', 'looking for', 'want to visit',
+        'places to visit', 'want to see', 'where can i find', 'where is', 'where are',
+        'best place for', 'top places in', 'popular spots in', 'coffee places',
+        'cafe spots', 'cafes in', 'coffee shops'
+    ],
+    'explore_activity': [
+        'activities', 'things to do', 'what can i do', 'what to do', 'what are the best',
+        'where can i', 'how to experience', 'best way to', 'top activities in',
+        'best coffee in', 'where to drink coffee', 'cafe hopping'
+    ],
+    'plan_trip': [
+        'plan', 'itinerary', 'schedule', 'trip to', 'travel to', 'want to go',
+        'how to plan', 'create itinerary', 'make schedule', 'organize trip'
+    ],
+    'get_info': [
+        'tell me about', 'information about', 'what is', 'details about', 'facts about',
+        'describe', 'explain', 'more about', 'background of'
+    ],
+    'compare_destinations': [
+        'compare', 'difference between', 'which is better', 'versus', 'vs',
+        'should i visit', 'better option between'
+    ]
+}
+
+BUDGET_INDICATORS = {
+    'low': [
+        'cheap', 'budget', 'affordable', 'inexpensive', 'low cost', 'economical',
+        'budget-friendly', 'cost-effective', 'pocket-friendly', 'thrifty'
+    ],
+    'medium': [
+        'moderate', 'reasonable', 'mid-range', 'standard', 'average',
+        'balanced', 'modest', 'fair price', 'middle range'
+    ],
+    'high': [
+        'luxury', 'expensive', 'high-end', 'premium', 'exclusive',
+        'upscale', 'deluxe', 'first-class', 'top-tier'
+    ]
+}
+
+TRIP_TYPE_INDICATORS = {
+    'adventure': [
+        'adventure', 'hiking', 'trekking', 'outdoor', 'extreme', 'activities',
+        'thrilling', 'exciting', 'challenging', 'exploration'
+    ],
+    'relaxation': [
+        'relax', 'peaceful', 'quiet', 'calm', 'unwind', 'spa', 'retreat',
+        'tranquil', 'serene', 'leisure', 'restful'
+    ],
+    'cultural': [
+        'culture', 'history', 'historical', 'museum', 'tradition', 'heritage',
+        'artistic', 'architectural', 'religious', 'spiritual'
+    ],
+    'family': [
+        'family', 'kids', 'children', 'family-friendly', 'child-friendly',
+        'suitable for children', 'family activities', 'family vacation'
+    ],
+    'romantic': [
+        'romantic', 'couple', 'honeymoon', 'anniversary', 'date',
+        'romantic getaway', 'couple activities', 'romantic spots'
+    ],
+    'food': [
+        'food', 'restaurant', 'cuisine', 'dining', 'eat',
+        'local food', 'traditional dishes', 'culinary'
+    ],
+    'shopping': [
+        'shopping', 'market', 'mall', 'store', 'retail',
+        'souvenirs', 'local products', 'shopping district'
+    ]
+}
+
+# Budget amounts, most specific phrasing first (matched against the lowercased query)
+BUDGET_PATTERNS = [re.compile(pattern) for pattern in (
+    r'under\s*(\d+)\s*(?:pesos|PHP)?',  # "under 500 pesos"
+    r'below\s*(\d+)\s*(?:pesos|PHP)?',  # "below 500 pesos"
+    r'less than\s*(\d+)\s*(?:pesos|PHP)?',  # "less than 500 pesos"
+    r'(\d+)\s*(?:pesos|PHP)?\s*or less',  # "500 pesos or less"
+    r'budget of\s*(\d+)\s*(?:pesos|PHP)?',  # "budget of 500 pesos"
+    r'(\d+)\s*(?:pesos|PHP)?',  # "500 pesos"
+)]
+
+# Process-wide NLP resources, created on first use
+_registry = {}
+_registry_lock = threading.Lock()
+
+def _shared(name, factory):
+    """The process-wide instance of a resource, created by factory on first use"""
+    if name not in _registry:
+        with _registry_lock:
+            if name not in _registry:
+                _registry[name] = factory()
+    return _registry[name]
+
+def _load_nlp():
+    try:
+        import spacy
+    except ImportError:
+        logger.warning("spaCy is not installed; cities are detected by name matching only")
+        return None
+    try:
+        nlp = spacy.load(SPACY_MODEL, exclude=UNUSED_PIPES)
+    except OSError:
+        logger.info("Downloading spaCy model for NER...")
+        os.system(f"{sys.executable} -m spacy download {SPACY_MODEL}")
+        nlp = spacy.load(SPACY_MODEL, exclude=UNUSED_PIPES)
+
+    # A shared tok2vec only feeds the components that listen to it; en_core_web_sm's
+    # NER has its own, so once the tagger and parser are gone it is dead weight
+    if 'tok2vec' in nlp.pipe_names and not getattr(nlp.get_pipe('tok2vec'), 'listeners', None):
+        nlp.disable_pipe('tok2vec')
+    logger.info(f"spaCy pipeline for NER: {nlp.pipe_names}")
+    return nlp
+
+def _load_word_tokenize():
+    import nltk
+    try:
+        nltk.data.find('tokenizers/punkt_tab')
+    except LookupError:
+        nltk.download('punkt_tab')
+    from nltk.tokenize import word_tokenize
+    return word_tokenize
+
+def get_nlp():
+    """The spaCy pipeline used for NER (None if spaCy is not installed)"""
+    return _shared('nlp', _load_nlp)
+
+def _start_ner_queue():
+    queue = InferenceQueue(
+        recognize_places,
+        max_batch_size=SERVING_CONFIG['ner_batch_max_size'],
+        max_wait_ms=SERVING_CONFIG['ner_batch_max_wait_ms'],
+        timeout_s=SERVING_CONFIG['query_batch_timeout_s']
+    )
+    queue.start()
+    return queue
+
+def get_sentiment_analyzer():
+    return _shared('sentiment', SentimentAnalyzer)
+
+def loaded_resources():
+    """Names of the resources loaded so far in this process"""
+    return sorted(_registry)
+
+def get_ner_queue_stats():
+    """Metrics for the NER micro-batching queue (None until it is first used)"""
+    queue = _registry.get('ner_queue')
+    return queue.get_stats() if queue is not None else None
+
+
+def recognize_places(query_texts, batch_size=None):
+    """
+    Place names (GPE entities) found by spaCy in each query, from one nlp.pipe pass
+    Returns one tuple of entity texts per query
+    """
+    nlp = get_nlp()
+    if nlp is None:
+        return [() for _ in query_texts]
+    docs = nlp.pipe(query_texts, batch_size=batch_size or SERVING_CONFIG['ner_batch_size'])
+    return [tuple(ent.text for ent in doc.ents if ent.label_ == "GPE") for doc in docs]  # GPE = Geopolitical Entity
+
+def _recognize_query_places(query_text):
+    """Place names in one query, batched with concurrent requests when micro-batching is on"""
+    if SERVING_CONFIG['ner_micro_batching'] and get_nlp() is not None:
+        return _shared('ner_queue', _start_ner_queue).encode(query_text)
+    return recognize_places([query_text])[0]
+
+
+class SentimentAnalyzer:
+    def __init__(self):
+        from textblob import TextBlob
+        from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+        self.text_blob = TextBlob
+        self.vader = SentimentIntensityAnalyzer()
+        self.word_tokenize = _shared('word_tokenize', _load_word_tokenize)
+
+    def analyze_sentiment(self, text):
+        """
+        Analyze sentiment using both TextBlob and VADER for more accurate results
+        """
+        # TextBlob sentiment
+        blob = self.text_blob(text)
+        textblob_sentiment = blob.sentiment.polarity  # -1 to 1
+
+        # VADER sentiment
+        vader_scores = self.vader.polarity_scores(text)
+
+        # Extract sentiment-bearing words
+        sentiment_words = self._extract_sentiment_words(text)
+
+        # Determine overall sentiment
+        if textblob_sentiment > 0.1:
+            overall = 'positive'
+        elif textblob_sentiment < -0.1:
+            overall = 'negative'
+        else:
+            overall = 'neutral'
+
+        return {
+            'textblob_sentiment': textblob_sentiment,
+            'vader_scores': vader_scores,
+            'sentiment_words': sentiment_words,
+            'overall_sentiment': overall
+        }
+
+    def _extract_sentiment_words(self, text):
+        """
+        Extract words that contribute to sentiment
+        """
+        words = self.word_tokenize(text.lower())
+        sentiment_words = []
+
+        for word in words:
+            # Check VADER sentiment
+            if abs(self.vader.polarity_scores(word)['compound']) > 0.1:
+                sentiment_words.append(word)
+
+        return sentiment_words
+
+
+# Advanced function to extract query information using spaCy NER and pattern matching
+def extract_query_info(query_text, available_cities, available_categories, available_budgets=None):
+    """
+    Extract city, category, and budget information from a user query using NER and pattern matching.
+    """
+    places = _recognize_query_places(query_text)
+    return _query_info(query_text, places, available_cities, available_categories)
+
+def extract_query_info_batch(query_texts, available_cities, available_categories, batch_size=None):
+    """
+    extract_query_info for many queries, with spaCy NER run over all of them in nlp.pipe batches
+    Returns one result tuple per query, in order
+    """
+    query_texts = list(query_texts)
+    places = recognize_places(query_texts, batch_size=batch_size)
+    return [_query_info(query_text, query_places, available_cities, available_categories)
+            for query_text, query_places in zip(query_texts, places)]
+
+def _query_info(query_text, places, available_cities, available_categories):
+    """City, category, budget and cleaned query, given the place names spaCy found"""
+    query_lower = query_text.lower()
+
+    # Initialize variables
+    extracted_city = None
+    extracted_category = None
+    extracted_budget = None
+    budget_amount = None
+
+    # Extract cities using spaCy NER
+    for potential_city in places:
+        if extracted_city:
+            break
+        # Verify against our available cities
+        for city in available_cities:
+            if potential_city.lower() in city.lower() or city.lower() in potential_city.lower():
+                extracted_city = city
+                break
+
+    # City, category and synonym mentions, found in one pass (longest match wins)
+    gazetteer = get_gazetteer(available_cities, available_categories)
+    query_matches = gazetteer.scan(query_lower)
+
+    # Backup method: Check direct city mentions if spaCy NER didn't find any
+    if not extracted_city:
+        city_match = gazetteer.best(query_matches, CITY)
+        if city_match:
+            extracted_city = city_match.value
+
+    # Extract category by name or through its mapped synonyms
+    category_match = gazetteer.best(query_matches, (CATEGORY, MAPPED_CATEGORY))
+    if category_match:
+        extracted_category = category_match.value
+
+    # Extract budget using regex patterns
+    for pattern in BUDGET_PATTERNS:
+        match = pattern.search(query_lower)
+        if match:
+            budget_amount = int(match.group(1))
+            break
+
+    # Remove city, category, and budget mentions from query to get cleaner core query
+    cleaned_query = query_text
+
+    if extracted_city:
+        cleaned_query = re.sub(r'\b' + re.escape(extracted_city) + r'\b', '', cleaned_query, flags=re.IGNORECASE)
+
+    if extracted_category:
+        cleaned_query = re.sub(r'\b' + re.escape(extracted_category) + r'\b', '', cleaned_query, flags=re.IGNORECASE)
+        # Also remove synonyms
+        for cat, synonyms in CATEGORY_MAPPING.items():
+            if cat.lower() == extracted_category.lower():
+                for synonym in synonyms:
+                    cleaned_query = re.sub(r'\b' + re.escape(synonym) + r'\b', '', cleaned_query, flags=re.IGNORECASE)
+
+    # Clean up extra spaces
+    cleaned_query = re.sub(r'\s+', ' ', cleaned_query).strip()
+
+    return extracted_city, extracted_category, extracted_budget, cleaned_query, None, budget_amount
+
+class QueryInfo(namedtuple('QueryInfo', ['city', 'category', 'budget', 'cleaned_query', 'sentiment_info',
+                                          'budget_amount', 'intent', 'trip_type', 'budget_preference'])):
+    """Everything parsed from a query text against one catalog (no session context)"""
+    __slots__ = ()
+
+    @property
+    def extracted(self):
+        """The first six fields, as extract_query_info returns them"""
+        return tuple(self[:6])
+
+def detect_keywords(query_lower):
+    """Intent, trip type and budget preference from the keyword tables (None when not found)"""
+    # Enhanced intent detection with scoring
+    detected_intent = None
+    intent_score = 0
+
+    for intent, phrases in INTENT_PHRASES.items():
+        for phrase in phrases:
+            if phrase in query_lower:
+                # Improved scoring based on phrase length and position
+                current_score = len(phrase.split()) * 2
+                if query_lower.startswith(phrase):
+                    current_score += 3  # Bonus for phrases at start
+                if current_score > intent_score:
+                    detected_intent = intent
+                    intent_score = current_score
+
+    # Detect trip type with improved accuracy
+    trip_type = None
+    for type_name, terms in TRIP_TYPE_INDICATORS.items():
+        if any(term in query_lower for term in terms):
+            trip_type = type_name
+            break
+
+    # Detect budget preference with improved accuracy
+    budget_preference = None
+    for budget, terms in BUDGET_INDICATORS.items():
+        if any(term in query_lower for term in terms):
+            budget_preference = budget
+            break
+
+    return detected_intent, trip_type, budget_preference
+
+def parse_query(query_text, catalog=None):
+    """
+    QueryInfo for a query against the catalog's cities and categories
+    Memoized per (query, catalog version); whitespace is collapsed before
+    parsing, so spacing variants of a query share one entry
+    """
+    text = query_info_cache.normalize_text(query_text)
+    version = catalog.version if catalog is not None else None
+    info = query_info_cache.get(text, version)
+    if info is None:
+        available_cities = catalog.cities if catalog is not None else []
+        available_categories = catalog.categories if catalog is not None else []
+        extracted = extract_query_info(text, available_cities, available_categories, None)
+        info = QueryInfo(*extracted, *detect_keywords(text.lower().strip()))
+        query_info_cache.add(text, version, info)
+    return info
+
+def get_query_info_cache_stats():
+    """Hit/miss metrics for the parsed query cache"""
+    return query_info_cache.get_stats()
+
+# Enhanced query understanding with context
+def understand_query(query_text, session_id=None, catalog=None):
+    """
+    Enhanced query understanding with improved context and semantic analysis
+    Cities and categories are looked up in catalog (none detected without one)
+    """
+    query_lower = query_text.lower().strip()
+
+    # Get user context and preferences with enhanced error handling
+    user_context = {}
+    preferred_categories = []
+    preferred_cities = []
+
+    if session_id:
+        try:
+            user_context = knowledge_cache.get_session_context(session_id) or {}
+            preferred_categories = knowledge_cache.get_preferred_categories(session_id) or []
+            preferred_cities = knowledge_cache.get_preferred_cities(session_id) or []
+        except Exception as e:
+            logger.error(f"Error getting user context: {e}")
+
+    # Extract city and category with improved error handling
+    try:
+        info = parse_query(query_text, catalog)
+        city, category, budget, cleaned_query, sentiment_info, budget_amount = info.extracted
+        detected_intent, trip_type, budget_preference = info.intent, info.trip_type, info.budget_preference
+
+        # Enhanced context-based fallbacks
+        if not city and preferred_cities and 'city' not in query_lower:
+            city = preferred_cities[0]
+            logger.info(f"Using preferred city from context: {city}")
+
+        if not category and preferred_categories and 'category' not in query_lower:
+            category = preferred_categories[0]
+            logger.info(f"Using preferred category from context: {category}")
+
+        if not cleaned_query.strip():
+            cleaned_query = query_text
+
+    except Exception as e:
+        logger.error(f"Error in extract_query_info: {e}")
+        city = None
+        category = None
+        budget = None
+        cleaned_query = query_text
+        sentiment_info = None
+        budget_amount = None
+        detected_intent, trip_type, budget_preference = detect_keywords(query_lower)
+
+    # Enhanced query understanding with more context
+    return {
+        'original_query': query_text,
+        'cleaned_query': cleaned_query,
+        'detected_intent': detected_intent,
+        'city': city,
+        'category': category,
+        'budget_preference': budget_preference or budget,
+        'budget_amount': budget_amount,
+        'trip_type': trip_type,
+        'sentiment_info': sentiment_info,
+        'user_context': user_context,
+        'preferred_categories': preferred_categories,
+        'preferred_cities': preferred_cities
+    }
@@ -1,8 +1,11 @@
 from flask import Blueprint, jsonify, request
 from knowledge_cache import knowledge_cache
-from model_handler import model, df, embeddings, tokenizer, device
-import torch
-from sklearn.metrics.pairwise import cosine_similarity
+from model_handler import model, encode_query, get_snapshot
+import numpy as np
+from retrieval import top_k
+from gazetteer import get_gazetteer, CATEGORY, CATEGORY_KEYWORD, CATEGORY_SYNONYM, CAVITE_CITY, CATEGORY_SYNONYMS
+from fuzzy_match import get_city_index
+from query_understanding import parse_query, understand_query
 import re
 import logging
 import database as db
@@ -13,208 +16,6 @@ logger = logging.getLogger(__name__)
 # Create blueprint
 bp = Blueprint('recommender', __name__, url_prefix='/api')
 
-# Import from revised.py for query understanding
-try:
-    import importlib.util
-    import os
-    
-    # Get the directory where this file is located
-    current_dir = os.path.dirname(os.path.abspath(__file__))
-    revised_path = os.path.join(current_dir, "revised.py")
-    
-    spec = importlib.util.spec_from_file_location("travel_model", revised_path)
-    travel_model = importlib.util.module_from_spec(spec)
-    spec.loader.exec_module(travel_model)
-    extract_query_info = travel_model.extract_query_info
-except Exception as e:
-    logger.error(f"Error importing extract_query_info from revised.py: {e}")
-    # Try fallback to try.py
-    try:
-        logger.info("Falling back to try.py for extract_query_info...")
-        try_path = os.path.join(current_dir, "try.py")
-        spec = importlib.util.spec_from_file_location("travel_model", try_path)
-        travel_model = importlib.util.module_from_spec(spec)
-        spec.loader.exec_module(travel_model)
-        extract_query_info = travel_model.extract_query_info
-    except Exception as e2:
-        logger.error(f"Error importing from try.py: {e2}")
-        def extract_query_info(query, cities, categories, budgets):
-            """Fallback function if import fails"""
-            return None, None, None, query, None, None
-
-# Enhanced query understanding with context
-def understand_query(query_text, session_id=None):
-    """
-    Enhanced query understanding with improved context and semantic analysis
-    """
-    query_lower = query_text.lower().strip()
-    
-    # Enhanced travel intents with cafe-specific patterns
-    intents = {
-        'find_destination': [
-            'show me', 'recommend', 'suggest', 'find', 'looking for', 'want to visit', 
-            'places to visit', 'want to see', 'where can i find', 'where is', 'where are',
-            'best place for', 'top places in', 'popular spots in', 'coffee places',
-            'cafe spots', 'cafes in', 'coffee shops'
-        ],
-        'explore_activity': [
-            'activities', 'things to do', 'what can i do', 'what to do', 'what are the best',
-            'where can i', 'how to experience', 'best way to', 'top activities in',
-            'best coffee in', 'where to drink coffee', 'cafe hopping'
-        ],
-        'plan_trip': [
-            'plan', 'itinerary', 'schedule', 'trip to', 'travel to', 'want to go',
-            'how to plan', 'create itinerary', 'make schedule', 'organize trip'
-        ],
-        'get_info': [
-            'tell me about', 'information about', 'what is', 'details about', 'facts about',
-            'describe', 'explain', 'more about', 'background of'
-        ],
-        'compare_destinations': [
-            'compare', 'difference between', 'which is better', 'versus', 'vs',
-            'should i visit', 'better option between'
-        ]
-    }
-    
-    # Enhanced intent detection with scoring
-    detected_intent = None
-    intent_score = 0
-    
-    for intent, phrases in intents.items():
-        for phrase in phrases:
-            if phrase in query_lower:
-                # Improved scoring based on phrase length and position
-                current_score = len(phrase.split()) * 2
-                if query_lower.startswith(phrase):
-                    current_score += 3  # Bonus for phrases at start
-                if current_score > intent_score:
-                    detected_intent = intent
-                    intent_score = current_score
-    
-    # Enhanced budget indicators with more specific terms
-    budget_indicators = {
-        'low': [
-            'cheap', 'budget', 'affordable', 'inexpensive', 'low cost', 'economical',
-            'budget-friendly', 'cost-effective', 'pocket-friendly', 'thrifty'
-        ],
-        'medium': [
-            'moderate', 'reasonable', 'mid-range', 'standard', 'average',
-            'balanced', 'modest', 'fair price', 'middle range'
-        ],
-        'high': [
-            'luxury', 'expensive', 'high-end', 'premium', 'exclusive',
-            'upscale', 'deluxe', 'first-class', 'top-tier'
-        ]
-    }
-    
-    # Enhanced trip type detection
-    trip_type_indicators = {
-        'adventure': [
-            'adventure', 'hiking', 'trekking', 'outdoor', 'extreme', 'activities',
-            'thrilling', 'exciting', 'challenging', 'exploration'
-        ],
-        'relaxation': [
-            'relax', 'peaceful', 'quiet', 'calm', 'unwind', 'spa', 'retreat',
-            'tranquil', 'serene', 'leisure', 'restful'
-        ],
-        'cultural': [
-            'culture', 'history', 'historical', 'museum', 'tradition', 'heritage',
-            'artistic', 'architectural', 'religious', 'spiritual'
-        ],
-        'family': [
-            'family', 'kids', 'children', 'family-friendly', 'child-friendly',
-            'suitable for children', 'family activities', 'family vacation'
-        ],
-        'romantic': [
-            'romantic', 'couple', 'honeymoon', 'anniversary', 'date',
-            'romantic getaway', 'couple activities', 'romantic spots'
-        ],
-        'food': [
-            'food', 'restaurant', 'cuisine', 'dining', 'eat',
-            'local food', 'traditional dishes', 'culinary'
-        ],
-        'shopping': [
-            'shopping', 'market', 'mall', 'store', 'retail',
-            'souvenirs', 'local products', 'shopping district'
-        ]
-    }
-    
-    # Get user context and preferences with enhanced error handling
-    user_context = {}
-    preferred_categories = []
-    preferred_cities = []
-    
-    if session_id:
-        try:
-            user_context = knowledge_cache.get_session_context(session_id) or {}
-            preferred_categories = knowledge_cache.get_preferred_categories(session_id) or []
-            preferred_cities = knowledge_cache.get_preferred_cities(session_id) or []
-        except Exception as e:
-            logger.error(f"Error getting user context: {e}")
-    
-    # Extract city and category with improved error handling
-    available_cities = df['city'].unique().tolist() if df is not None else []
-    available_categories = df['category'].unique().tolist() if df is not None else []
-    
-    try:
-        city, category, budget, cleaned_query, sentiment_info, budget_amount = extract_query_info(
-            query_text, 
-            available_cities, 
-            available_categories,
-            None
-        )
-        
-        # Enhanced context-based fallbacks
-        if not city and preferred_cities and 'city' not in query_lower:
-            city = preferred_cities[0]
-            logger.info(f"Using preferred city from context: {city}")
-        
-        if not category and preferred_categories and 'category' not in query_lower:
-            category = preferred_categories[0]
-            logger.info(f"Using preferred category from context: {category}")
-        
-        if not cleaned_query.strip():
-            cleaned_query = query_text
-            
-    except Exception as e:
-        logger.error(f"Error in extract_query_info: {e}")
-        city = None
-        category = None
-        budget = None
-        cleaned_query = query_text
-        sentiment_info = None
-        budget_amount = None
-    
-    # Enhanced query understanding with more context
-    query_understanding = {
-        'original_query': query_text,
-        'cleaned_query': cleaned_query,
-        'detected_intent': detected_intent,
-        'city': city,
-        'category': category,
-        'budget_preference': budget,
-        'budget_amount': budget_amount,
-        'trip_type': None,  # Will be set below
-        'sentiment_info': sentiment_info,
-        'user_context': user_context,
-        'preferred_categories': preferred_categories,
-        'preferred_cities': preferred_cities
-    }
-    
-    # Detect trip type with improved accuracy
-    for type_name, terms in trip_type_indicators.items():
-        if any(term in query_lower for term in terms):
-            query_understanding['trip_type'] = type_name
-            break
-    
-    # Detect budget preference with improved accuracy
-    for budget, terms in budget_indicators.items():
-        if any(term in query_lower for term in terms):
-            query_understanding['budget_preference'] = budget
-            break
-    
-    return query_understanding
-
 # Helper function to handle conversation queries
 def handle_conversation(query_text, session_id=None):
     """
@@ -425,56 +226,25 @@ def generate_follow_up_suggestions(recommendations, conversation_context):
     return suggestions[:3]
 
 # Function to find the best category match for a query
-def find_best_category_match(query_text, available_categories):
+def find_best_category_match(query_text, available_categories, gazetteer=None):
     """
     Find the best matching category for a query using multiple matching strategies
     """
     query_lower = query_text.lower().strip()
     
-    # Complete dictionary of category synonyms and variations
-    category_synonyms = {
-        'Restaurant': ['restaurant', 'dining', 'eatery', 'food', 'cuisine', 'meal', 'bistro', 'diner', 'eating place'],
-        'Resort': ['resort', 'vacation spot', 'getaway', 'retreat'],
-        'Landmark': ['landmark', 'attraction', 'monument', 'famous place', 'tourist spot', 'destination'],
-        'Shopping/Restaurant': ['shopping', 'mall', 'shop', 'store', 'boutique', 'retail', 'shopping center', 'plaza'],
-        'Spa/Restaurant': ['spa', 'massage', 'wellness', 'relaxation', 'treatment'],
-        'Zoo': ['zoo', 'animal', 'wildlife', 'safari', 'animals'],
-        'Farm/Restaurant': ['farm', 'agriculture', 'ranch', 'plantation', 'orchard', 'farm to table'],
-        'Food Shop': ['food shop', 'bakery', 'pastry', 'dessert', 'sweets', 'delicatessen', 'specialty food'],
-        'Beach Resort': ['beach resort', 'seaside resort', 'coastal resort', 'beachfront'],
-        'Beach': ['beach', 'shore', 'coast', 'seaside', 'sand', 'bay'],
-        'Natural Attraction': ['natural attraction', 'nature', 'scenery', 'landscape', 'waterfall', 'falls', 'cave', 'rock formation'],
-        'Religious Site': ['religious site', 'church', 'temple', 'mosque', 'shrine', 'cathedral', 'chapel', 'monastery'],
-        'Sports Facility': ['sports', 'athletics', 'stadium', 'arena', 'court', 'field', 'gym', 'fitness'],
-        'Golf Course': ['golf', 'golf course', 'country club'],
-        'Park': ['park', 'plaza', 'square', 'gardens', 'playground', 'recreation area'],
-        'Mountain': ['mountain', 'hill', 'peak', 'summit', 'highlands', 'volcano', 'cliff', 'ridge'],
-        'Hotel': ['hotel', 'inn', 'lodge', 'motel', 'accommodation', 'place to stay'],
-        'Museum': ['museum', 'gallery', 'exhibit', 'collection', 'artifacts', 'heritage center'],
-        'Garden': ['garden', 'botanical', 'flowers', 'plants', 'greenhouse'],
-        'Accommodation': ['accommodation', 'lodging', 'stay', 'room', 'boarding'],
-        'Historical Site': ['historical site', 'historic', 'heritage', 'ancient', 'ruins', 'archaeology', 'old'],
-        'Hotel & Resort': ['hotel and resort', 'hotel & resort', 'resort hotel', 'luxury resort'],
-        'Leisure': ['leisure', 'entertainment', 'recreation', 'fun', 'relaxation', 'pastime', 'amusement'],
-        'Café/Restaurant': ['café', 'cafe', 'coffee shop', 'coffee', 'tea house', 'patisserie'],
-        'Farm': ['farm', 'ranch', 'plantation', 'orchard', 'agricultural', 'dairy'],
-        'Cafe': ['cafe', 'café', 'coffee shop', 'coffee house', 'espresso', 'cafeteria']
-    }
+    if gazetteer is None:
+        gazetteer = get_gazetteer(categories=available_categories)
+    query_matches = gazetteer.scan(query_lower)
     
-    # Direct match - highest priority
-    for category, synonyms in category_synonyms.items():
-        if category.lower() in query_lower:
-            return category
-        
-        for synonym in synonyms:
-            if synonym in query_lower:
-                return category
+    # Direct match - highest priority (category names and synonyms, longest hit wins)
+    synonym_match = gazetteer.best(query_matches, CATEGORY_SYNONYM)
+    if synonym_match:
+        return synonym_match.value
                 
     # Check for partial matches in the available categories
-    if available_categories:
-        for category in available_categories:
-            if category.lower() in query_lower:
-                return category
+    category_match = gazetteer.best(query_matches, CATEGORY)
+    if category_match:
+        return category_match.value
     
     # Use best fuzzy match if no direct match found
     from difflib import SequenceMatcher
@@ -482,7 +252,7 @@ def find_best_category_match(query_text, available_categories):
     best_ratio = 0.6  # Threshold for considering a match
     
     # Try to match against synonyms
-    for category, synonyms in category_synonyms.items():
+    for category, synonyms in CATEGORY_SYNONYMS.items():
         # Check category name directly
         ratio = SequenceMatcher(None, category.lower(), query_lower).ratio()
         if ratio > best_ratio:
@@ -500,67 +270,34 @@ def find_best_category_match(query_text, available_categories):
     return best_match
 
 # Internal recommendation function
-def recommend_internal(query, city=None, category=None, limit=5):
+def recommend_internal(query, city=None, category=None, limit=5, snapshot=None):
     """
     Enhanced recommendation function with improved accuracy and context awareness
+    snapshot: the catalog, embeddings and indexes to use (the current ones if omitted)
     """
     # Check if the query is just a location name (single word or short phrase)
     query_words = query.strip().split()
     is_location_query = len(query_words) <= 3
     
-    available_cities = df['city'].unique().tolist() if df is not None else []
+    # One snapshot for the whole request, so positions and rows always come from the same load
+    snapshot = snapshot or get_snapshot()
+    catalog = snapshot.catalog
+    available_cities = catalog.cities if catalog is not None else []
     
     # Normalize specialized category variations 
     query_lower = query.lower().strip()
     
-    # Category normalization dictionary - maps variations to standard categories
-    category_normalizations = {
-        # Cafe/Coffee categories
-        'cafe': 'Cafe', 'café': 'Cafe', 'coffee': 'Cafe', 'coffee shop': 'Cafe', 'cafeteria': 'Cafe',
-        
-        # Food Shop categories
-        'food shop': 'Food Shop', 'eatery': 'Food Shop', 'food stall': 'Food Shop', 'food court': 'Food Shop',
-        
-        # Restaurant categories
-        'restaurant': 'Restaurant', 'dining': 'Restaurant', 'bistro': 'Restaurant', 'diner': 'Restaurant',
-        
-        # Shopping categories
-        'shopping': 'Shopping/Restaurant', 'mall': 'Shopping/Restaurant', 'shop': 'Shopping/Restaurant',
-        
-        # Resort/Hotel categories
-        'resort': 'Resort', 'beach resort': 'Beach Resort', 'hotel & resort': 'Hotel & Resort',
-        'hotel resort': 'Hotel & Resort', 'accommodation': 'Accommodation', 'hotel': 'Hotel',
-        'restaurant/resort': 'Restaurant/Resort', 'stay': 'Accommodation',
-        
-        # Religious/Historical sites
-        'church': 'Religious Site', 'temple': 'Religious Site', 'mosque': 'Religious Site', 'shrine': 'Religious Site',
-        'historical': 'Historical Site', 'heritage': 'Historical Site', 'museum': 'Museum', 'landmark': 'Landmark',
-        'historical place': 'Historical Site', 'historic': 'Historical Site', 'monument': 'Historical Site',
-        
-        # Nature categories
-        'beach': 'Beach', 'mountain': 'Mountain', 'park': 'Park', 'garden': 'Garden', 
-        'nature': 'Natural Attraction', 'falls': 'Natural Attraction', 'waterfall': 'Natural Attraction',
-        'natural': 'Natural Attraction', 'scenery': 'Natural Attraction', 'outdoor': 'Natural Attraction',
-        'landscape': 'Natural Attraction', 'view': 'Natural Attraction',
-        
-        # Leisure/Recreation
-        'spa': 'Spa/Restaurant', 'farm': 'Farm', 'zoo': 'Zoo', 'sports': 'Sports Facility',
-        'golf': 'Golf Course', 'golf course': 'Golf Course', 'leisure': 'Leisure',
-        'recreation': 'Leisure', 'entertainment': 'Leisure', 'amusement': 'Leisure',
-        
-        # Mixed categories
-        'spa/restaurant': 'Spa/Restaurant', 'farm/restaurant': 'Farm/Restaurant',
-        'café/restaurant': 'Café/Restaurant', 'cafe restaurant': 'Café/Restaurant'
-    }
+    # One pass over the query finds every category keyword and city name it contains
+    gazetteer = get_gazetteer(available_cities, catalog.categories if catalog is not None else ())
+    query_matches = gazetteer.scan(query_lower)
     
-    # Check for specialized category in query
+    # Check for specialized category in query (the longest keyword wins, e.g. 'beach resort' over 'resort')
     detected_category_type = None
-    for keyword, normalized_category in category_normalizations.items():
-        if keyword in query_lower:
-            category = normalized_category
-            detected_category_type = keyword
-            logger.info(f"Detected category keyword: '{keyword}' → '{normalized_category}'")
-            break
+    keyword_match = gazetteer.best(query_matches, CATEGORY_KEYWORD)
+    if keyword_match:
+        category = keyword_match.value
+        detected_category_type = keyword_match.keyword
+        logger.info(f"Detected category keyword: '{keyword_match.keyword}' → '{keyword_match.value}'")
     
     # Check for specific city-category relationships
     if 'imus' in query_lower and ('cafe' in query_lower or 'coffee' in query_lower):
@@ -576,34 +313,10 @@ def recommend_internal(query, city=None, category=None, limit=5):
         category = 'Religious Site'
     
     # Enhanced city detection with better handling of Cavite cities
-    cavite_cities = {
-        'kawit': 'Kawit', 
-        'tagaytay': 'Tagaytay', 
-        'amadeo': 'Amadeo', 
-        'indang': 'Indang', 
-        'ternate': 'Ternate',
-        'maragondon': 'Maragondon', 
-        'mendez': 'Mendez', 
-        'alfonso': 'Alfonso', 
-        'silang': 'Silang', 
-        'imus': 'Imus',
-        'bailen': 'Bailen', 
-        'laurel': 'Laurel', 
-        'dasmarinas': 'Dasmarinas', 
-        'bacoor': 'Bacoor',
-        'trece martires': 'Trece Martires', 
-        'tanza': 'Tanza', 
-        'naic': 'Naic', 
-        'rosario': 'Rosario',
-        'general trias': 'General Trias',
-        'cavite city': 'Cavite City'
-    }
-    
     # Check for direct city mentions with proper capitalization
-    for city_variation, normalized_city in cavite_cities.items():
-        if city_variation in query_lower:
-            city = normalized_city
-            break
+    city_match = gazetteer.best(query_matches, CAVITE_CITY)
+    if city_match:
+        city = city_match.value
     
     # Enhanced city matching with improved fuzzy matching
     if is_location_query and not city:
@@ -630,37 +343,8 @@ def recommend_internal(query, city=None, category=None, limit=5):
         
         # If still no match, try fuzzy matching with improved algorithm
         if not city:
-            from difflib import SequenceMatcher
-            best_match = None
-            best_ratio = 0.7  # Increased threshold for better accuracy
-            
-            for available_city in available_cities:
-                # Try both full name and parts of the name
-                city_parts = available_city.lower().split()
-                query_parts = query_lower.split()
-                
-                # Check full name match with normalization
-                normalized_city = ''.join(e for e in available_city.lower() if e.isalnum())
-                normalized_query = ''.join(e for e in query_lower if e.isalnum())
-                full_ratio = SequenceMatcher(None, normalized_query, normalized_city).ratio()
-                
-                if full_ratio > best_ratio:
-                    best_ratio = full_ratio
-                    best_match = available_city
-                
-                # Check parts match with improved scoring
-                for city_part in city_parts:
-                    for query_part in query_parts:
-                        normalized_city_part = ''.join(e for e in city_part if e.isalnum())
-                        normalized_query_part = ''.join(e for e in query_part if e.isalnum())
-                        part_ratio = SequenceMatcher(None, normalized_query_part, normalized_city_part).ratio()
-                        
-                        # Give higher weight to longer matches
-                        weighted_ratio = part_ratio * (len(normalized_query_part) / len(normalized_query))
-                        if weighted_ratio > best_ratio:
-                            best_ratio = weighted_ratio
-                            best_match = available_city
-            
+            # Whole name and per-word similarity, longer query words weighted higher
+            best_match, best_ratio = get_city_index(available_cities).match_query(query_lower, threshold=0.7)
             if best_match:
                 logger.info(f"Found fuzzy city match: {best_match} with ratio {best_ratio}")
                 city = best_match
@@ -675,16 +359,12 @@ def recommend_internal(query, city=None, category=None, limit=5):
         cleaned_query = query
     else:
         try:
-            available_categories = df['category'].unique().tolist() if df is not None else []
-            
             # Enhanced query understanding with context
             if not city:
-                detected_city, detected_category, budget, cleaned_query, sentiment_info, budget_amount = extract_query_info(
+                detected_city, detected_category, budget, cleaned_query, sentiment_info, budget_amount = parse_query(
                     query,
-                    available_cities,
-                    available_categories,
-                    None
-                )
+                    catalog
+                ).extracted
                 
                 # Validate detected city
                 if detected_city:
@@ -699,14 +379,7 @@ def recommend_internal(query, city=None, category=None, limit=5):
                             detected_city = partial_match
                         else:
                             # Try fuzzy match as last resort
-                            from difflib import SequenceMatcher
-                            best_match = None
-                            best_ratio = 0.6
-                            for available_city in available_cities:
-                                ratio = SequenceMatcher(None, detected_city.lower(), available_city.lower()).ratio()
-                                if ratio > best_ratio:
-                                    best_ratio = ratio
-                                    best_match = available_city
+                            best_match, _ = get_city_index(available_cities).closest(detected_city, threshold=0.6)
                             if best_match:
                                 detected_city = best_match
             
@@ -726,192 +399,96 @@ def recommend_internal(query, city=None, category=None, limit=5):
     
     # If no category is detected from the normalization dictionary, try the more robust function
     if not detected_category_type and not category:
-        available_categories = df['category'].unique().tolist() if df is not None else []
-        potential_category = find_best_category_match(query_lower, available_categories)
+        available_categories = catalog.categories if catalog is not None else []
+        potential_category = find_best_category_match(query_lower, available_categories, gazetteer)
         if potential_category:
             category = potential_category
             logger.info(f"Used advanced category matching to detect: {category}")
     
     # Check if the city-category combination exists in the dataset first
-    if detected_city and detected_category and df is not None:
-        city_category_mask = (
-            (df['city'].str.lower() == detected_city.lower()) & 
-            (df['category'].str.lower() == detected_category.lower())
-        )
+    if detected_city and detected_category and catalog is not None:
+        availability = catalog.availability
         
-        if not city_category_mask.any():
+        if not availability.exists(detected_city, detected_category):
             # Get available categories for this city
-            city_mask = df['city'].str.lower() == detected_city.lower()
-            if city_mask.any():
-                available_categories_in_city = df[city_mask]['category'].unique().tolist()
+            if catalog.has_city(detected_city):
+                available_categories_in_city = list(availability.categories_in(detected_city))
                 return {
                     "is_conversation": True,
-                    "message": f"{detected_city} has no {detected_category} categories in our dataset. Available categories in {detected_city}: {', '.join(available_categories_in_city)}",
+                    "message": f"{detected_city} has no {detected_category} categories in our dataset. Available categories in {detected_city}: {availability.categories_text(detected_city)}",
                     "detected_city": detected_city,
                     "detected_category": detected_category,
                     "available_categories": available_categories_in_city,
                     "data_availability": {
                         "city_exists": True,
-                        "category_exists": detected_category in df['category'].str.lower().values,
+                        "category_exists": detected_category in catalog.category_ids,
                         "combination_exists": False
                     }
                 }
             else:
                 return {
                     "is_conversation": True,
-                    "message": f"Sorry, I don't have data for {detected_city}. Available cities include: {', '.join(df['city'].unique()[:5])}{'...' if len(df['city'].unique()) > 5 else ''}",
+                    "message": f"Sorry, I don't have data for {detected_city}. Available cities include: {availability.city_suggestions}",
                     "detected_city": detected_city,
                     "detected_category": detected_category,
-                    "available_cities": df['city'].unique().tolist(),
+                    "available_cities": list(catalog.cities),
                     "data_availability": {
                         "city_exists": False,
-                        "category_exists": detected_category in df['category'].str.lower().values if detected_category else None,
+                        "category_exists": detected_category in catalog.category_ids if detected_category else None,
                         "combination_exists": False
                     }
                 }
     
     # Enhanced model-based recommendations with improved filtering
     destinations = []
-    if model is not None and embeddings is not None and len(embeddings) > 0 and df is not None:
+    if model is not None and snapshot.searchable:
         try:
             logger.info("Attempting to use model-based recommendations...")
-            # Enhanced query encoding
-            query_encoding = tokenizer(
-                query,
-                add_special_tokens=True,
-                max_length=512,
-                return_token_type_ids=False,
-                padding='max_length',
-                truncation=True,
-                return_attention_mask=True,
-                return_tensors='pt'
-            ).to(device)
-            
-            # Get query embedding with improved attention
-            with torch.no_grad():
-                outputs = model.roberta(
-                    input_ids=query_encoding['input_ids'],
-                    attention_mask=query_encoding['attention_mask']
-                )
-                query_embedding = outputs.last_hidden_state[:, 0, :].cpu().numpy()
+            # Query encoding is micro-batched with concurrent requests
+            query_embedding = encode_query(query)
             
-            # Calculate enhanced similarity scores
-            similarities = cosine_similarity(query_embedding, embeddings)[0]
+            # Calculate enhanced similarity scores for the rows the city/category filters can match
+            # (selective filters score only their partition, broad ones search globally)
+            plan, candidate_positions, candidate_similarities = snapshot.search(
+                query_embedding, city=detected_city, category=detected_category
+            )
+            similarities = np.zeros(catalog.size, dtype=np.float32)
+            similarities[candidate_positions] = candidate_similarities
+            filtered_indices = candidate_positions.tolist()
             
             # Apply enhanced filters with scoring
-            filtered_indices = list(range(len(df)))
-            filtered_scores = []
-            
             if detected_city:
-                # Try exact city match first
-                city_mask = df['city'].str.lower() == detected_city.lower()
-                city_indices = [i for i in filtered_indices if i < len(city_mask) and city_mask.iloc[i]]
+                # Try exact city match first (the plan already holds exactly the city's rows when it has any)
+                city_indices = filtered_indices if plan.city_matched else []
                 
                 # If no exact matches, try nearby cities or partial matches
                 if not city_indices:
-                    # Try partial matches with improved location relevance
-                    city_indices = []
-                    for idx in filtered_indices:
-                        if idx >= len(df):
-                            continue
-                            
-                        location_score = 0
-                        current_city = df.iloc[idx]['city'].lower()
-                        
-                        # Exact city name match
-                        if current_city == detected_city.lower():
-                            location_score = 1.0
-                        # City name contains query or vice versa
-                        elif detected_city.lower() in current_city or current_city in detected_city.lower():
-                            location_score = 0.8
-                        # Check province match if available
-                        elif 'province' in df.columns and df.iloc[idx]['province']:
-                            province = df.iloc[idx]['province'].lower()
-                            if detected_city.lower() in province:
-                                location_score = 0.6
-                            # Check for nearby cities in same province
-                            elif any(city.lower() in province for city in available_cities):
-                                location_score = 0.4
-                        
-                        if location_score > 0:
-                            city_indices.append((idx, location_score))
+                    # Score location relevance (partial city names, then province) for every candidate
+                    positions = np.asarray(filtered_indices, dtype=np.int64)
+                    location_scores = snapshot.location_relevance(positions, detected_city, available_cities)
+                    related = location_scores > 0
                     
                     # Sort by location score and take top matches
-                    if city_indices:
-                        city_indices = sorted(city_indices, key=lambda x: x[1], reverse=True)
-                        city_indices = [idx for idx, _ in city_indices[:limit*2]]  # Get more for filtering
+                    if related.any():
+                        order, _ = top_k(location_scores, limit*2, mask=related)  # Get more for filtering
+                        city_indices = positions[order].tolist()
                         logger.info(f"Found {len(city_indices)} places in related areas")
                 
                 if city_indices:
                     filtered_indices = city_indices
                     logger.info(f"Filtered to {len(filtered_indices)} places in/near {detected_city}")
             
-            # Enhanced scoring system with location and category relevance
-            for idx in filtered_indices:
-                if idx >= len(df):
-                    continue
-                    
-                base_score = similarities[idx]
-                location_multiplier = 1.0
-                
-                # Location relevance scoring with enhanced province-city relationship
-                if detected_city:
-                    current_city = df.iloc[idx]['city'].lower()
-                    current_province = df.iloc[idx]['province'].lower() if 'province' in df.columns else ''
-                    
-                    # Exact city match gets highest boost
-                    if current_city == detected_city.lower():
-                        location_multiplier = 2.5
-                    # City is in the same province (Cavite)
-                    elif current_province == 'cavite':
-                        cavite_cities = [
-                            'kawit', 'tagaytay', 'amadeo', 'indang', 'ternate', 
-                            'maragondon', 'mendez', 'alfonso', 'silang', 'imus',
-                            'bailen', 'laurel', 'dasmarinas', 'bacoor', 
-                            'trece martires', 'tanza', 'naic', 'rosario', 
-                            'general trias'
-                        ]
-                        # If detected city is in Cavite, boost other Cavite cities
-                        if detected_city.lower() in cavite_cities:
-                            location_multiplier = 2.0
-                        # If detected city contains province name
-                        elif 'cavite' in detected_city.lower():
-                            location_multiplier = 1.8
-                    # Partial city match gets medium boost
-                    elif detected_city.lower() in current_city or current_city in detected_city.lower():
-                        location_multiplier = 1.5
-                    # Province match gets small boost
-                    elif current_province and detected_city.lower() in current_province:
-                        location_multiplier = 1.2
-                
-                # Apply location multiplier
-                base_score *= location_multiplier
-                
-                # Category relevance scoring
-                if detected_category and df.iloc[idx]['category'].lower() == detected_category.lower():
-                    base_score *= 1.3
-                
-                # Consider ratings and popularity
-                if 'ratings' in df.columns and df.iloc[idx]['ratings'] is not None:
-                    try:
-                        rating = float(df.iloc[idx]['ratings'])
-                        base_score *= (1 + (rating / 10))
-                    except (ValueError, TypeError):
-                        pass
-                
-                if 'popularity_score' in df.columns and df.iloc[idx]['popularity_score'] is not None:
-                    try:
-                        popularity = float(df.iloc[idx]['popularity_score'])
-                        base_score *= (1 + (popularity / 100))
-                    except (ValueError, TypeError):
-                        pass
-                
-                filtered_scores.append((idx, base_score))
+            # Enhanced scoring system with location and category relevance, ratings and popularity
+            # (multipliers come from arrays precomputed per catalog, applied to all candidates at once)
+            scored_indices = np.asarray(filtered_indices, dtype=np.int64)
+            filtered_scores = snapshot.rerank(
+                scored_indices, similarities[scored_indices], city=detected_city, category=detected_category
+            )
             
             # Get top matches with enhanced scoring
-            if filtered_scores:
-                top_indices = sorted(filtered_scores, key=lambda x: x[1], reverse=True)[:limit*5]  # get more for filtering
-                destinations = [df.iloc[idx].to_dict() for idx, _ in top_indices]
+            if len(filtered_scores):
+                top_positions, _ = top_k(filtered_scores, limit*5)  # get more for filtering
+                destinations = catalog.rows(scored_indices[top_positions])
                 logger.info(f"Found {len(destinations)} destinations using enhanced model-based recommendations")
                 # STRICT CATEGORY FILTERING
                 if detected_category:
@@ -1331,7 +908,8 @@ def recommend():
             return jsonify(conversation_result)
         
         # Enhanced query understanding
-        query_understanding = understand_query(query, session_id)
+        snapshot = get_snapshot()
+        query_understanding = understand_query(query, session_id, snapshot.catalog)
         
         # Get conversation context if session_id is provided
         conversation_context = None
@@ -1343,7 +921,7 @@ def recommend():
         category = query_understanding.get('category')
         
         # Internal recommendation function with advanced understanding
-        result = recommend_internal(query, city, category, limit=result_limit)
+        result = recommend_internal(query, city, category, limit=result_limit, snapshot=snapshot)
         
         # Apply rating filter if specified
         if rating_filter and 'recommendations' in result:
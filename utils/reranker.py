@@ -0,0 +1,144 @@
+"""
+Vectorized re-ranking of candidate destinations
+
+The recommender boosts each candidate's similarity by its location relevance,
+category match, rating and popularity. Everything those multipliers read from
+the catalog is precomputed once per dataframe: interned (city, province)
+codes, category codes and parsed rating/popularity multipliers. A request then
+only evaluates the location rules once per distinct (city, province) pair and
+gathers them over the candidates with numpy.
+"""
+import numpy as np
+
+# Cities that get the Cavite province boost
+CAVITE_CITIES = [
+    'kawit', 'tagaytay', 'amadeo', 'indang', 'ternate',
+    'maragondon', 'mendez', 'alfonso', 'silang', 'imus',
+    'bailen', 'laurel', 'dasmarinas', 'bacoor',
+    'trece martires', 'tanza', 'naic', 'rosario',
+    'general trias'
+]
+
+CATEGORY_BOOST = 1.3
+
+# Scores are multiplied in the dtype numpy gives a float32 similarity times a
+# Python float (float64 on NumPy 1.x, float32 on 2.x), so they match the
+# per-row formula bit for bit
+SCORE_DTYPE = (np.float32(1) * 1.0).dtype
+
+
+def _multipliers(values, scale):
+    """1 + value/scale for values that parse as floats, 1.0 (no boost) otherwise"""
+    multipliers = np.ones(len(values), dtype=np.float64)
+    for position, value in enumerate(values):
+        if value is None:
+            continue
+        try:
+            multipliers[position] = 1 + (float(value) / scale)
+        except (ValueError, TypeError):
+            pass
+    return multipliers
+
+
+def location_multiplier(detected_city, city, province):
+    """Location boost of one (lowercased) city/province for a detected city"""
+    detected = detected_city.lower()
+    if city == detected:
+        return 2.5
+    elif province == 'cavite':
+        if detected in CAVITE_CITIES:
+            return 2.0
+        elif 'cavite' in detected:
+            return 1.8
+        return 1.0
+    elif detected in city or city in detected:
+        return 1.5
+    elif province and detected in province:
+        return 1.2
+    return 1.0
+
+
+def location_score(detected_city, city, province, has_province, available_cities):
+    """Relevance of a row to a city that has no exact matches (0 means unrelated)"""
+    detected = detected_city.lower()
+    if city == detected:
+        return 1.0
+    elif detected in city or city in detected:
+        return 0.8
+    elif has_province:
+        if detected in province:
+            return 0.6
+        elif any(available.lower() in province for available in available_cities):
+            return 0.4
+    return 0.0
+
+
+class DestinationReranker:
+    """Per-row arrays the recommender's score multipliers need"""
+
+    def __init__(self, df):
+        self.size = len(df)
+        cities = [str(city).lower() for city in df['city']] if 'city' in df.columns else [''] * self.size
+        if 'province' in df.columns:
+            provinces = [str(province).lower() for province in df['province']]
+            has_province = [bool(province) for province in df['province']]
+        else:
+            provinces = [''] * self.size
+            has_province = [False] * self.size
+
+        # Interned (city, province) pairs: location rules run once per pair
+        self.locations = []
+        location_ids = {}
+        self.location_codes = np.zeros(self.size, dtype=np.int32)
+        for position, key in enumerate(zip(cities, provinces, has_province)):
+            if key not in location_ids:
+                location_ids[key] = len(self.locations)
+                self.locations.append(key)
+            self.location_codes[position] = location_ids[key]
+
+        categories = [str(category).lower() for category in df['category']] if 'category' in df.columns else [''] * self.size
+        self.category_ids = {}
+        self.category_codes = np.array(
+            [self.category_ids.setdefault(category, len(self.category_ids)) for category in categories],
+            dtype=np.int32
+        )
+
+        self.rating_multipliers = (
+            _multipliers(df['ratings'].tolist(), 10) if 'ratings' in df.columns else np.ones(self.size)
+        ).astype(SCORE_DTYPE)
+        self.popularity_multipliers = (
+            _multipliers(df['popularity_score'].tolist(), 100) if 'popularity_score' in df.columns else np.ones(self.size)
+        ).astype(SCORE_DTYPE)
+
+    def location_scores(self, positions, detected_city, available_cities):
+        """Partial-match relevance of the rows at positions to a city with no exact matches"""
+        table = np.array([
+            location_score(detected_city, city, province, has_province, available_cities)
+            for city, province, has_province in self.locations
+        ])
+        return table[self.location_codes[positions]]
+
+    def score(self, positions, similarities, detected_city=None, detected_category=None):
+        """
+        Boosted scores for the rows at positions, given their similarities
+        Multipliers apply in the order of the original per-row formula
+        """
+        positions = np.asarray(positions, dtype=np.int64)
+        scores = np.asarray(similarities, dtype=np.float32).astype(SCORE_DTYPE)
+
+        if detected_city:
+            table = np.array([
+                location_multiplier(detected_city, city, province)
+                for city, province, _ in self.locations
+            ], dtype=SCORE_DTYPE)
+            scores *= table[self.location_codes[positions]]
+
+        if detected_category:
+            category_id = self.category_ids.get(detected_category.lower())
+            if category_id is not None:
+                matched = self.category_codes[positions] == category_id
+                scores[matched] *= SCORE_DTYPE.type(CATEGORY_BOOST)
+
+        scores *= self.rating_multipliers[positions]
+        scores *= self.popularity_multipliers[positions]
+        return scores
@@ -0,0 +1,58 @@
+"""
+Top-k retrieval over destination scores
+
+Selects the best k candidates with argpartition (linear in the number of
+candidates) and sorts only those k, instead of sorting every score.
+"""
+import numpy as np
+
+from embedding_matrix import cosine_scores
+
+def top_k(scores, k=None, mask=None, candidates=None):
+    """
+    Select the positions of the k highest scores, highest first
+    mask limits the selection to positions where it's True; candidates is an
+    array of positions to choose from, and equal scores keep candidate order
+    (like a stable sort). k=None returns every remaining candidate, sorted.
+    Returns (positions, scores)
+    """
+    scores = np.asarray(scores)
+    if candidates is None:
+        candidates = np.arange(len(scores))
+    else:
+        candidates = np.asarray(candidates, dtype=np.int64)
+    if mask is not None:
+        candidates = candidates[np.asarray(mask, dtype=bool)[candidates]]
+
+    candidate_scores = scores[candidates].astype(np.float64)
+    candidate_scores[np.isnan(candidate_scores)] = -np.inf
+
+    if k is not None and k <= 0:
+        return candidates[:0], candidate_scores[:0]
+
+    if k is None or k >= len(candidates):
+        selected = np.arange(len(candidates))
+    else:
+        # The k-th best score; every candidate above it is in, ties fill the rest in order
+        threshold = candidate_scores[np.argpartition(-candidate_scores, k - 1)[k - 1]]
+        above = np.flatnonzero(candidate_scores > threshold)
+        tied = np.flatnonzero(candidate_scores == threshold)[:k - len(above)]
+        selected = np.sort(np.concatenate([above, tied]))
+
+    order = selected[np.argsort(-candidate_scores[selected], kind='stable')]
+    return candidates[order], scores[candidates[order]]
+
+def top_k_similar(query_embedding, embeddings, k=None, mask=None, candidates=None):
+    """
+    Cosine top-k between a query embedding and destination embeddings
+    Only candidate rows are scored when a candidate set is given
+    Returns (positions, similarities)
+    """
+    if candidates is None:
+        return top_k(cosine_scores(query_embedding, embeddings), k, mask=mask)
+
+    candidates = np.asarray(candidates, dtype=np.int64)
+    if mask is not None:
+        candidates = candidates[np.asarray(mask, dtype=bool)[candidates]]
+    positions, similarities = top_k(cosine_scores(query_embedding, embeddings[candidates]), k)
+    return candidates[positions], similarities
@@ -1,22 +1,21 @@
-import pandas as pd
 import numpy as np
 import torch
 from torch.utils.data import Dataset, DataLoader
-from transformers import RobertaTokenizer, RobertaModel
+from transformers import RobertaTokenizer, RobertaConfig
 from torch.optim import AdamW
-from sklearn.preprocessing import LabelEncoder
 from sklearn.model_selection import train_test_split
 import matplotlib.pyplot as plt
 from tqdm import tqdm
 import logging
 import os
-import re
-import nltk
-import spacy
-from textblob import TextBlob
-from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
 from sklearn.metrics import accuracy_score, f1_score, recall_score, precision_score, classification_report, confusion_matrix
 import seaborn as sns
+from text_encoder import encode_texts, pad_batch
+from destination_catalog import DestinationCatalog
+from query_understanding import SentimentAnalyzer, extract_query_info
+# Serving code lives in destination_model; re-exported for training scripts and the CLI
+from destination_model import (get_device, load_data, preprocess_data, DestinationRecommender, StudentEncoder,
+                               load_student, get_recommendations, load_model, format_recommendations)
 
 # Force CPU usage
 # Define device
@@ -25,213 +24,10 @@ import seaborn as sns
 device = torch.device('cpu')
 print(f"Using device: {device}")
 
-# Download necessary NLTK data
-try:
-    nltk.data.find('tokenizers/punkt')
-    nltk.download('punkt_tab')
-except LookupError:
-    nltk.download('punkt_tab')
-from nltk.tokenize import word_tokenize
-
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-class SentimentAnalyzer:
-    def __init__(self):
-        self.vader = SentimentIntensityAnalyzer()
-        
-    def analyze_sentiment(self, text):
-        """
-        Analyze sentiment using both TextBlob and VADER for more accurate results
-        """
-        # TextBlob sentiment
-        blob = TextBlob(text)
-        textblob_sentiment = blob.sentiment.polarity  # -1 to 1
-        
-        # VADER sentiment
-        vader_scores = self.vader.polarity_scores(text)
-        
-        # Extract sentiment-bearing words
-        sentiment_words = self._extract_sentiment_words(text)
-        
-        # Determine overall sentiment
-        if textblob_sentiment > 0.1:
-            overall = 'positive'
-        elif textblob_sentiment < -0.1:
-            overall = 'negative'
-        else:
-            overall = 'neutral'
-            
-        return {
-            'textblob_sentiment': textblob_sentiment,
-            'vader_scores': vader_scores,
-            'sentiment_words': sentiment_words,
-            'overall_sentiment': overall
-        }
-    
-    def _extract_sentiment_words(self, text):
-        """
-        Extract words that contribute to sentiment
-        """
-        words = word_tokenize(text.lower())
-        sentiment_words = []
-        
-        for word in words:
-            # Check VADER sentiment
-            if abs(self.vader.polarity_scores(word)['compound']) > 0.1:
-                sentiment_words.append(word)
-                
-        return sentiment_words
-
-# Download spaCy model for NER
-try:
-    nlp = spacy.load("en_core_web_sm")
-except:
-    import sys
-    logger.info("Downloading spaCy model for NER...")
-    os.system(f"{sys.executable} -m spacy download en_core_web_sm")
-    nlp = spacy.load("en_core_web_sm")
-
-def get_device():
-    """Get the device to use for computations"""
-    return device
-
-# Load the data
-def load_data(file_path):
-    try:
-        df = pd.read_csv(file_path)
-        logger.info(f"Data loaded successfully. Shape: {df.shape}")
-        return df
-    except Exception as e:
-        logger.error(f"Error loading data: {e}")
-        raise
-
-# Preprocess the data
-def preprocess_data(df):
-    # Fill NaN values
-    df = df.fillna('')
-
-    # Split combined categories and create a list of all categories
-    df['all_categories'] = df['category'].apply(lambda x: [cat.strip() for cat in str(x).split(',')])
-
-    # Create a combined text field with weighted importance
-    # Description is repeated twice to give it more weight in the model
-    df['combined_text'] = df['description'] + ' ' + df['description'] + ' ' + \
-                         df['name'] + ' ' + \
-                         df['category'] + ' ' + \
-                         df['metadata']
-
-    # Encode the categories - now using the first category as primary
-    label_encoder = LabelEncoder()
-    df['category_encoded'] = label_encoder.fit_transform(df['category'].apply(lambda x: str(x).split(',')[0].strip()))
-
-    # Save the label encoder mapping for future use
-    category_mapping = dict(zip(label_encoder.classes_, label_encoder.transform(label_encoder.classes_)))
-    logger.info(f"Category mapping: {category_mapping}")
-
-    return df, label_encoder
-
-# Advanced function to extract query information using spaCy NER and pattern matching
-def extract_query_info(query_text, available_cities, available_categories, available_budgets=None):
-    """
-    Extract city, category, and budget information from a user query using NER and pattern matching.
-    """
-    query_lower = query_text.lower()
-
-    # Initialize variables
-    extracted_city = None
-    extracted_category = None
-    extracted_budget = None
-    budget_amount = None
-    
-    # Process with spaCy for NER
-    doc = nlp(query_text)
-    
-    # Extract cities using spaCy NER
-    for ent in doc.ents:
-        if ent.label_ == "GPE" and not extracted_city:  # GPE = Geopolitical Entity
-            potential_city = ent.text
-            # Verify against our available cities
-            for city in available_cities:
-                if potential_city.lower() in city.lower() or city.lower() in potential_city.lower():
-                    extracted_city = city
-                    break
-    
-    # Backup method: Check direct city mentions if spaCy NER didn't find any
-    if not extracted_city:
-        for city in available_cities:
-            city_lower = city.lower()
-            if city_lower in query_lower:
-                extracted_city = city
-                break
-
-    # Category mapping with synonyms and related terms
-    category_mapping = {
-        "hotel": ["hotel", "resort", "lodge", "inn", "hostel", "stay", "bed and breakfast", "guesthouse", "motel", "lodging", "room"],
-        "cafe": ["cafe", "coffee", "restaurant", "breakfast", "lunch", "dinner"],
-        "restaurant":["eat", "hungry"],
-        "historical site": ["historical", "history", "heritage", "museum", "shrine", "ancient", "old", "traditional"],
-        "natural attraction": ["nature", "natural", "outdoors", "mountain", "lake", "volcano", "falls", 
-                               "waterfall", "beach", "ocean", "sea", "river", "hiking", "trek", "forest"],
-        "leisure": ["park", "amusement", "rides", "attraction", "entertainment", "fun", "thrill"],
-        "museum": ["museum", "collection", "exhibit", "gallery", "art", "cultural", "artifacts"],
-        "beach resort": ["beach resort", "seaside resort", "coastal resort", "ocean resort", "beachfront resort"]
-    }
-
-    # Extract category using mapped terms
-    for category in available_categories:
-        category_lower = category.lower()
-        # Direct match
-        if category_lower in query_lower:
-            extracted_category = category
-            break
-
-        # Check synonyms
-        for cat, synonyms in category_mapping.items():
-            if cat.lower() == category_lower:
-                for synonym in synonyms:
-                    if synonym in query_lower:
-                        extracted_category = category
-                        break
-                if extracted_category:
-                    break
-
-    # Extract budget using regex patterns
-    budget_patterns = [
-        r'under\s*(\d+)\s*(?:pesos|PHP)?',  # "under 500 pesos"
-        r'below\s*(\d+)\s*(?:pesos|PHP)?',  # "below 500 pesos"
-        r'less than\s*(\d+)\s*(?:pesos|PHP)?',  # "less than 500 pesos"
-        r'(\d+)\s*(?:pesos|PHP)?\s*or less',  # "500 pesos or less"
-        r'budget of\s*(\d+)\s*(?:pesos|PHP)?',  # "budget of 500 pesos"
-        r'(\d+)\s*(?:pesos|PHP)?',  # "500 pesos"
-    ]
-
-    for pattern in budget_patterns:
-        match = re.search(pattern, query_text.lower())
-        if match:
-            budget_amount = int(match.group(1))
-            break
-    
-    # Remove city, category, and budget mentions from query to get cleaner core query
-    cleaned_query = query_text
-    
-    if extracted_city:
-        cleaned_query = re.sub(r'\b' + re.escape(extracted_city) + r'\b', '', cleaned_query, flags=re.IGNORECASE)
-    
-    if extracted_category:
-        cleaned_query = re.sub(r'\b' + re.escape(extracted_category) + r'\b', '', cleaned_query, flags=re.IGNORECASE)
-        # Also remove synonyms
-        for cat, synonyms in category_mapping.items():
-            if cat.lower() == extracted_category.lower():
-                for synonym in synonyms:
-                    cleaned_query = re.sub(r'\b' + re.escape(synonym) + r'\b', '', cleaned_query, flags=re.IGNORECASE)
-
-    # Clean up extra spaces
-    cleaned_query = re.sub(r'\s+', ' ', cleaned_query).strip()
-
-    return extracted_city, extracted_category, extracted_budget, cleaned_query, None, budget_amount
-
 # Create dataset class
 class DestinationDataset(Dataset):
     def __init__(self, texts, labels, tokenizer, max_length=512):
@@ -264,24 +60,106 @@ class DestinationDataset(Dataset):
             'labels': torch.tensor(label, dtype=torch.long)
         }
 
-# Model definition
-class DestinationRecommender(torch.nn.Module):
-    def __init__(self, num_labels, dropout=0.5):
-        super(DestinationRecommender, self).__init__()
-        self.roberta = RobertaModel.from_pretrained('roberta-base')
-        self.dropout = torch.nn.Dropout(dropout)
-        self.dropout2 = torch.nn.Dropout(dropout)
-        self.intermediate = torch.nn.Linear(self.roberta.config.hidden_size, self.roberta.config.hidden_size // 2)
-        self.classifier = torch.nn.Linear(self.roberta.config.hidden_size // 2, num_labels)
-
-    def forward(self, input_ids, attention_mask):
-        outputs = self.roberta(input_ids=input_ids, attention_mask=attention_mask)
-        pooled_output = outputs.last_hidden_state[:, 0, :]
-        pooled_output = self.dropout(pooled_output)
-        pooled_output = torch.relu(self.intermediate(pooled_output))
-        pooled_output = self.dropout2(pooled_output)
-        logits = self.classifier(pooled_output)
-        return logits
+def build_student_from_teacher(teacher, num_layers=4):
+    """
+    Create a student encoder initialized from the teacher's embeddings and
+    evenly spaced transformer layers
+    """
+    teacher_config = teacher.roberta.config
+    config = RobertaConfig.from_dict(teacher_config.to_dict())
+    config.num_hidden_layers = num_layers
+    student = StudentEncoder(config)
+
+    student.roberta.embeddings.load_state_dict(teacher.roberta.embeddings.state_dict())
+    teacher_layers = teacher.roberta.encoder.layer
+    layer_ids = np.linspace(0, len(teacher_layers) - 1, num_layers).round().astype(int)
+    for student_layer, teacher_id in zip(student.roberta.encoder.layer, layer_ids):
+        student_layer.load_state_dict(teacher_layers[int(teacher_id)].state_dict())
+
+    logger.info(f"Student initialized from teacher layers {layer_ids.tolist()}")
+    return student
+
+def generate_synthetic_queries(df, seed=42):
+    """
+    Generate short travel queries from the catalog, e.g. "cafe in Tagaytay"
+    """
+    templates = [
+        "{category} in {city}",
+        "best {category} in {city}",
+        "cheap {category} near {city}",
+        "where can I find a {category} in {city}",
+        "{name}",
+        "{name} in {city}",
+        "things to do in {city}",
+        "{category}",
+    ]
+    queries = set()
+    for _, row in df.iterrows():
+        categories = row['all_categories'] if 'all_categories' in df.columns else [row['category']]
+        for category in categories:
+            for template in templates:
+                queries.add(template.format(category=str(category).lower(), city=row['city'], name=row['name']).strip())
+    queries = sorted(q for q in queries if q)
+    rng = np.random.RandomState(seed)
+    rng.shuffle(queries)
+    return queries
+
+def distill_student(teacher, student, tokenizer, texts, epochs=3, batch_size=16, learning_rate=5e-5, max_length=128):
+    """
+    Train the student to reproduce the teacher's CLS embeddings on the given texts.
+    Loss is MSE plus a cosine term on the CLS vectors.
+    """
+    teacher.eval()
+    # Teacher targets are fixed, so compute them once
+    logger.info(f"Computing teacher embeddings for {len(texts)} texts...")
+    targets = torch.from_numpy(encode_texts(texts, tokenizer, teacher, device=device, max_length=max_length))
+    token_ids = tokenizer(
+        list(texts),
+        add_special_tokens=True,
+        max_length=max_length,
+        truncation=True,
+        return_token_type_ids=False,
+        return_attention_mask=False
+    )['input_ids']
+
+    student = student.to(device)
+    optimizer = AdamW(student.parameters(), lr=learning_rate, weight_decay=0.01)
+    mse = torch.nn.MSELoss()
+
+    for epoch in range(epochs):
+        student.train()
+        order = np.random.permutation(len(texts))
+        total_loss = 0
+        progress_bar = tqdm(range(0, len(order), batch_size), desc=f"Distill epoch {epoch + 1}/{epochs}")
+        for start in progress_bar:
+            batch = order[start:start + batch_size]
+            input_ids, attention_mask = pad_batch(tokenizer, [token_ids[i] for i in batch], device=device)
+            target = targets[batch].to(device)
+
+            optimizer.zero_grad()
+            output = student(input_ids=input_ids, attention_mask=attention_mask)
+            loss = mse(output, target) + (1 - torch.nn.functional.cosine_similarity(output, target).mean())
+            loss.backward()
+            optimizer.step()
+
+            total_loss += loss.item() * len(batch)
+            progress_bar.set_postfix({'loss': loss.item()})
+
+        logger.info(f"Distill epoch {epoch + 1}/{epochs}, Average Loss: {total_loss / len(texts):.4f}")
+
+    student.eval()
+    return student
+
+def save_student(student, model_dir, teacher_version):
+    """Save student weights and the config needed to rebuild it without downloads"""
+    import json
+    os.makedirs(model_dir, exist_ok=True)
+    torch.save(student.state_dict(), os.path.join(model_dir, 'student_encoder.pt'))
+    with open(os.path.join(model_dir, 'student_encoder.json'), 'w') as f:
+        json.dump({
+            'teacher_model_version': teacher_version,
+            'config': student.roberta.config.to_dict()
+        }, f, indent=2)
 
 # Training function
 def train_model(model, train_dataloader, val_dataloader, epochs=10, learning_rate=2e-5):
@@ -409,170 +287,6 @@ def create_destination_embeddings(model, dataset, dataloader):
 
     return np.array(all_embeddings), list(range(len(dataset)))
 
-# Enhanced recommendation function with intelligent filtering including budget
-def get_recommendations(query_text, tokenizer, model, embeddings, df, city=None, category=None, budget=None, budget_amount=None, top_n=5):
-    """
-    Get destination recommendations based on a query text and optional filters.
-    Now includes numeric budget filtering and handles multiple categories.
-    """
-    # Tokenize the query
-    query_encoding = tokenizer(
-        query_text,
-        add_special_tokens=True,
-        max_length=512,
-        return_token_type_ids=False,
-        padding='max_length',
-        truncation=True,
-        return_attention_mask=True,
-        return_tensors='pt'
-    ).to(device)
-
-    # Get the query embedding
-    model.eval()
-    with torch.no_grad():
-        outputs = model.roberta(
-            input_ids=query_encoding['input_ids'],
-            attention_mask=query_encoding['attention_mask']
-        )
-        query_embedding = outputs.last_hidden_state[:, 0, :].cpu().numpy()
-
-    # Calculate cosine similarity
-    from sklearn.metrics.pairwise import cosine_similarity
-    similarities = cosine_similarity(query_embedding, embeddings)[0]
-
-    # Create a series of similarities with df indices
-    similarity_series = pd.Series(similarities, index=df.index)
-
-    # Apply filters
-    filter_applied = False
-    filtered_df = df.copy()
-
-    # Apply city filter if specified
-    if city:
-        city_mask = filtered_df['city'].str.lower() == city.lower()
-        if not any(city_mask):
-            logger.warning(f"No destinations found in city: {city}")
-            return pd.DataFrame(), np.array([])
-        filtered_df = filtered_df[city_mask]
-        filter_applied = True
-
-    # Apply category filter if specified
-    if category:
-        # Check if the category exists in any of the categories in all_categories
-        category_mask = filtered_df['all_categories'].apply(
-            lambda cats: any(cat.lower() == category.lower() for cat in cats)
-        )
-        if not any(category_mask):
-            logger.warning(f"No destinations found with category: {category}")
-            if filter_applied:
-                return pd.DataFrame(), np.array([])
-        else:
-            filtered_df = filtered_df[category_mask]
-            filter_applied = True
-    
-    # Apply budget filter if specified
-    if budget_amount is not None:
-        # Convert budget column to numeric, handling any non-numeric values
-        filtered_df['budget'] = pd.to_numeric(filtered_df['budget'], errors='coerce')
-        
-        # Check if the query contains "under", "below", or "less than"
-        is_strict_budget = any(word in query_text.lower() for word in ['under', 'below', 'less than'])
-        
-        if is_strict_budget:
-            # For "under" queries, strictly enforce the budget limit
-            budget_mask = filtered_df['budget'] <= budget_amount
-        else:
-            # For other queries, allow a small buffer (10% instead of 20%)
-            budget_mask = filtered_df['budget'] <= (budget_amount * 1.1)
-        
-        # Log budget filtering details
-        logger.info(f"Budget filtering: Amount={budget_amount}, Strict={is_strict_budget}")
-        logger.info(f"Found {budget_mask.sum()} destinations within budget")
-        
-        if not any(budget_mask):
-            logger.warning(f"No destinations found within budget: {budget_amount}")
-            if filter_applied:
-                return pd.DataFrame(), np.array([])
-        else:
-            filtered_df = filtered_df[budget_mask]
-            filter_applied = True
-        
-        # Sort by budget within the filtered results
-        filtered_df = filtered_df.sort_values('budget')
-    elif budget:  # Fallback to categorical budget if no amount specified
-        budget_mask = filtered_df['budget'].str.lower() == budget.lower()
-        if not any(budget_mask):
-            logger.warning(f"No destinations found with budget: {budget}")
-            if filter_applied:
-                return pd.DataFrame(), np.array([])
-        else:
-            filtered_df = filtered_df[budget_mask]
-            filter_applied = True
-
-    if filter_applied:
-        # Get similarities only for filtered destinations
-        filtered_indices = filtered_df.index
-        filtered_similarities = similarity_series[filtered_indices]
-
-        # Get top recommendations
-        if len(filtered_similarities) == 0:
-            return pd.DataFrame(), np.array([])
-
-        top_indices = filtered_similarities.nlargest(min(top_n, len(filtered_similarities))).index
-        recommendations = df.loc[top_indices]
-        scores = filtered_similarities[top_indices].values
-    else:
-        # Get top recommendations from all destinations
-        top_indices = similarity_series.nlargest(top_n).index
-        recommendations = df.loc[top_indices]
-        scores = similarity_series[top_indices].values
-
-    return recommendations, scores
-
-def load_model(model_path, num_labels):
-    """Load the trained model"""
-    try:
-        model = DestinationRecommender(num_labels)
-        # Load state dict to CPU first
-        state_dict = torch.load(model_path, map_location='cpu')
-        model.load_state_dict(state_dict)
-        model.to(device)
-        model.eval()
-        return model
-    except Exception as e:
-        logger.error(f"Error loading model: {e}")
-        raise
-
-def format_recommendations(recommendations, scores):
-    """
-    Format recommendations in a user-friendly way.
-
-    Args:
-        recommendations (pd.DataFrame): Recommendations dataframe
-        scores (np.array): Similarity scores
-
-    Returns:
-        list: List of dictionaries containing formatted recommendations
-    """
-    if recommendations.empty:
-        return []
-
-    formatted_recs = []
-    for i, (idx, row) in enumerate(recommendations.iterrows()):
-        rec = {
-            'name': row['name'],
-            'city': row['city'],
-            'category': row['category'],
-            'description': row['description'],
-            'score': scores[i],
-            'budget': row.get('budget', 'Not specified'),
-            'operating_hours': row.get('operating hours', 'Not specified'),
-            'contact_info': row.get('contact information', 'Not specified')
-        }
-        formatted_recs.append(rec)
-
-    return formatted_recs
-
 def evaluate_model(model, test_dataloader, label_encoder):
     """
     Evaluate the model on the test set and return metrics
@@ -798,6 +512,9 @@ def main():
         np.save(embeddings_path, embeddings)
         np.save(indices_path, indices)
 
+    # Columnar view of the destinations, shared by every query below
+    catalog = DestinationCatalog(df)
+
     # User interaction loop
     print("\n=== Hello, I'm Wertigo, your travel assistant! ===")
     print("Tell me what kind of place you're looking for, and I'll recommend destinations!")
@@ -846,7 +563,7 @@ def main():
             tokenizer,
             model,
             embeddings,
-            df,
+            catalog,
             city=city,
             category=category,
             budget=budget,
@@ -865,7 +582,7 @@ def main():
                 # Try without budget
                 alt_recommendations, _ = get_recommendations(
                     clean_query if clean_query else user_query,
-                    tokenizer, model, embeddings, df, city=city, category=category, budget=None, budget_amount=None, top_n=1
+                    tokenizer, model, embeddings, catalog, city=city, category=category, budget=None, budget_amount=None, top_n=1
                 )
                 if not alt_recommendations.empty:
                     suggestion = f"Try searching for {category} in {city} without budget constraints."
@@ -873,7 +590,7 @@ def main():
                     # Try without category
                     alt_recommendations, _ = get_recommendations(
                         clean_query if clean_query else user_query,
-                        tokenizer, model, embeddings, df, city=city, category=None, budget=None, budget_amount=None, top_n=1
+                        tokenizer, model, embeddings, catalog, city=city, category=None, budget=None, budget_amount=None, top_n=1
                     )
                     if not alt_recommendations.empty:
                         suggestion = f"Try searching for any category in {city}."
@@ -883,7 +600,7 @@ def main():
                 # Try without category
                 alt_recommendations, _ = get_recommendations(
                     clean_query if clean_query else user_query,
-                    tokenizer, model, embeddings, df, city=city, category=None, budget=None, budget_amount=None, top_n=1
+                    tokenizer, model, embeddings, catalog, city=city, category=None, budget=None, budget_amount=None, top_n=1
                 )
                 if not alt_recommendations.empty:
                     suggestion = f"Try searching for any category in {city}."
@@ -0,0 +1,285 @@
+"""
+Single-file serving bundle: model config and weights, tokenizer, catalog and embeddings
+
+Everything an API worker loads at startup, exported once from the trained
+model, the dataset and the destination embeddings:
+
+    8 bytes   magic b'WERTIGOB'
+    8 bytes   header length (little-endian uint64)
+    header    JSON: format version, bundle version, model config, source
+              versions and the offset, size, dtype and shape of every segment
+    segments  each starting on a 64-byte boundary: one per weight tensor,
+              one per tokenizer file, the preprocessed catalog and the
+              L2-normalized embedding matrix
+
+The loader maps the file once. Weight tensors and the embedding matrix are
+views of the mapped pages (copy-on-write), so workers on one host share them
+through the page cache, and the model is built from the stored config
+instead of from_pretrained, so startup needs no network access. The catalog
+is a pickled DataFrame: only load bundles you exported yourself.
+
+Export (from the utils directory):
+    python serving_bundle.py [--output model_output/wertigo_serving.bundle]
+"""
+import os
+import sys
+import copy
+import json
+import time
+import pickle
+import struct
+import hashlib
+import logging
+import argparse
+import tempfile
+import numpy as np
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+if CURRENT_DIR not in sys.path:
+    sys.path.append(CURRENT_DIR)
+
+from embedding_matrix import NormalizedEmbeddings, l2_normalize, SUPPORTED_DTYPES
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'WERTIGOB'
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+
+
+def _padding(offset):
+    return (-offset) % ALIGNMENT
+
+
+def write_bundle(path, state_dict, model_info, tokenizer_dir, catalog_df, embeddings, sources):
+    """
+    Write a serving bundle
+    state_dict: name -> tensor; model_info: JSON-ready dict with the model
+    config; sources: JSON-ready versions of the files the bundle was built from
+    """
+    # (kind, name, payload bytes, extra header fields)
+    segments = []
+    for name, tensor in state_dict.items():
+        array = tensor.detach().cpu().contiguous().numpy()
+        segments.append(('tensor', name, array.tobytes(), {'dtype': str(array.dtype), 'shape': list(array.shape)}))
+    for filename in sorted(os.listdir(tokenizer_dir)):
+        with open(os.path.join(tokenizer_dir, filename), 'rb') as f:
+            segments.append(('tokenizer', filename, f.read(), {}))
+    segments.append(('catalog', 'catalog', pickle.dumps(catalog_df, protocol=pickle.HIGHEST_PROTOCOL), {}))
+    segments.append(('embeddings', 'embeddings', np.ascontiguousarray(embeddings).tobytes(),
+                     {'dtype': str(embeddings.dtype), 'shape': list(embeddings.shape)}))
+
+    digest = hashlib.sha1(json.dumps(model_info, sort_keys=True).encode('utf-8'))
+    for kind, name, payload, _ in segments:
+        digest.update(f"{kind}\0{name}\0".encode('utf-8'))
+        digest.update(payload)
+
+    # Segment offsets are relative to the start of the data area, which begins
+    # on an aligned boundary right after the header
+    entries = {'tensor': {}, 'tokenizer': {}, 'catalog': {}, 'embeddings': {}}
+    offset = 0
+    for kind, name, payload, extra in segments:
+        offset += _padding(offset)
+        entries[kind][name] = dict(extra, offset=offset, nbytes=len(payload))
+        offset += len(payload)
+
+    header = json.dumps({
+        'format_version': FORMAT_VERSION,
+        'version': digest.hexdigest()[:16],
+        'created_at': time.time(),
+        'model': model_info,
+        'sources': sources,
+        'tensors': entries['tensor'],
+        'tokenizer': entries['tokenizer'],
+        'catalog': entries['catalog']['catalog'],
+        'embeddings': entries['embeddings']['embeddings'],
+    }).encode('utf-8')
+    data_start = len(MAGIC) + 8 + len(header)
+    data_start += _padding(data_start)
+
+    # Write then rename so running workers keep their mapping of the old file
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    temp_path = path + '.tmp'
+    with open(temp_path, 'wb') as f:
+        f.write(MAGIC)
+        f.write(struct.pack('<Q', len(header)))
+        f.write(header)
+        f.write(b'\0' * (data_start - f.tell()))
+        for kind, name, payload, _ in segments:
+            f.write(b'\0' * (data_start + entries[kind][name]['offset'] - f.tell()))
+            f.write(payload)
+    os.replace(temp_path, path)
+    return json.loads(header)
+
+
+class ServingBundle:
+    """A memory-mapped serving bundle"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{path} is not a serving bundle")
+            header_length, = struct.unpack('<Q', f.read(8))
+            self.header = json.loads(f.read(header_length).decode('utf-8'))
+        if self.header.get('format_version') != FORMAT_VERSION:
+            raise ValueError(f"Unsupported serving bundle format {self.header.get('format_version')}")
+
+        data_start = len(MAGIC) + 8 + header_length
+        data_start += _padding(data_start)
+        # One copy-on-write mapping: views are writable, but pages stay shared until written
+        self._data = np.memmap(path, dtype=np.uint8, mode='c', offset=data_start)
+        self.version = self.header['version']
+        self.sources = self.header.get('sources', {})
+
+    def __len__(self):
+        return int(self.header['embeddings']['shape'][0])
+
+    def _bytes(self, entry):
+        return self._data[entry['offset']:entry['offset'] + entry['nbytes']]
+
+    def _array(self, entry):
+        return self._bytes(entry).view(np.dtype(entry['dtype'])).reshape(entry['shape'])
+
+    def state_dict(self):
+        """Weight tensors backed by the mapped file"""
+        import torch
+        return {name: torch.from_numpy(self._array(entry)) for name, entry in self.header['tensors'].items()}
+
+    def build_model(self, device='cpu'):
+        """DestinationRecommender built from the stored config, with the mapped weights"""
+        import torch
+        from transformers import RobertaConfig
+        from destination_model import DestinationRecommender
+
+        info = self.header['model']
+        model = DestinationRecommender(info['num_labels'], dropout=info['dropout'],
+                                       config=RobertaConfig.from_dict(info['config']))
+        state = self.state_dict()
+        try:
+            # Parameters become the mapped tensors instead of copies of them
+            model.load_state_dict(state, assign=True)
+        except TypeError:
+            # assign= needs torch >= 2.1
+            model.load_state_dict(state)
+        model.to(torch.device(device))
+        model.eval()
+        model.model_version = self.sources.get('model_version', self.version)
+        return model
+
+    def catalog_frame(self):
+        """The preprocessed destination DataFrame"""
+        return pickle.loads(self._bytes(self.header['catalog']).tobytes())
+
+    def embeddings(self):
+        """Read-only view of the L2-normalized embedding matrix"""
+        matrix = self._array(self.header['embeddings'])
+        matrix.flags.writeable = False
+        return matrix.view(NormalizedEmbeddings)
+
+    def label_classes(self):
+        return list(self.header['model']['label_classes'])
+
+    def tokenizer(self):
+        """RobertaTokenizer from the bundled files (unpacked once per bundle version)"""
+        from transformers import RobertaTokenizer
+
+        tokenizer_dir = os.path.join(tempfile.gettempdir(), f"wertigo-tokenizer-{self.version}")
+        if not os.path.isdir(tokenizer_dir):
+            staging_dir = tempfile.mkdtemp(prefix='wertigo-tokenizer-')
+            for filename, entry in self.header['tokenizer'].items():
+                with open(os.path.join(staging_dir, filename), 'wb') as f:
+                    f.write(self._bytes(entry).tobytes())
+            try:
+                os.rename(staging_dir, tokenizer_dir)
+            except OSError:
+                # Another worker unpacked it first
+                pass
+        return RobertaTokenizer.from_pretrained(tokenizer_dir)
+
+
+def open_bundle(path, model_path=None, data_file=None):
+    """
+    Open a serving bundle, or None if it's missing, unreadable, or older
+    than the model or dataset it was exported from (when those files exist)
+    """
+    from model_artifacts import get_model_version
+
+    if not os.path.exists(path):
+        return None
+    try:
+        bundle = ServingBundle(path)
+    except Exception as e:
+        logger.warning(f"Ignoring serving bundle {path}: {e}")
+        return None
+
+    for key, source_path in (('model_version', model_path), ('data_version', data_file)):
+        if source_path and os.path.exists(source_path) and get_model_version(source_path) != bundle.sources.get(key):
+            logger.warning(f"Serving bundle {bundle.version} is out of date ({os.path.basename(source_path)} changed). "
+                           "Re-export it with: python serving_bundle.py")
+            return None
+    return bundle
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    import torch
+    from transformers import RobertaConfig, RobertaTokenizer
+    from model_artifacts import (MODEL_PATH, DATA_FILE, TOKENIZER_DIR, DESTINATION_EMBEDDINGS_PATH,
+                                 SERVING_BUNDLE_PATH, get_model_version)
+    from serving_config import SERVING_CONFIG
+    from destination_model import DestinationRecommender, load_data, preprocess_data, embedding_texts
+    from embedding_store import EmbeddingStore
+    from text_encoder import encode_texts
+
+    parser = argparse.ArgumentParser(description='Export the single-file serving bundle')
+    parser.add_argument('--output', default=SERVING_BUNDLE_PATH)
+    parser.add_argument('--data', default=DATA_FILE)
+    parser.add_argument('--tokenizer-dir', default=TOKENIZER_DIR)
+    parser.add_argument('--base-config', default='roberta-base',
+                        help='Pretrained model name or directory holding the RoBERTa config.json')
+    parser.add_argument('--dtype', default=SERVING_CONFIG['embedding_matrix_dtype'], choices=SUPPORTED_DTYPES)
+    args = parser.parse_args()
+
+    if not os.path.exists(MODEL_PATH):
+        logger.error(f"Model not found: {MODEL_PATH}. Train it first with: python revised.py")
+        sys.exit(1)
+
+    catalog_df, label_encoder = preprocess_data(load_data(args.data))
+    label_classes = [str(label) for label in label_encoder.classes_]
+    config = RobertaConfig.from_pretrained(args.base_config)
+    model = DestinationRecommender(len(label_classes), config=config)
+    model.load_state_dict(torch.load(MODEL_PATH, map_location='cpu'))
+    model.eval()
+    model_version = get_model_version(MODEL_PATH)
+
+    # Same store, texts and version key as the server, so only rows it never
+    # encoded are encoded here (with the int8 encoder when the server uses it)
+    encoder, embedding_version = model, model_version
+    if SERVING_CONFIG['quantize_encoder']:
+        from quantization import apply_int8_quantization
+        encoder = copy.deepcopy(model)
+        apply_int8_quantization(encoder, model_version)
+        embedding_version += '+int8'
+    tokenizer = RobertaTokenizer.from_pretrained(args.tokenizer_dir)
+    store = EmbeddingStore(DESTINATION_EMBEDDINGS_PATH)
+    embeddings = store.refresh(catalog_df, embedding_texts(catalog_df), embedding_version,
+                               lambda texts: encode_texts(texts, tokenizer, encoder))
+    normalized = l2_normalize(embeddings).astype(args.dtype)
+
+    header = write_bundle(
+        args.output,
+        model.state_dict(),
+        {'num_labels': len(label_classes), 'dropout': model.dropout.p,
+         'config': config.to_dict(), 'label_classes': label_classes},
+        args.tokenizer_dir,
+        catalog_df,
+        normalized,
+        {'model_version': model_version, 'embedding_version': embedding_version,
+         'data_version': get_model_version(args.data)}
+    )
+    logger.info(f"Wrote serving bundle {header['version']} ({os.path.getsize(args.output) / 1e6:.1f} MB, "
+                f"{len(header['tensors'])} tensors, {len(catalog_df)} destinations) to {args.output}")
+
+if __name__ == "__main__":
+    main()
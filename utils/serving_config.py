@@ -0,0 +1,71 @@
+# Model Serving Configuration
+
+# Settings for query encoding and recommendation serving
+SERVING_CONFIG = {
+    # Micro-batching of concurrent query encodings
+    'query_batch_max_size': 16,       # Maximum number of queries encoded in one forward pass
+    'query_batch_max_wait_ms': 5,     # How long the first queued query waits for others to arrive
+    'query_batch_timeout_s': 30,      # How long a caller waits for its embedding before giving up
+    
+    # spaCy NER for query understanding (only the NER components are loaded)
+    'ner_batch_size': 64,             # Texts per nlp.pipe batch in extract_query_info_batch
+    'ner_micro_batching': True,       # Share nlp.pipe batches between concurrent requests
+    'ner_batch_max_size': 16,         # Maximum number of queries per micro-batch
+    'ner_batch_max_wait_ms': 2,       # How long the first queued query waits for others to arrive
+    
+    # Query embedding cache
+    'query_embedding_cache_size': 5000,   # Maximum number of cached query embeddings
+    'query_embedding_cache_ttl_s': 3600,  # Seconds before a cached embedding expires
+    
+    # Parsed query cache (city, category, budget, intent... per query and catalog version)
+    'query_info_cache_size': 5000,
+    'query_info_cache_ttl_s': 3600,
+    
+    # Query encoder runtime: 'torch' or 'onnx' (export first with: python onnx_encoder.py)
+    'query_encoder_backend': 'torch',
+    'onnx_num_threads': None,         # ONNX Runtime intra-op threads (None = all cores)
+    
+    # Serve the encoder with int8 dynamically quantized linear layers (CPU only)
+    'quantize_encoder': False,
+    
+    # Query encoder model: 'teacher' (full model) or 'student'
+    # (distill first with: python train_revised_model.py --distill; the student always runs on PyTorch)
+    'query_encoder_model': 'teacher',
+    
+    # Destination embedding builds
+    'embedding_batch_size': 16,             # Texts per forward pass
+    'embedding_checkpoint_chunk_size': 128, # Texts per checkpointed chunk
+    # CPU worker processes (1 = build in-process). Workers are forked, which is only
+    # safe in a single-threaded process whose model hasn't run: the startup build runs
+    # before the query queue thread and the first forward pass, and builds that find
+    # other threads running (dataset reloads) encode in-process instead
+    'embedding_build_workers': 1,
+    
+    # Boot from the single-file serving bundle when it's present and current
+    # (model config and weights, tokenizer, catalog, embeddings; export it with: python serving_bundle.py)
+    'serving_bundle': True,
+    
+    # Serve destination embeddings from a pre-normalized, memory-mapped matrix
+    'embedding_mmap': True,
+    'embedding_matrix_dtype': 'float32',    # 'float32', or 'float16' for half the memory at slower scoring
+    
+    # Destination embedding format for global searches: 'dense' or 'pq'
+    # ('pq' scores compact product-quantized codes and re-ranks the best candidates
+    # against the memory-mapped vectors; build the codes with: python pq_codec.py)
+    'embedding_format': 'dense',
+    'pq_rerank_candidates': 2000,   # PQ candidates re-scored exactly
+    
+    # Approximate nearest-neighbour search (build the index with: python hnsw_index.py)
+    'ann_index': True,
+    'ann_min_destinations': 50000,  # Smaller catalogs are scored exactly
+    'ann_candidate_pool': 1000,     # Nearest destinations re-scored by the recommender
+    'ann_ef_search': 1500,          # Search beam width, higher = better recall of the pool, slower
+                                    # queries (the beam also caps the pool: at most ef candidates)
+    
+    # City/category filters matching at most this share of the catalog score only their own rows
+    'partition_max_fraction': 0.1,
+    
+    # Every worker checks final_dataset.csv's content digest at most this often (on
+    # a request) and reloads it in the background when it changed; 0 disables reloads
+    'dataset_reload_check_s': 30,
+}
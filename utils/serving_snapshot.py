@@ -0,0 +1,63 @@
+"""
+One dataset load's catalog, embeddings and search indexes, swapped as a unit
+
+Positions returned by the indexes refer to rows of the catalog they were built
+with. Request handlers read the current snapshot once and use only it, so a
+dataset reload that publishes a new snapshot mid-request can never map one
+load's positions onto another load's rows.
+"""
+from collections import namedtuple
+
+from serving_config import SERVING_CONFIG
+
+SNAPSHOT_FIELDS = ('catalog', 'embeddings', 'ann_index', 'pq_index', 'destination_index', 'destination_reranker',
+                   'data_version')
+
+
+class ServingSnapshot(namedtuple('ServingSnapshot', SNAPSHOT_FIELDS, defaults=(None,) * len(SNAPSHOT_FIELDS))):
+    """Immutable catalog + embeddings + indexes; ServingSnapshot() is the empty one"""
+    __slots__ = ()
+
+    @property
+    def searchable(self):
+        """True when destinations can be scored against a query embedding"""
+        return (self.catalog is not None and self.embeddings is not None and len(self.embeddings) > 0
+                and self.destination_index is not None)
+
+    def nearest(self, query_embedding, mask=None, k=None):
+        """
+        Approximate nearest destinations by cosine similarity from the HNSW index or the PQ codes
+        (the HNSW beam width ann_ef_search caps the number of candidates)
+        Returns (positions, similarities), or None when neither is loaded
+        """
+        k = k or SERVING_CONFIG['ann_candidate_pool']
+        if self.ann_index is not None:
+            return self.ann_index.search(query_embedding, k, ef=SERVING_CONFIG['ann_ef_search'], mask=mask)
+        if self.pq_index is not None:
+            rerank = max(k, SERVING_CONFIG['pq_rerank_candidates'])
+            return self.pq_index.search(query_embedding, k, rerank=rerank, mask=mask)
+        return None
+
+    def search(self, query_embedding, city=None, category=None):
+        """
+        Score the destinations a query can match, using the city/category partitions
+        Returns (plan, positions, similarities) with positions in row order
+        """
+        return self.destination_index.search(
+            query_embedding,
+            self.embeddings,
+            city=city,
+            category=category,
+            nearest=self.nearest if self.ann_index is not None or self.pq_index is not None else None
+        )
+
+    def rerank(self, positions, similarities, city=None, category=None):
+        """
+        Boost candidate similarities by location, category, rating and popularity
+        Returns scores aligned with positions
+        """
+        return self.destination_reranker.score(positions, similarities, detected_city=city, detected_category=category)
+
+    def location_relevance(self, positions, city, available_cities):
+        """Partial-match relevance of candidates to a city with no exact matches (0 = unrelated)"""
+        return self.destination_reranker.location_scores(positions, city, available_cities)
@@ -0,0 +1,10 @@
+import os
+import sys
+
+# The modules live flat in the utils directory; the benchmarks hold the
+# reference (pre-optimization) implementations some tests compare against
+UTILS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCHMARKS_DIR = os.path.join(UTILS_DIR, 'benchmarks')
+for path in (UTILS_DIR, BENCHMARKS_DIR):
+    if path not in sys.path:
+        sys.path.insert(0, path)
@@ -0,0 +1,95 @@
+"""Recall of the HNSW graph and the PQ codes against exact search on random data"""
+import numpy as np
+import pytest
+
+from embedding_matrix import l2_normalize, NormalizedEmbeddings
+from retrieval import top_k_similar
+from hnsw_index import HNSWIndex
+from pq_codec import PQIndex
+
+COUNT = 2000
+DIMS = 32
+K = 10
+
+
+def clustered(count, seed):
+    """Gaussian clusters, closer to real embeddings than uniform noise"""
+    centers = np.random.default_rng(0).standard_normal((40, DIMS))
+    rng = np.random.default_rng(seed)
+    return (centers[rng.integers(0, 40, count)] + 0.6 * rng.standard_normal((count, DIMS))).astype(np.float32)
+
+
+@pytest.fixture(scope='module')
+def vectors():
+    return l2_normalize(clustered(COUNT, seed=1)).view(NormalizedEmbeddings)
+
+
+@pytest.fixture(scope='module')
+def queries():
+    return clustered(50, seed=2)
+
+
+@pytest.fixture(scope='module')
+def hnsw(vectors):
+    return HNSWIndex(vectors, m=12, ef_construction=100).build(log_every=0)
+
+
+def recall(search, vectors, queries, k=K):
+    hits = 0
+    for query in queries:
+        expected, _ = top_k_similar(query, vectors, k)
+        found, _ = search(query)
+        hits += len(set(expected.tolist()) & set(found.tolist()))
+    return hits / (k * len(queries))
+
+
+def test_hnsw_recall(hnsw, vectors, queries):
+    assert recall(lambda query: hnsw.search(query, K, ef=64), vectors, queries) >= 0.95
+
+
+def test_hnsw_recall_grows_with_ef(hnsw, vectors, queries):
+    pool = 200
+    narrow = recall(lambda query: hnsw.search(query, pool, ef=pool), vectors, queries, k=pool)
+    wide = recall(lambda query: hnsw.search(query, pool, ef=4 * pool), vectors, queries, k=pool)
+    assert wide > narrow
+    assert wide >= 0.95
+
+
+def test_hnsw_ef_caps_results(hnsw, queries):
+    positions, similarities = hnsw.search(queries[0], 100, ef=40)
+    assert len(positions) == 40
+    assert np.all(np.diff(similarities) <= 0)
+
+
+def test_hnsw_mask_falls_back_to_exact(hnsw, vectors, queries):
+    # Too few allowed rows for the graph walk to find: answered exactly
+    mask = np.zeros(COUNT, dtype=bool)
+    mask[::97] = True
+    positions, _ = hnsw.search(queries[0], K, ef=32, mask=mask)
+    expected, _ = top_k_similar(queries[0], vectors, K, mask=mask)
+    np.testing.assert_array_equal(positions, expected)
+
+
+def test_hnsw_save_load_round_trip(hnsw, vectors, queries, tmp_path):
+    path = str(tmp_path / 'hnsw.npz')
+    hnsw.source_fingerprint = 'fingerprint'
+    hnsw.save(path)
+    loaded = HNSWIndex.load(path, vectors, source_fingerprint='fingerprint')
+    for query in queries[:5]:
+        np.testing.assert_array_equal(loaded.search(query, K)[0], hnsw.search(query, K)[0])
+    assert HNSWIndex.load(path, vectors, source_fingerprint='other') is None
+
+
+def test_pq_recall_with_rerank(vectors, queries):
+    index = PQIndex.build(vectors, num_subspaces=8, num_centroids=64)
+    assert recall(lambda query: index.search(query, K, rerank=200), vectors, queries) >= 0.95
+    # Without exact re-ranking the codes alone still find most neighbours
+    assert recall(lambda query: index.search(query, K), vectors, queries) >= 0.5
+
+
+def test_pq_mask(vectors, queries):
+    index = PQIndex.build(vectors, num_subspaces=8, num_centroids=64)
+    mask = np.zeros(COUNT, dtype=bool)
+    mask[:500] = True
+    positions, _ = index.search(queries[0], K, rerank=100, mask=mask)
+    assert len(positions) == K and np.all(positions < 500)
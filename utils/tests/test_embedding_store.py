@@ -0,0 +1,110 @@
+"""EmbeddingStore refresh and alignment by destination key"""
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from embedding_store import EmbeddingStore, destination_keys
+
+WIDTH = 4
+
+
+class CountingEncoder:
+    """Deterministic fake encoder that records what it was asked to encode"""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, texts):
+        self.calls.append(list(texts))
+        return np.array([[float(sum(map(ord, text))), float(len(text)), 1.0, 0.0] for text in texts],
+                        dtype=np.float32)
+
+
+def catalog(names, cities=None, descriptions=None):
+    cities = cities or ['Imus'] * len(names)
+    descriptions = descriptions or [f"{name} description" for name in names]
+    return pd.DataFrame({'name': names, 'city': cities, 'description': descriptions})
+
+
+def texts_of(df):
+    return [f"{name} {description}" for name, description in zip(df['name'], df['description'])]
+
+
+@pytest.fixture
+def store_path(tmp_path):
+    return str(tmp_path / 'model_output' / 'destination_embeddings.npy')
+
+
+def refresh(store_path, df, encoder, model_version='v1'):
+    return np.asarray(EmbeddingStore(store_path).refresh(df, texts_of(df), model_version, encoder))
+
+
+def test_unchanged_dataset_is_not_re_encoded(store_path):
+    df = catalog(['A', 'B', 'C'])
+    encoder = CountingEncoder()
+    first = refresh(store_path, df, encoder)
+    second = refresh(store_path, df, encoder)
+    assert len(encoder.calls) == 1
+    np.testing.assert_array_equal(first, second)
+
+
+def test_only_new_and_changed_rows_are_encoded(store_path):
+    encoder = CountingEncoder()
+    refresh(store_path, catalog(['A', 'B', 'C']), encoder)
+
+    # B's description changed, C was removed, D is new, and the rows were reordered
+    df = catalog(['D', 'B', 'A'], descriptions=['new place', 'renovated', 'A description'])
+    embeddings = refresh(store_path, df, encoder)
+    assert encoder.calls[-1] == ['D new place', 'B renovated']
+    np.testing.assert_array_equal(embeddings, CountingEncoder()(texts_of(df)))
+
+
+def test_model_version_change_re_encodes_everything(store_path):
+    encoder = CountingEncoder()
+    df = catalog(['A', 'B'])
+    refresh(store_path, df, encoder)
+    refresh(store_path, df, encoder, model_version='v2')
+    assert encoder.calls[-1] == texts_of(df)
+
+
+def test_align_by_key_not_position(store_path):
+    stored = catalog(['A', 'B', 'C'], cities=['Imus', 'Kawit', 'Imus'])
+    refresh(store_path, stored, CountingEncoder())
+    expected = CountingEncoder()(texts_of(stored))
+
+    # Reordered, with a destination the store has never seen
+    df = catalog(['C', 'Z', 'A'], cities=['Imus', 'Imus', 'Imus'])
+    positions, embeddings = EmbeddingStore(store_path).align(df)
+    np.testing.assert_array_equal(positions, [0, 2])
+    np.testing.assert_array_equal(embeddings, expected[[2, 0]])
+
+
+def test_save_replaces_manifest_and_leaves_no_temp_files(store_path):
+    refresh(store_path, catalog(['A', 'B']), CountingEncoder())
+    store = EmbeddingStore(store_path)
+    assert store.load()
+    assert len(store.rows) == 2
+    assert sorted(os.listdir(os.path.dirname(store_path))) == ['destination_embeddings.json',
+                                                                'destination_embeddings.npy']
+
+
+def test_embeddings_without_manifest_are_re_encoded(store_path):
+    os.makedirs(os.path.dirname(store_path))
+    np.save(store_path, np.ones((2, WIDTH), dtype=np.float32))
+    assert not EmbeddingStore(store_path).load()
+
+    encoder = CountingEncoder()
+    df = catalog(['A', 'B'])
+    embeddings = refresh(store_path, df, encoder)
+    assert encoder.calls == [texts_of(df)]
+    np.testing.assert_array_equal(embeddings, encoder(texts_of(df)))
+    assert EmbeddingStore(store_path).load()
+
+
+def test_repeated_keys_are_disambiguated():
+    _, keys = destination_keys(catalog(['A', 'A', 'B']))
+    assert keys == ['a|imus', 'a|imus#2', 'b|imus']
+    _, keys = destination_keys(pd.DataFrame({'id': [3, 1, 3]}))
+    assert keys == ['3', '1', '3#2']
@@ -0,0 +1,34 @@
+"""FuzzyCityIndex against the original difflib SequenceMatcher loops"""
+import pytest
+
+from fuzzy_match import FuzzyCityIndex
+from bench_fuzzy_cities import (synthetic_cities, regression_queries, reference_match_query,
+                                reference_closest)
+
+
+@pytest.mark.parametrize('city_count', [30, 200])
+def test_same_matches_as_difflib(city_count):
+    cities = synthetic_cities(city_count)
+    index = FuzzyCityIndex(cities)
+    for query in regression_queries(cities, 150):
+        try:
+            expected = reference_match_query(query.lower(), cities)
+        except ZeroDivisionError:
+            # The old loop divided by zero on queries without letters or digits
+            expected = (None, 0.7)
+        assert index.match_query(query) == expected, query
+        detected = query.strip() or 'x'
+        assert index.closest(detected) == reference_closest(detected, cities), detected
+
+
+def test_first_city_wins_ties():
+    # Same lowercased name twice: the loop keeps the first one it saw
+    index = FuzzyCityIndex(['San Juan', 'SAN JUAN', 'San Jose'])
+    assert index.closest('san juan')[0] == 'San Juan'
+    assert index.closest('san juan') == reference_closest('san juan', ['San Juan', 'SAN JUAN', 'San Jose'])
+
+
+def test_no_match_keeps_threshold():
+    index = FuzzyCityIndex(['Tagaytay', 'Imus'])
+    assert index.closest('zzzzzz') == (None, 0.6)
+    assert index.match_query('???') == (None, 0.7)
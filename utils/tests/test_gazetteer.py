@@ -0,0 +1,75 @@
+"""Gazetteer hits and longest-match selection against plain substring search"""
+import re
+
+import numpy as np
+
+from gazetteer import (AhoCorasick, Gazetteer, get_gazetteer, CITY, CATEGORY, CATEGORY_KEYWORD,
+                       CATEGORY_NORMALIZATIONS)
+
+CITIES = ['Tagaytay', 'Trece Martires', 'Cavite City', 'Imus', 'General Trias', 'San Pablo']
+CATEGORIES = ['Cafe', 'Restaurant', 'Beach Resort', 'Resort', 'Historical Site']
+
+
+def reference_occurrences(keywords, text):
+    """Every (start, end, index), overlapping ones included, by scanning for each keyword"""
+    found = []
+    for index, keyword in enumerate(keywords):
+        for match in re.finditer(f"(?={re.escape(keyword)})", text):
+            found.append((match.start(), match.start() + len(keyword), index))
+    return sorted(found)
+
+
+def test_automaton_finds_every_occurrence():
+    keywords = ['he', 'she', 'his', 'hers', 'a', 'aa', 'aaa', 'resort', 'beach resort']
+    automaton = AhoCorasick(keywords)
+    rng = np.random.default_rng(0)
+    texts = ['ushers', 'aaaa', 'beach resort resorts', 'his hershe'] + [
+        ''.join(rng.choice(list('ahesr '), 30)) for _ in range(200)
+    ]
+    for text in texts:
+        assert sorted(automaton.find(text)) == reference_occurrences(keywords, text)
+
+
+def test_longest_hit_wins():
+    gazetteer = get_gazetteer(CITIES, CATEGORIES)
+    matches = gazetteer.scan("a beach resort near the resort in Tagaytay")
+    assert gazetteer.best(matches, CATEGORY).value == 'Beach Resort'
+    assert gazetteer.best(matches, CITY).value == 'Tagaytay'
+
+
+def test_multi_word_city_beats_its_parts():
+    gazetteer = get_gazetteer(CITIES + ['Trece'], CATEGORIES)
+    assert gazetteer.best(gazetteer.scan("cafes in trece martires"), CITY).value == 'Trece Martires'
+
+
+def test_equal_length_leftmost_then_table_order():
+    gazetteer = Gazetteer({'first': {'spa': 'A', 'zoo': 'B'}, 'second': {'spa': 'C'}})
+    matches = gazetteer.scan("zoo and spa")
+    assert gazetteer.best(matches, ('first', 'second')).value == 'B'
+    matches = gazetteer.scan("a spa")
+    assert gazetteer.best(matches, ('first', 'second')).value == 'A'
+
+
+def test_substring_semantics_are_kept():
+    # "shop" still matches inside "shopping", but the longer keyword wins
+    gazetteer = get_gazetteer(CITIES, CATEGORIES)
+    best = gazetteer.best(gazetteer.scan("shopping in imus"), CATEGORY_KEYWORD)
+    assert best.keyword == 'shopping'
+    assert best.value == CATEGORY_NORMALIZATIONS['shopping']
+
+
+def test_best_against_brute_force():
+    gazetteer = get_gazetteer(CITIES, CATEGORIES)
+    table = {keyword.lower(): value for keyword, value in CATEGORY_NORMALIZATIONS.items()}
+    keywords = list(table)
+    rng = np.random.default_rng(1)
+    words = keywords + ['in', 'near', 'cheap', 'the', 'Tagaytay', 'xyz']
+    for _ in range(300):
+        text = ' '.join(rng.choice(words, rng.integers(1, 6)))
+        occurrences = reference_occurrences(keywords, text.lower())
+        best = gazetteer.best(gazetteer.scan(text), CATEGORY_KEYWORD)
+        if not occurrences:
+            assert best is None
+            continue
+        start, end, index = min(occurrences, key=lambda hit: (hit[0] - hit[1], hit[0], hit[2]))
+        assert (best.start, best.end, best.value) == (start, end, table[keywords[index]])
@@ -0,0 +1,62 @@
+"""ONNX Runtime export vs. the PyTorch encoder (needs the trained model)"""
+import os
+
+import pytest
+
+torch = pytest.importorskip('torch')
+pytest.importorskip('transformers')
+pytest.importorskip('onnxruntime')
+
+from model_artifacts import MODEL_PATH, TOKENIZER_DIR, get_model_version
+
+pytestmark = pytest.mark.skipif(not os.path.exists(MODEL_PATH), reason=f"{MODEL_PATH} not trained")
+
+QUERIES = [
+    "cafes in Tagaytay",
+    "beach resorts in Ternate under 3000 pesos",
+    "historical sites near Kawit",
+    "a quiet place to relax with family this weekend",
+    "museum",
+]
+
+
+@pytest.fixture(scope='module')
+def model():
+    from destination_model import DestinationRecommender
+
+    state_dict = torch.load(MODEL_PATH, map_location='cpu')
+    model = DestinationRecommender(num_labels=state_dict['classifier.weight'].shape[0])
+    model.load_state_dict(state_dict)
+    return model.eval()
+
+
+@pytest.fixture(scope='module')
+def tokenizer():
+    from transformers import RobertaTokenizer
+
+    return RobertaTokenizer.from_pretrained(TOKENIZER_DIR)
+
+
+def test_onnx_matches_pytorch(model, tokenizer, tmp_path):
+    from onnx_encoder import PARITY_THRESHOLD, OnnxEncoder, check_parity, export_encoder
+
+    onnx_path = str(tmp_path / 'query_encoder.onnx')
+    export_encoder(model, tokenizer, onnx_path=onnx_path, model_version=get_model_version(MODEL_PATH))
+    encoder = OnnxEncoder(onnx_path)
+
+    assert encoder.source_model_version == get_model_version(MODEL_PATH)
+    cosine = check_parity(model, encoder, tokenizer, QUERIES)
+    assert cosine.min() >= PARITY_THRESHOLD
+
+
+def test_publish_replaces_export_and_metadata(model, tokenizer, tmp_path):
+    from onnx_encoder import export_encoder, publish_export, read_export_metadata, staging_path_for
+
+    onnx_path = str(tmp_path / 'query_encoder.onnx')
+    staging_path = staging_path_for(onnx_path)
+    export_encoder(model, tokenizer, onnx_path=staging_path, model_version='staged')
+    assert not os.path.exists(onnx_path)
+
+    publish_export(staging_path, onnx_path)
+    assert os.path.exists(onnx_path) and not os.path.exists(staging_path)
+    assert read_export_metadata(onnx_path)['model_version'] == 'staged'
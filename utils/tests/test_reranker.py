@@ -0,0 +1,39 @@
+"""Vectorized re-ranker against the original per-row scoring loop"""
+import numpy as np
+import pytest
+
+from reranker import DestinationReranker
+from bench_reranker import synthetic_catalog, reference_scores
+
+QUERIES = [('Tagaytay', 'Cafe'), ('cavite', None), ('Manila', 'Restaurant'), ('Benguet', None), (None, 'Park'),
+           (None, None), ('Nowhere', 'Unknown')]
+
+
+@pytest.fixture(scope='module')
+def catalog():
+    return synthetic_catalog(3000)
+
+
+@pytest.mark.parametrize('city, category', QUERIES)
+def test_scores_identical_to_loop(catalog, city, category):
+    reranker = DestinationReranker(catalog)
+    rng = np.random.default_rng(1)
+    positions = np.sort(rng.choice(len(catalog), 400, replace=False))
+    similarities = rng.random(len(catalog)).astype(np.float32)
+
+    expected_positions, expected_scores = reference_scores(catalog, positions.tolist(), similarities, city, category)
+    scores = reranker.score(positions, similarities[positions], detected_city=city, detected_category=category)
+    np.testing.assert_array_equal(expected_positions, positions)
+    # Bit for bit, so rankings (and their ties) are unchanged
+    np.testing.assert_array_equal(np.asarray(expected_scores), scores)
+
+
+def test_without_optional_columns(catalog):
+    df = catalog[['name', 'city', 'category']].head(50)
+    reranker = DestinationReranker(df)
+    similarities = np.linspace(0, 1, 50, dtype=np.float32)
+    positions = np.arange(50)
+    _, expected_scores = reference_scores(df, positions.tolist(), similarities, 'Tagaytay', 'Cafe')
+    np.testing.assert_array_equal(np.asarray(expected_scores),
+                                  reranker.score(positions, similarities, detected_city='Tagaytay',
+                                                 detected_category='Cafe'))
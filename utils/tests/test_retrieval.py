@@ -0,0 +1,54 @@
+"""top_k against a full stable argsort"""
+import numpy as np
+
+from retrieval import top_k, top_k_similar
+
+
+def reference_top_k(scores, k, candidates=None):
+    """Sort every candidate, highest first, equal scores in candidate order"""
+    candidates = np.arange(len(scores)) if candidates is None else np.asarray(candidates)
+    order = np.argsort(-scores[candidates], kind='stable')
+    return candidates[order][:k]
+
+
+def test_ties_keep_candidate_order():
+    # Few distinct values, so most of the k-th place is ties
+    scores = np.random.default_rng(0).integers(0, 5, 1000).astype(np.float32)
+    for k in (1, 7, 100, 999, 1000):
+        positions, selected = top_k(scores, k)
+        np.testing.assert_array_equal(positions, reference_top_k(scores, k))
+        np.testing.assert_array_equal(selected, scores[positions])
+
+
+def test_candidates_in_given_order():
+    rng = np.random.default_rng(1)
+    scores = rng.integers(0, 3, 500).astype(np.float64)
+    candidates = rng.permutation(500)[:200]
+    positions, _ = top_k(scores, 50, candidates=candidates)
+    np.testing.assert_array_equal(positions, reference_top_k(scores, 50, candidates))
+
+
+def test_mask_and_nan():
+    scores = np.array([0.5, np.nan, 0.9, 0.5, 0.1, 0.9])
+    mask = np.array([True, True, True, True, False, True])
+    positions, _ = top_k(scores, 4, mask=mask)
+    np.testing.assert_array_equal(positions, [2, 5, 0, 3])
+    # NaN ranks last instead of first
+    positions, _ = top_k(scores, None)
+    assert positions[-1] == 1
+
+
+def test_empty_and_non_positive_k():
+    assert len(top_k(np.array([1.0, 2.0]), 0)[0]) == 0
+    assert len(top_k(np.zeros(0), 5)[0]) == 0
+
+
+def test_top_k_similar_candidates_map_back_to_rows():
+    rng = np.random.default_rng(2)
+    embeddings = rng.standard_normal((300, 16)).astype(np.float32)
+    query = rng.standard_normal(16).astype(np.float32)
+    candidates = np.arange(0, 300, 3)
+    positions, _ = top_k_similar(query, embeddings, 10, candidates=candidates)
+    all_positions, _ = top_k_similar(query, embeddings, None)
+    expected = [position for position in all_positions if position % 3 == 0][:10]
+    np.testing.assert_array_equal(positions, expected)
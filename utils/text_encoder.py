@@ -0,0 +1,108 @@
+"""
+Shared text encoding path for the recommendation model
+
+Texts are tokenized without padding, sorted by token length and grouped into
+length buckets, so each forward pass is padded only to the longest text in its
+bucket instead of to a fixed 512 tokens.
+"""
+import numpy as np
+import torch
+
+DEFAULT_MAX_LENGTH = 512
+DEFAULT_BATCH_SIZE = 32
+DEFAULT_PAD_MULTIPLE = 8
+
+def tokenize_texts(tokenizer, texts, max_length=DEFAULT_MAX_LENGTH):
+    """
+    Tokenize texts without padding
+    Returns a list of token id lists (truncated to max_length)
+    """
+    encoding = tokenizer(
+        list(texts),
+        add_special_tokens=True,
+        max_length=max_length,
+        return_token_type_ids=False,
+        return_attention_mask=False,
+        padding=False,
+        truncation=True
+    )
+    return encoding['input_ids']
+
+def length_buckets(lengths, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Group item positions into batches of similar token length
+    Returns a list of index arrays, shortest texts first
+    """
+    order = np.argsort(np.asarray(lengths), kind='stable')
+    return [order[i:i + batch_size] for i in range(0, len(order), batch_size)]
+
+def pad_batch(tokenizer, token_ids, device='cpu', pad_to_multiple_of=DEFAULT_PAD_MULTIPLE):
+    """
+    Pad a batch of token id lists to the longest item in the batch
+    Returns input_ids and attention_mask tensors on the given device
+    """
+    longest = max(len(ids) for ids in token_ids)
+    if pad_to_multiple_of:
+        longest = ((longest + pad_to_multiple_of - 1) // pad_to_multiple_of) * pad_to_multiple_of
+
+    input_ids = np.full((len(token_ids), longest), tokenizer.pad_token_id, dtype=np.int64)
+    attention_mask = np.zeros((len(token_ids), longest), dtype=np.int64)
+    for row, ids in enumerate(token_ids):
+        input_ids[row, :len(ids)] = ids
+        attention_mask[row, :len(ids)] = 1
+
+    return torch.from_numpy(input_ids).to(device), torch.from_numpy(attention_mask).to(device)
+
+def cls_embeddings(model, input_ids, attention_mask):
+    """Run the encoder and return the CLS token embeddings as a numpy array"""
+    # Runtime backends (e.g. ONNX Runtime) produce CLS embeddings directly
+    if hasattr(model, 'encode_cls'):
+        return model.encode_cls(input_ids, attention_mask)
+
+    with torch.no_grad():
+        outputs = model.roberta(input_ids=input_ids, attention_mask=attention_mask)
+        return outputs.last_hidden_state[:, 0, :].cpu().numpy()
+
+def encode_texts(texts, tokenizer, model, device='cpu', max_length=DEFAULT_MAX_LENGTH,
+                 batch_size=DEFAULT_BATCH_SIZE, pad_to_multiple_of=DEFAULT_PAD_MULTIPLE):
+    """
+    Encode texts into CLS embeddings using length-bucketed, dynamically padded batches
+    Returns an array of shape (len(texts), hidden_size) in the original text order
+    """
+    texts = [str(text) for text in texts]
+    if not texts:
+        return np.zeros((0, 0), dtype=np.float32)
+
+    token_ids = tokenize_texts(tokenizer, texts, max_length=max_length)
+    lengths = [len(ids) for ids in token_ids]
+
+    result = None
+    for bucket in length_buckets(lengths, batch_size):
+        input_ids, attention_mask = pad_batch(
+            tokenizer,
+            [token_ids[i] for i in bucket],
+            device=device,
+            pad_to_multiple_of=pad_to_multiple_of
+        )
+        vectors = cls_embeddings(model, input_ids, attention_mask)
+        if result is None:
+            result = np.zeros((len(texts), vectors.shape[1]), dtype=vectors.dtype)
+        result[bucket] = vectors
+
+    return result
+
+def encode_query(query_text, tokenizer, model, device='cpu', cache=None):
+    """
+    Encode a single query, reusing a cached embedding when the model is versioned
+    Returns a (1, hidden_size) array
+    """
+    model_version = getattr(model, 'model_version', None)
+    if cache is None or model_version is None:
+        return encode_texts([query_text], tokenizer, model, device=device)
+
+    query_text = cache.normalize_text(query_text)
+    embedding = cache.get(query_text, model_version)
+    if embedding is None:
+        embedding = encode_texts([query_text], tokenizer, model, device=device)
+        cache.add(query_text, model_version, embedding)
+    return embedding
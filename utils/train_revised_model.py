@@ -1,8 +1,14 @@
 """
 Train and export the revised recommendation model
+
+Usage:
+    python train_revised_model.py              # train the model from the database
+    python train_revised_model.py --distill    # distill a small query encoder from model_output/wertigo.pt
 """
 
 import os
+import time
+import argparse
 import torch
 import logging
 import pandas as pd
@@ -12,6 +18,7 @@ from transformers import RobertaTokenizer
 from torch.utils.data import DataLoader, Dataset
 import database as db
 from revised import DestinationRecommender, DestinationDataset
+from model_artifacts import MODEL_OUTPUT_DIR, MODEL_PATH, get_model_version
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -124,5 +131,66 @@ def main():
     
     logger.info("Training completed successfully.")
 
+def distill_main(num_layers=4, epochs=3):
+    """
+    Distill a smaller student query encoder from the trained wertigo.pt model
+    """
+    from revised import (load_data, preprocess_data, load_model, build_student_from_teacher,
+                         generate_synthetic_queries, distill_student, save_student)
+    from text_encoder import encode_texts
+    
+    if not os.path.exists(MODEL_PATH):
+        logger.error(f"Teacher model not found: {MODEL_PATH}. Train it first with: python revised.py")
+        return
+    
+    # Load the catalog and the teacher model
+    df = load_data(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'final_dataset.csv'))
+    df, label_encoder = preprocess_data(df)
+    teacher = load_model(MODEL_PATH, len(label_encoder.classes_))
+    tokenizer = RobertaTokenizer.from_pretrained('roberta-base')
+    
+    # Destination texts plus synthetic queries; hold out some queries for evaluation
+    queries = generate_synthetic_queries(df)
+    held_out = queries[:max(1, len(queries) // 10)]
+    train_texts = list(df['combined_text'].astype(str)) + queries[len(held_out):]
+    logger.info(f"Distilling on {len(train_texts)} texts, evaluating on {len(held_out)} held-out queries")
+    
+    student = build_student_from_teacher(teacher, num_layers=num_layers)
+    student = distill_student(teacher, student, tokenizer, train_texts, epochs=epochs)
+    save_student(student, MODEL_OUTPUT_DIR, get_model_version(MODEL_PATH))
+    logger.info(f"Saved {num_layers}-layer student encoder to {MODEL_OUTPUT_DIR}")
+    
+    # Compare student and teacher on held-out queries
+    destination_vectors = encode_texts(df['combined_text'].astype(str), tokenizer, teacher)
+    destination_vectors /= np.maximum(np.linalg.norm(destination_vectors, axis=1, keepdims=True), 1e-12)
+    
+    timings = {}
+    vectors = {}
+    for name, encoder in (('teacher', teacher), ('student', student)):
+        started = time.perf_counter()
+        vectors[name] = np.vstack([encode_texts([query], tokenizer, encoder) for query in held_out])
+        timings[name] = (time.perf_counter() - started) * 1000 / len(held_out)
+        vectors[name] /= np.maximum(np.linalg.norm(vectors[name], axis=1, keepdims=True), 1e-12)
+    
+    cosine = np.sum(vectors['teacher'] * vectors['student'], axis=1)
+    teacher_top = np.argsort(-(vectors['teacher'] @ destination_vectors.T), axis=1)[:, :5]
+    student_top = np.argsort(-(vectors['student'] @ destination_vectors.T), axis=1)[:, :5]
+    overlap = np.mean([len(set(a) & set(b)) / 5 for a, b in zip(teacher_top, student_top)])
+    
+    logger.info(f"Held-out cosine to teacher: mean {cosine.mean():.4f}, min {cosine.min():.4f}")
+    logger.info(f"Held-out top-5 overlap with teacher: {overlap:.3f}")
+    logger.info(f"Per-query latency: teacher {timings['teacher']:.1f} ms, student {timings['student']:.1f} ms "
+                f"({timings['teacher'] / timings['student']:.1f}x faster)")
+
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Train the WerTigo recommendation model")
+    parser.add_argument('--distill', action='store_true',
+                        help="distill a smaller student query encoder from model_output/wertigo.pt")
+    parser.add_argument('--student-layers', type=int, default=4, help="transformer layers in the student")
+    parser.add_argument('--epochs', type=int, default=3, help="distillation epochs")
+    args = parser.parse_args()
+    
+    if args.distill:
+        distill_main(num_layers=args.student_layers, epochs=args.epochs)
+    else:
+        main()